@@ -5,8 +5,47 @@ from django.utils import timezone
 from django.urls import reverse
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.contrib.sites.shortcuts import get_current_site
+from django.db import transaction
+from core.models import BackgroundJob
+from core.paginator import EstimatedCountPaginator
+from evaluations.reports import REPORT_JUDGE, REPORT_STUDENT, start_report_job
+from .identity import invalidate_cached_users
 from .models import User, UserProfile, EmailVerification
-from .utils import send_verification_email, send_judge_approval_notification
+from .search import filter_profiles
+from .tasks import (
+    queue_bulk_account_emails, JOB_JUDGE_APPROVAL_EMAILS, JOB_VERIFICATION_EMAILS
+)
+
+
+class ProfileCompletionFilter(admin.SimpleListFilter):
+    """Filter by stored profile completion score"""
+    title = 'profile completion'
+    parameter_name = 'completion'
+    field_path = 'completion_score'
+    
+    def lookups(self, request, model_admin):
+        return (
+            ('complete', 'Complete (80%+)'),
+            ('partial', 'Partial (50-79%)'),
+            ('incomplete', 'Incomplete (<50%)'),
+        )
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value == 'complete':
+            return queryset.filter(**{f'{self.field_path}__gte': 80})
+        if value == 'partial':
+            return queryset.filter(**{
+                f'{self.field_path}__gte': 50, f'{self.field_path}__lt': 80
+            })
+        if value == 'incomplete':
+            return queryset.filter(**{f'{self.field_path}__lt': 50})
+        return queryset
+
+
+class UserProfileCompletionFilter(ProfileCompletionFilter):
+    field_path = 'profile__completion_score'
 
 
 class UserProfileInline(admin.StackedInline):
@@ -28,11 +67,20 @@ class UserAdmin(DefaultUserAdmin):
         'approval_status', 'is_active', 'profile_completion', 'date_joined'
     )
     list_filter = (
-        'user_type', 'is_verified', 'is_approved', 'is_active', 'is_staff', 'date_joined'
+        'user_type', 'is_verified', 'is_approved', 'is_active', 'is_staff',
+        UserProfileCompletionFilter, 'date_joined'
     )
-    search_fields = ('email', 'username', 'first_name', 'last_name')
+    list_select_related = ('profile',)
+    # Searched through the profile's trigram-indexed search document
+    # (see get_search_results); listed here so the search box is shown.
+    search_fields = ('email', 'username')
     ordering = ('-date_joined',)
-    actions = ['approve_judges', 'send_verification_emails', 'deactivate_users', 'reactivate_users']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        'approve_judges', 'send_verification_emails', 'deactivate_users', 'reactivate_users',
+        'generate_student_reports', 'generate_judge_reports',
+    ]
     
     fieldsets = DefaultUserAdmin.fieldsets + (
         ('Custom Fields', {
@@ -51,6 +99,11 @@ class UserAdmin(DefaultUserAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_profiles(queryset, search_term, prefix='profile__'), False
+    
     def verification_status(self, obj):
         """Display verification status with color coding"""
         if getattr(obj, 'is_verified', True):
@@ -81,70 +134,119 @@ class UserAdmin(DefaultUserAdmin):
     def profile_completion(self, obj):
         """Display profile completion percentage"""
         if hasattr(obj, 'profile'):
-            completion = obj.profile.profile_completion_percentage
+            completion = obj.profile.completion_score
             color = 'green' if completion >= 80 else 'orange' if completion >= 50 else 'red'
             return format_html(
-                '<span style="color: {};">{:.0f}%</span>',
+                '<span style="color: {};">{}%</span>',
                 color, completion
             )
         return 'No Profile'
     profile_completion.short_description = 'Profile Complete'
+    profile_completion.admin_order_field = 'profile__completion_score'
+    
+    def _start_email_job(self, request, kind, description, user_ids, **payload):
+        """Create a background job for bulk emails and send the admin to its progress page"""
+        job = BackgroundJob.objects.create(
+            kind=kind,
+            description=description,
+            total=len(user_ids),
+            payload={'user_ids': user_ids, **payload},
+            created_by=request.user,
+        )
+        transaction.on_commit(lambda: queue_bulk_account_emails.delay(job.pk))
+        return redirect(reverse('admin:core_backgroundjob_change', args=[job.pk]))
     
     def approve_judges(self, request, queryset):
         """Bulk approve judges"""
-        judge_users = queryset.filter(user_type='judge', is_approved=False)
-        approved_count = 0
+        judge_ids = list(
+            queryset.filter(user_type='judge', is_approved=False).values_list('pk', flat=True)
+        )
+        if not judge_ids:
+            self.message_user(request, 'No pending judges selected.', messages.WARNING)
+            return None
         
-        for user in judge_users:
-            user.is_approved = True
-            user.save()
-            
-            # Send approval email
-            if send_judge_approval_notification(user):
-                approved_count += 1
+        # Single UPDATE; bypasses per-row save() and its post_save receivers
+        User.objects.filter(pk__in=judge_ids).update(
+            is_approved=True, updated_at=timezone.now()
+        )
+        invalidate_cached_users(judge_ids)
         
         self.message_user(
             request,
-            f'{approved_count} judges approved and notified.',
+            f'{len(judge_ids)} judges approved. Notification emails are being queued.',
             messages.SUCCESS
         )
+        return self._start_email_job(
+            request,
+            JOB_JUDGE_APPROVAL_EMAILS,
+            f'Judge approval emails ({len(judge_ids)} users)',
+            judge_ids,
+        )
     approve_judges.short_description = "Approve selected judges"
     
     def send_verification_emails(self, request, queryset):
         """Resend verification emails"""
-        unverified_users = queryset.filter(is_verified=False)
-        sent_count = 0
-        
-        for user in unverified_users:
-            if send_verification_email(user, request):
-                sent_count += 1
+        user_ids = list(queryset.filter(is_verified=False).values_list('pk', flat=True))
+        if not user_ids:
+            self.message_user(request, 'No unverified users selected.', messages.WARNING)
+            return None
         
         self.message_user(
             request,
-            f'Verification emails sent to {sent_count} users.',
+            f'Verification emails are being queued for {len(user_ids)} users.',
             messages.SUCCESS
         )
+        return self._start_email_job(
+            request,
+            JOB_VERIFICATION_EMAILS,
+            f'Verification emails ({len(user_ids)} users)',
+            user_ids,
+            base_url=request.build_absolute_uri('/'),
+            site_domain=get_current_site(request).domain,
+        )
     send_verification_emails.short_description = "Send verification emails"
     
     def deactivate_users(self, request, queryset):
         """Deactivate selected users"""
-        queryset.update(is_active=False)
+        user_ids = list(queryset.values_list('pk', flat=True))
+        count = User.objects.filter(pk__in=user_ids).update(is_active=False)
+        invalidate_cached_users(user_ids)
         self.message_user(
             request,
-            f'{queryset.count()} users deactivated.',
+            f'{count} users deactivated.',
             messages.SUCCESS
         )
     deactivate_users.short_description = "Deactivate selected users"
     
     def reactivate_users(self, request, queryset):
         """Reactivate selected users"""
-        queryset.update(is_active=True)
+        user_ids = list(queryset.values_list('pk', flat=True))
+        count = User.objects.filter(pk__in=user_ids).update(is_active=True)
+        invalidate_cached_users(user_ids)
         self.message_user(
             request,
-            f'{queryset.count()} users reactivated.',
+            f'{count} users reactivated.',
             messages.SUCCESS
         )
     reactivate_users.short_description = "Reactivate selected users"
+    
+    def _start_report_job(self, request, queryset, kind, user_type):
+        user_ids = list(queryset.filter(user_type=user_type).values_list('pk', flat=True))
+        if not user_ids:
+            self.message_user(request, f'No {user_type}s selected.', messages.WARNING)
+            return None
+        job = start_report_job(request.user, kind, user_ids)
+        return redirect(reverse('admin:core_backgroundjob_change', args=[job.pk]))
+    
+    def generate_student_reports(self, request, queryset):
+        """Feedback report PDFs for the selected students"""
+        return self._start_report_job(request, queryset, REPORT_STUDENT, 'student')
+    generate_student_reports.short_description = "Generate feedback reports (PDF)"
+    
+    def generate_judge_reports(self, request, queryset):
+        """Judging summary PDFs for the selected judges"""
+        return self._start_report_job(request, queryset, REPORT_JUDGE, 'judge')
+    generate_judge_reports.short_description = "Generate judging summaries (PDF)"
 
 
 @admin.register(UserProfile)
@@ -153,12 +255,13 @@ class UserProfileAdmin(admin.ModelAdmin):
         'user', 'full_name', 'user_type', 'profile_completion_display',
         'created_at'
     )
-    list_filter = ('user__user_type', 'created_at')
+    list_filter = ('user__user_type', ProfileCompletionFilter, 'created_at')
+    list_select_related = ('user',)
     search_fields = (
         'user__email', 'user__username', 'first_name', 
         'last_name', 'school_organization', 'expertise_area'
     )
-    readonly_fields = ('created_at', 'updated_at', 'profile_completion_percentage')
+    readonly_fields = ('created_at', 'updated_at', 'completion_score')
     
     fieldsets = (
         ('Basic Information', {
@@ -172,27 +275,33 @@ class UserProfileAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Judge Information', {
-            'fields': ('expertise_area', 'years_experience'),
+            'fields': ('expertise_area', 'years_experience', 'accepts_assignments'),
             'classes': ('collapse',)
         }),
         ('System Information', {
-            'fields': ('profile_completion_percentage', 'created_at', 'updated_at'),
+            'fields': ('completion_score', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_profiles(queryset, search_term), False
+    
     def user_type(self, obj):
         return obj.user.get_user_type_display()
     user_type.short_description = 'User Type'
     
     def profile_completion_display(self, obj):
-        completion = obj.profile_completion_percentage
+        completion = obj.completion_score
         color = 'green' if completion >= 80 else 'orange' if completion >= 50 else 'red'
         return format_html(
-            '<span style="color: {};">{:.0f}%</span>',
+            '<span style="color: {};">{}%</span>',
             color, completion
         )
     profile_completion_display.short_description = 'Completion'
+    profile_completion_display.admin_order_field = 'completion_score'
 
 
 @admin.register(EmailVerification)
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .identity import get_cached_user
+
+UserModel = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose per-request user lookup is served from the cache"""
+
+    def get_user(self, user_id):
+        return get_cached_user(user_id, self._load_user)
+
+    def _load_user(self, user_id):
+        # The profile comes with the same query, so views reading
+        # request.user.profile do not go back to the database.
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
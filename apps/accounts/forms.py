@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from .images import validate_profile_image
 from .models import User, UserProfile
 
 
@@ -119,14 +120,10 @@ class UserProfileForm(forms.ModelForm):
     
     def clean_profile_image(self):
         image = self.cleaned_data.get('profile_image')
-        if image:
-            # Check file size (max 5MB)
-            if image.size > 5 * 1024 * 1024:
-                raise forms.ValidationError('Image file too large ( > 5MB )')
-            
-            # Check file type
-            if not image.content_type.startswith('image/'):
-                raise forms.ValidationError('File is not an image')
+        # Only new uploads need checking; an unchanged field is the stored file
+        if image and hasattr(image, 'content_type'):
+            # Size, format and dimensions, from the header only
+            validate_profile_image(image)
         
         return image
 
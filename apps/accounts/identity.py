@@ -0,0 +1,58 @@
+"""
+Cached identity lookups.
+
+AuthenticationMiddleware resolves ``request.user`` on every authenticated
+request. CachedModelBackend (accounts.backends) serves the user, with the
+profile already attached, from the cache instead of Cloud SQL.
+
+Entries are keyed by a per-user version number. Saving or deleting a User
+or UserProfile bumps the version after the transaction commits, so a reader
+that loaded the old row concurrently can only repopulate a key nobody will
+read again.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(user_id):
+    return f'accounts:identity:version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'accounts:identity:{user_id}:{version}'
+
+
+def get_cached_user(user_id, loader):
+    """Return the cached user for ``user_id``, calling ``loader`` on a miss"""
+    version = cache.get(_version_key(user_id), 0)
+    key = _user_key(user_id, version)
+    user = cache.get(key)
+    if user is None:
+        user = loader(user_id)
+        if user is not None:
+            cache.set(key, user, settings.IDENTITY_CACHE_TIMEOUT)
+    return user
+
+
+def _bump_versions(user_ids):
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        # add() is a no-op if the key exists; incr() then moves it forward
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, None)
+
+
+def invalidate_cached_users(user_ids):
+    """Drop cached identities once the current transaction commits"""
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: _bump_versions(user_ids))
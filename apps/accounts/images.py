@@ -0,0 +1,147 @@
+"""
+Profile image processing.
+
+Uploaded originals are kept for reprocessing but never served. A worker
+decodes each original once and writes fixed-size, metadata-free variants
+in WebP and JPEG; templates and API responses use those instead.
+"""
+import hashlib
+import io
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_PROFILE_IMAGE_SIZE = settings.MAX_IMAGE_SIZE
+MAX_PROFILE_IMAGE_PIXELS = 40_000_000
+
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# name -> square edge in pixels
+PROFILE_IMAGE_VARIANTS = {
+    'avatar': 64,
+    'thumbnail': 150,
+    'card': 400,
+}
+
+# format key -> (Pillow format, extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANT_DIR = 'profiles/variants'
+_VARIANT_OWNER_RE = re.compile(r'^profiles/variants/user_(\d+)_')
+
+
+def validate_profile_image(upload):
+    """
+    Check an uploaded profile image without decoding its pixels.
+
+    Only the header is parsed, so an oversized or malformed file is
+    rejected before any real work is done.
+    """
+    if upload.size > MAX_PROFILE_IMAGE_SIZE:
+        raise ValidationError('Image file too large ( > 5MB )')
+    try:
+        upload.seek(0)
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('File is not a valid image')
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValidationError('Unsupported image format')
+    if width * height > MAX_PROFILE_IMAGE_PIXELS:
+        raise ValidationError('Image dimensions too large')
+
+
+def _load_rgb(source):
+    image = Image.open(source)
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly from the DCT data;
+    # ask for the smallest scale that still covers the largest variant.
+    largest = max(PROFILE_IMAGE_VARIANTS.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(source):
+    """Yield ``(variant, format_key, bytes)`` for every variant of ``source``"""
+    image = _load_rgb(source)
+    for variant, edge in PROFILE_IMAGE_VARIANTS.items():
+        resized = ImageOps.fit(image, (edge, edge), Image.LANCZOS)
+        for format_key, (pil_format, _, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            # No exif/icc arguments: the encoded variant carries no metadata
+            resized.save(buffer, pil_format, **options)
+            yield variant, format_key, buffer.getvalue()
+
+
+def store_variants(profile, source):
+    """
+    Render and store all variants of ``source`` for ``profile``.
+
+    Returns ``{variant: {format_key: storage_name}}``. Names contain a
+    digest of the source so every new upload gets fresh, cacheable URLs.
+    """
+    hasher = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(64 * 1024), b''):
+        hasher.update(chunk)
+    source.seek(0)
+    digest = hasher.hexdigest()[:12]
+
+    variants = {}
+    for variant, format_key, data in render_variants(source):
+        extension = VARIANT_FORMATS[format_key][1]
+        name = os.path.join(
+            VARIANT_DIR, f'user_{profile.user_id}_{digest}_{variant}.{extension}'
+        )
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        variants.setdefault(variant, {})[format_key] = default_storage.save(
+            name, ContentFile(data)
+        )
+    return variants
+
+
+def variant_names(variants):
+    return {name for formats in variants.values() for name in formats.values()}
+
+
+def delete_variant_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def referenced_profile_media(names):
+    """The stored objects among ``names`` that a profile still uses (for core.sweeper)"""
+    from .models import UserProfile
+
+    names = list(names)
+    referenced = set(
+        UserProfile.objects.filter(profile_image__in=names).values_list('profile_image', flat=True)
+    )
+    # Variant names carry the owner: profiles/variants/user_<id>_...
+    user_ids = set()
+    for name in names:
+        match = _VARIANT_OWNER_RE.match(name)
+        if match:
+            user_ids.add(int(match.group(1)))
+    for variants in UserProfile.objects.filter(user_id__in=user_ids).values_list(
+        'image_variants', flat=True
+    ):
+        referenced.update(variant_names(variants))
+    return referenced
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from accounts.identity import invalidate_cached_users
+from accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized UserProfile columns in primary-key chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of profiles loaded and updated per chunk',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        scanned = updated = 0
+
+        while True:
+            # Keyset pagination keeps every chunk an index range scan
+            profiles = list(
+                UserProfile.objects.select_related('user')
+                .filter(pk__gt=last_pk)
+                .order_by('pk')[:chunk_size]
+            )
+            if not profiles:
+                break
+
+            changed = []
+            for profile in profiles:
+                score = profile.calculate_completion_percentage()
+                document = profile.build_search_document()
+                if (score, document) != (profile.completion_score, profile.search_document):
+                    profile.completion_score = score
+                    profile.search_document = document
+                    changed.append(profile)
+
+            UserProfile.objects.bulk_update(changed, ['completion_score', 'search_document'])
+            invalidate_cached_users(profile.user_id for profile in changed)
+            scanned += len(profiles)
+            updated += len(changed)
+            last_pk = profiles[-1].pk
+            self.stdout.write(f'Scanned {scanned} profiles, updated {updated}...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill complete: {updated} of {scanned} profiles updated.'
+        ))
@@ -0,0 +1,145 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+
+# Representative changelist requests: default page, each filter, search, sort
+CHANGELIST_QUERIES = (
+    '',
+    '?user_type__exact=judge&is_approved__exact=0',
+    '?is_verified__exact=0',
+    '?is_active__exact=0',
+    '?completion=complete',
+    '?q=bench-user-4242',
+    '?o=7',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large user table and assert UserAdmin changelist latency. '
+        'Seeded rows use the @bench.invalid domain and can be removed with --cleanup. '
+        'Only runs with DEBUG on unless --force is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=0,
+            help='Number of benchmark users to seed before measuring',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per INSERT while seeding',
+        )
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Requests per changelist URL; the median is reported',
+        )
+        parser.add_argument(
+            '--max-ms', type=float, default=500.0,
+            help='Fail if any changelist median exceeds this many milliseconds',
+        )
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help='Delete all benchmark users and exit',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Run even though DEBUG is off (the database may not be a development one)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                f"Refusing to seed or benchmark database {connection.settings_dict['NAME']!r} "
+                'with DEBUG off; use a development database or pass --force.'
+            )
+
+        if options['cleanup']:
+            deleted, _ = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}').delete()
+            self.stdout.write(f'Deleted {deleted} benchmark rows.')
+            return
+
+        if options['users']:
+            self._seed(options['users'], options['batch_size'])
+
+        admin = self._bench_admin()
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.force_login(admin)
+
+        failures = []
+        for query in CHANGELIST_QUERIES:
+            url = f'/admin/accounts/user/{query}'
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned HTTP {response.status_code}')
+
+            median = statistics.median(timings)
+            status = 'ok' if median <= options['max_ms'] else 'SLOW'
+            self.stdout.write(f'{status:4}  {median:8.1f} ms  {url}')
+            if median > options['max_ms']:
+                failures.append(url)
+
+        if failures:
+            raise CommandError(
+                f'{len(failures)} changelist URLs exceeded {options["max_ms"]} ms: '
+                + ', '.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('All changelist pages within budget.'))
+
+    def _bench_admin(self):
+        admin, _ = User.objects.get_or_create(
+            email=f'bench-admin@{BENCH_EMAIL_DOMAIN}',
+            defaults={
+                'username': 'bench-admin',
+                'is_staff': True,
+                'is_superuser': True,
+                'is_verified': True,
+            },
+        )
+        return admin
+
+    def _seed(self, count, batch_size):
+        """Bulk insert users and profiles, bypassing per-row signals"""
+        start = User.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}').count()
+        now = timezone.now()
+        user_types = ('student', 'student', 'student', 'judge')
+
+        for offset in range(start, start + count, batch_size):
+            size = min(batch_size, start + count - offset)
+            users = []
+            for i in range(offset, offset + size):
+                user_type = user_types[i % len(user_types)]
+                users.append(User(
+                    username=f'bench-user-{i}',
+                    email=f'bench-user-{i}@{BENCH_EMAIL_DOMAIN}',
+                    password='!',  # unusable
+                    user_type=user_type,
+                    is_verified=i % 3 != 0,
+                    is_approved=not (user_type == 'judge' and i % 2),
+                    is_active=i % 50 != 0,
+                    date_joined=now - timedelta(minutes=i),
+                ))
+            with transaction.atomic():
+                created = User.objects.bulk_create(users, batch_size=batch_size)
+                profiles = [
+                    UserProfile(user=user, completion_score=(user.pk * 7) % 101) for user in created
+                ]
+                # save() is bypassed, so fill in what admin search reads
+                for profile in profiles:
+                    profile.search_document = profile.build_search_document()
+                UserProfile.objects.bulk_create(profiles, batch_size=batch_size)
+            self.stdout.write(f'Seeded {offset + size - start}/{count} users...')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from accounts.tasks import process_profile_image
+
+
+class Command(BaseCommand):
+    help = 'Queue size-variant processing for profile images that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Reprocess every profile image, not only unprocessed ones',
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+        if not options['all']:
+            profiles = profiles.filter(image_variants={})
+
+        queued = 0
+        for pk, image_name, variants in profiles.order_by('pk').values_list(
+            'pk', 'profile_image', 'image_variants'
+        ).iterator():
+            process_profile_image.delay(pk, image_name, variants)
+            queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} profile images.'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired email verification tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows deleted per statement',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches to limit load',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = purge_expired_tokens(batch_size=options['batch_size'], max_batches=1)
+            if not deleted:
+                break
+            total += deleted
+            self.stdout.write(f'Deleted {total} expired tokens...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Purge complete: {total} tokens deleted.'))
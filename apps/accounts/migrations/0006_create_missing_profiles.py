@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    """
+    Profiles used to be (re)created lazily on every User save. That receiver
+    is gone, so make sure every existing user has one.
+    """
+    User = apps.get_model('accounts', 'User')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    missing = User.objects.filter(profile__isnull=True).values_list('pk', flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk) for pk in missing.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0005_remove_reactivationrequest_reviewed_by_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
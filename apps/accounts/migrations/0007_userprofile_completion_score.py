@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_create_missing_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='completion_score',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, help_text='Profile completion percentage, maintained on save'),
+        ),
+    ]
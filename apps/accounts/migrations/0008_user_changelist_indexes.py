@@ -0,0 +1,77 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+# Case-insensitive prefix search (admin "^email" / "^username") compiles to
+# UPPER("col"::text) LIKE 'FOO%'. Only a pattern_ops expression index can
+# serve that on PostgreSQL; other backends fall back to a scan.
+PREFIX_SEARCH_INDEXES = (
+    ("accounts_user_email_prefix_idx", "email"),
+    ("accounts_user_username_prefix_idx", "username"),
+)
+
+
+def create_prefix_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in PREFIX_SEARCH_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON accounts_user "
+            f"(UPPER(({column})::text) text_pattern_ops)"
+        )
+
+
+def drop_prefix_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _column in PREFIX_SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0007_userprofile_completion_score"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["-date_joined"], name="accounts_user_joined_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["user_type", "is_approved", "-date_joined"],
+                name="accounts_user_type_appr_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_verified", False)),
+                fields=["-date_joined"],
+                name="accounts_user_unverified_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", False)),
+                fields=["-date_joined"],
+                name="accounts_user_inactive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_approved", False), ("user_type", "judge")),
+                fields=["-date_joined"],
+                name="accounts_user_pend_judge_idx",
+            ),
+        ),
+        migrations.RunPython(create_prefix_search_indexes, drop_prefix_search_indexes),
+    ]
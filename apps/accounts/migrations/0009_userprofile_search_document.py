@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:08
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    # GIN trigram index serves LIKE '%term%' and similarity ranking.
+    # PostgreSQL only; SQLite (tests) falls back to a table scan.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS accounts_profile_search_trgm_idx "
+        "ON accounts_userprofile USING gin (search_document gin_trgm_ops)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS accounts_profile_search_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0008_user_changelist_indexes"),
+    ]
+
+    operations = [
+        # No-op on databases other than PostgreSQL
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="userprofile",
+            name="search_document",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0009_userprofile_search_document"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emailverification",
+            index=models.Index(
+                condition=models.Q(("is_used", False)),
+                fields=["user", "expires_at"],
+                name="accounts_ev_live_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="emailverification",
+            index=models.Index(fields=["expires_at"], name="accounts_ev_expires_idx"),
+        ),
+    ]
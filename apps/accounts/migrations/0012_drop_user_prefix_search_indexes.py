@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:12
+
+from django.db import migrations
+
+
+# Admin search goes through UserProfile.search_document (0009) instead of
+# "^email" / "^username", so the UPPER(...) text_pattern_ops indexes from
+# 0008 no longer serve any query and only slow down writes.
+PREFIX_SEARCH_INDEXES = (
+    ("accounts_user_email_prefix_idx", "email"),
+    ("accounts_user_username_prefix_idx", "username"),
+)
+
+
+def drop_prefix_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _column in PREFIX_SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_prefix_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in PREFIX_SEARCH_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON accounts_user "
+            f"(UPPER(({column})::text) text_pattern_ops)"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0011_userprofile_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_prefix_search_indexes, create_prefix_search_indexes),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-18 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0012_drop_user_prefix_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="accepts_assignments",
+            field=models.BooleanField(
+                default=True,
+                help_text="Judges who dropped out get no new assignments until this is set again",
+            ),
+        ),
+    ]
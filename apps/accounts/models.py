@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from django.utils import timezone
@@ -8,7 +9,15 @@ from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 import os
 import uuid
+from functools import partial
 from datetime import timedelta
+from core.models import DirtyFieldsMixin
+from core.storage import sign_urls
+from .images import delete_variant_files, variant_names
+
+
+# User fields that feed UserProfile.completion_score / search_document
+PROFILE_DERIVED_USER_FIELDS = ('user_type', 'email', 'username')
 
 
 def user_profile_image_path(instance, filename):
@@ -18,7 +27,7 @@ def user_profile_image_path(instance, filename):
     return os.path.join('profiles', filename)
 
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     """Custom user model with email as username field"""
     
     USER_TYPE_CHOICES = [
@@ -53,10 +62,54 @@ class User(AbstractUser):
         verbose_name = _('User')
         verbose_name_plural = _('Users')
         ordering = ['-created_at']
+        # Match the UserAdmin changelist: its filters plus ORDER BY -date_joined
+        indexes = [
+            models.Index(fields=['-date_joined'], name='accounts_user_joined_idx'),
+            models.Index(
+                fields=['user_type', 'is_approved', '-date_joined'],
+                name='accounts_user_type_appr_idx',
+            ),
+            models.Index(
+                fields=['-date_joined'],
+                name='accounts_user_unverified_idx',
+                condition=models.Q(is_verified=False),
+            ),
+            models.Index(
+                fields=['-date_joined'],
+                name='accounts_user_inactive_idx',
+                condition=models.Q(is_active=False),
+            ),
+            models.Index(
+                fields=['-date_joined'],
+                name='accounts_user_pend_judge_idx',
+                condition=models.Q(user_type='judge', is_approved=False),
+            ),
+        ]
     
     def __str__(self):
         return self.email
     
+    def save(self, *args, **kwargs):
+        # Judges require approval; decided before the INSERT so that the
+        # post_save receiver never has to save the user a second time.
+        if self._state.adding and self.user_type == 'judge':
+            self.is_approved = False
+        
+        # The profile's completion score and search document are derived
+        # from these user fields; refresh them when they change.
+        update_fields = kwargs.get('update_fields')
+        derived_fields = PROFILE_DERIVED_USER_FIELDS
+        if update_fields is not None:
+            derived_fields = [name for name in derived_fields if name in update_fields]
+        refresh_profile = (
+            not self._state.adding
+            and bool(derived_fields)
+            and self.is_dirty(*derived_fields)
+        )
+        super().save(*args, **kwargs)
+        if refresh_profile and hasattr(self, 'profile'):
+            self.profile.save()
+    
     @property
     def is_student(self):
         return self.user_type == 'student'
@@ -77,17 +130,15 @@ class User(AbstractUser):
         """Generate email verification token"""
         return default_token_generator.make_token(self)
     
+    def get_verification_path(self, token=None):
+        """Generate the site-relative email verification path"""
+        uid = urlsafe_base64_encode(force_bytes(self.pk))
+        token = token or self.generate_verification_token()
+        return reverse('accounts:verify_email', kwargs={'uidb64': uid, 'token': token})
+    
     def get_verification_link(self, request):
         """Generate email verification link"""
-        from django.utils.encoding import force_bytes
-        from django.utils.http import urlsafe_base64_encode
-        
-        uid = urlsafe_base64_encode(force_bytes(self.pk))
-        token = self.generate_verification_token()
-        
-        return request.build_absolute_uri(
-            reverse('accounts:verify_email', kwargs={'uidb64': uid, 'token': token})
-        )
+        return request.build_absolute_uri(self.get_verification_path())
 
 
 class EmailVerification(models.Model):
@@ -103,10 +154,22 @@ class EmailVerification(models.Model):
     class Meta:
         db_table = 'accounts_emailverification'
         ordering = ['-created_at']
+        indexes = [
+            # Live tokens per user: superseding on resend, admin "valid" filter
+            models.Index(
+                fields=['user', 'expires_at'],
+                name='accounts_ev_live_idx',
+                condition=models.Q(is_used=False),
+            ),
+            # Range scans for the purge worker
+            models.Index(fields=['expires_at'], name='accounts_ev_expires_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
-            self.expires_at = timezone.now() + timedelta(hours=24)
+            self.expires_at = timezone.now() + timedelta(
+                hours=settings.EMAIL_VERIFICATION_TOKEN_LIFETIME
+            )
         super().save(*args, **kwargs)
     
     @property
@@ -118,7 +181,7 @@ class EmailVerification(models.Model):
         return not self.is_used and not self.is_expired
 
 
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     """Extended user profile information"""
     
     user = models.OneToOneField(
@@ -181,6 +244,24 @@ class UserProfile(models.Model):
         blank=True,
         help_text=_('Years of relevant experience')
     )
+    accepts_assignments = models.BooleanField(
+        default=True,
+        help_text=_('Judges who dropped out get no new assignments until this is set again')
+    )
+    
+    # Denormalized so admin lists can sort/filter without computing per row
+    completion_score = models.PositiveSmallIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text=_('Profile completion percentage, maintained on save')
+    )
+    # Lower-cased text of every searchable user/profile column; trigram
+    # indexed on PostgreSQL (see accounts.search)
+    search_document = models.TextField(blank=True, editable=False)
+    # Storage names of the processed profile_image variants:
+    # {'avatar': {'webp': name, 'jpeg': name}, ...}; empty until processed
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -202,8 +283,40 @@ class UserProfile(models.Model):
     def display_name(self):
         return self.full_name or self.user.username or self.user.email
     
+    def image_urls(self, variant):
+        """
+        ``{'webp': url, 'jpeg': url}`` for one size variant of the profile image.
+
+        Falls back to the original upload until the variants are processed,
+        and returns None when there is no image.
+        """
+        if not self.profile_image:
+            return None
+        formats = self.image_variants.get(variant)
+        if not formats:
+            url = self.profile_image.url
+            return {'webp': None, 'jpeg': url}
+        urls = sign_urls(formats.values())
+        return {key: urls[name] for key, name in formats.items()}
+    
+    @property
+    def avatar_urls(self):
+        return self.image_urls('avatar')
+    
+    @property
+    def thumbnail_urls(self):
+        return self.image_urls('thumbnail')
+    
+    @property
+    def card_urls(self):
+        return self.image_urls('card')
+    
     @property
     def profile_completion_percentage(self):
+        """Stored profile completion percentage"""
+        return self.completion_score
+    
+    def calculate_completion_percentage(self):
         """Calculate profile completion percentage"""
         fields = ['first_name', 'last_name', 'bio', 'phone_number']
         if self.user.is_student:
@@ -217,30 +330,61 @@ class UserProfile(models.Model):
             fields.append('profile_image')
         
         return int((completed / len(fields)) * 100)
+    
+    def build_search_document(self):
+        """Text indexed for admin search and autocomplete"""
+        parts = (
+            self.user.email, self.user.username, self.first_name, self.last_name,
+            self.school_organization, self.expertise_area,
+        )
+        return ' '.join(part.lower() for part in parts if part)
+    
+    def save(self, *args, **kwargs):
+        self.completion_score = self.calculate_completion_percentage()
+        self.search_document = self.build_search_document()
+        derived = {'completion_score', 'search_document'}
+        
+        # A new upload invalidates the variants of the previous image
+        image_changed = self.is_dirty('profile_image')
+        stale_variants = self.image_variants
+        if image_changed:
+            self.image_variants = {}
+            derived.add('image_variants')
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+        
+        if image_changed and self.profile_image:
+            from .tasks import process_profile_image
+            
+            transaction.on_commit(partial(
+                process_profile_image.delay, self.pk, self.profile_image.name, stale_variants
+            ))
+        elif image_changed and stale_variants:
+            transaction.on_commit(partial(delete_variant_files, variant_names(stale_variants)))
 
 
 # Signal to create profile when user is created
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .identity import invalidate_cached_users
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Create a UserProfile when a User is created"""
     if created:
         UserProfile.objects.create(user=instance)
-        
-        # Set judge approval status
-        if instance.user_type == 'judge':
-            instance.is_approved = False
-            instance.save()
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save the UserProfile when the User is saved"""
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
-    else:
-        UserProfile.objects.create(user=instance)
 
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached request.user after the user row changes"""
+    invalidate_cached_users([instance.pk])
 
 
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_cached_profile_owner(sender, instance, **kwargs):
+    """The cached request.user carries its profile, so drop it too"""
+    invalidate_cached_users([instance.user_id])
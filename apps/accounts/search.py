@@ -0,0 +1,55 @@
+"""
+User/profile search backed by UserProfile.search_document.
+
+On PostgreSQL the document carries a pg_trgm GIN index, so substring
+matches (``LIKE '%term%'``) are index scans and autocomplete results are
+ranked by trigram similarity. Terms shorter than a trigram would match
+nearly every row as substrings, so they only match the start of a word
+(``LIKE 'ab%'`` / ``LIKE '% ab%'``), which the same index serves through
+its word-boundary trigrams. Other databases (SQLite in tests) run the
+same LIKE filters without the index.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from .models import UserProfile
+
+# Shorter terms are matched as word prefixes
+MIN_SUBSTRING_TERM_LENGTH = 3
+
+
+def normalize_terms(query):
+    """Split a search box value into lower-cased terms"""
+    return query.lower().split()
+
+
+def filter_profiles(queryset, query, prefix=''):
+    """
+    Restrict ``queryset`` to rows whose search document contains every term.
+
+    ``prefix`` is the path from the queryset's model to UserProfile, e.g.
+    ``'profile__'`` for a User queryset.
+    """
+    field = f'{prefix}search_document'
+    for term in normalize_terms(query):
+        if len(term) < MIN_SUBSTRING_TERM_LENGTH:
+            queryset = queryset.filter(
+                Q(**{f'{field}__startswith': term}) | Q(**{f'{field}__contains': f' {term}'})
+            )
+        else:
+            queryset = queryset.filter(**{f'{field}__contains': term})
+    return queryset
+
+
+def autocomplete_profiles(query, limit=10):
+    """Best matching profiles for an autocomplete box"""
+    queryset = filter_profiles(UserProfile.objects.select_related('user'), query)
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        queryset = queryset.annotate(
+            similarity=TrigramSimilarity('search_document', query.lower())
+        ).order_by('-similarity', 'pk')
+    else:
+        queryset = queryset.order_by('user__email')
+    return queryset[:limit]
@@ -0,0 +1,109 @@
+from celery import shared_task
+from django.db import transaction
+from PIL import UnidentifiedImageError
+
+from core.mail import queue_emails
+from core.models import BackgroundJob
+
+from .identity import invalidate_cached_users
+from .images import delete_variant_files, store_variants, variant_names
+from .models import User, UserProfile
+from .tokens import issue_tokens, purge_expired_tokens
+from .utils import build_verification_email, build_judge_approval_email
+import logging
+
+logger = logging.getLogger(__name__)
+
+BULK_EMAIL_CHUNK_SIZE = 500
+
+JOB_JUDGE_APPROVAL_EMAILS = 'judge_approval_emails'
+JOB_VERIFICATION_EMAILS = 'verification_emails'
+
+
+def _build_emails(job, users):
+    if job.kind == JOB_JUDGE_APPROVAL_EMAILS:
+        return [build_judge_approval_email(user, job=job) for user in users]
+    if job.kind == JOB_VERIFICATION_EMAILS:
+        users = list(users)
+        tokens = issue_tokens(users)
+        return [
+            build_verification_email(
+                user,
+                base_url=job.payload['base_url'],
+                site_domain=job.payload['site_domain'],
+                token=tokens[user.pk],
+                job=job,
+            )
+            for user in users
+        ]
+    raise ValueError(f"Unknown account email job kind: {job.kind}")
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=60)
+def queue_bulk_account_emails(self, job_id):
+    """Render and queue the emails for a bulk admin action in chunks"""
+    job = BackgroundJob.objects.get(pk=job_id)
+    if job.is_finished:
+        return
+    if job.status != BackgroundJob.STATUS_RUNNING:
+        job.mark_running()
+
+    user_ids = job.payload.get('user_ids', [])
+    try:
+        # Each chunk commits together with its progress, so a retry
+        # resumes after the last committed chunk instead of re-sending.
+        for start in range(job.processed, len(user_ids), BULK_EMAIL_CHUNK_SIZE):
+            chunk = user_ids[start:start + BULK_EMAIL_CHUNK_SIZE]
+            users = User.objects.filter(pk__in=chunk).order_by('pk')
+            with transaction.atomic():
+                queue_emails(_build_emails(job, users))
+                job.advance(len(chunk))
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Bulk email job {job.pk} failed at {job.processed}, retrying: {str(e)}")
+            raise self.retry(exc=e)
+        logger.error(f"Bulk email job {job.pk} failed: {str(e)}")
+        job.mark_finished(error=str(e))
+        raise
+
+    job.mark_finished()
+    logger.info(f"Bulk email job {job.pk} queued {job.processed} emails")
+
+
+@shared_task(ignore_result=True)
+def purge_email_verifications():
+    """Periodic cleanup of expired verification tokens"""
+    deleted = purge_expired_tokens()
+    if deleted:
+        logger.info(f"Purged {deleted} expired email verification tokens")
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=30)
+def process_profile_image(self, profile_id, image_name, stale_variants=None):
+    """Render the size variants of a newly uploaded profile image"""
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if profile is None or profile.profile_image.name != image_name:
+        # Deleted or replaced since; the newer upload has its own task
+        return
+
+    try:
+        with profile.profile_image.open('rb') as source:
+            variants = store_variants(profile, source)
+    except (UnidentifiedImageError, ValueError) as e:
+        logger.warning(f"Could not process profile image {image_name}: {str(e)}")
+        return
+    except OSError as e:
+        raise self.retry(exc=e)
+
+    # Only record the variants if the image was not replaced meanwhile
+    updated = UserProfile.objects.filter(pk=profile_id, profile_image=image_name).update(
+        image_variants=variants
+    )
+    stale = variant_names(stale_variants or {})
+    if updated:
+        stale -= variant_names(variants)
+        invalidate_cached_users([profile.user_id])
+        logger.info(f"Processed profile image variants for user {profile.user_id}")
+    else:
+        stale |= variant_names(variants)
+    delete_variant_files(stale)
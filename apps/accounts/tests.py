@@ -1,3 +1,351 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from core.mail import queue_emails
+from core.models import BackgroundJob, OutboundEmail
+
+from .models import EmailVerification, User, UserProfile
+from .search import autocomplete_profiles, filter_profiles
+from .tasks import JOB_JUDGE_APPROVAL_EMAILS, process_profile_image, queue_bulk_account_emails
+from .tokens import TOKEN_INVALID, TOKEN_VALID, issue_token, purge_expired_tokens, validate_token
+
+
+def _account_writes(queries):
+    """Write statements that touch the accounts tables"""
+    return [
+        query['sql'] for query in queries
+        if query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        and 'accounts_' in query['sql']
+    ]
+
+
+class UserSaveWriteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password='s3cret-pass'
+        )
+
+    def test_login_makes_exactly_one_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(
+                self.client.login(email='student@example.com', password='s3cret-pass')
+            )
+        writes = _account_writes(ctx.captured_queries)
+        self.assertEqual(len(writes), 1, writes)
+        self.assertIn('last_login', writes[0])
+        self.assertIn('accounts_user', writes[0])
+
+    def test_unchanged_save_is_a_noop(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            user.save()
+
+    def test_save_writes_only_changed_fields(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_verified = True
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        writes = _account_writes(ctx.captured_queries)
+        self.assertEqual(len(writes), 1)
+        self.assertIn('is_verified', writes[0])
+        self.assertNotIn('accounts_userprofile', writes[0])
+        self.assertNotIn('"email"', writes[0])
+
+    def test_partial_refresh_keeps_other_changes_dirty(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_verified = True
+        User.objects.filter(pk=user.pk).update(first_name='Ada')
+        user.refresh_from_db(fields=['first_name'])
+        self.assertEqual(user.get_dirty_fields(), ['is_verified'])
+        user.save()
+        self.assertTrue(User.objects.get(pk=user.pk).is_verified)
+
+    def test_judge_signup_creates_profile_without_resaving_user(self):
+        with CaptureQueriesContext(connection) as ctx:
+            judge = User.objects.create_user(
+                username='judge', email='judge@example.com',
+                password='s3cret-pass', user_type='judge'
+            )
+        writes = _account_writes(ctx.captured_queries)
+        self.assertEqual(len(writes), 2, writes)
+        self.assertFalse(User.objects.get(pk=judge.pk).is_approved)
+        self.assertTrue(UserProfile.objects.filter(user=judge).exists())
+
+
+class ProfileCompletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='s3cret-pass'
+        )
+        self.client.force_login(self.admin)
+        # Warm the identity cache so both measurements see the same state
+        self.client.get('/admin/')
+
+    def _create_students(self, count, offset=0):
+        for i in range(offset, offset + count):
+            user = User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password=None
+            )
+            user.profile.first_name = 'Student'
+            user.profile.save()
+
+    def test_completion_score_is_maintained_on_save(self):
+        self._create_students(1)
+        profile = UserProfile.objects.get(user__username='student0')
+        self.assertEqual(profile.completion_score, 16)
+        profile.last_name = 'Example'
+        profile.save()
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).completion_score, 33)
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        for url in ('/admin/accounts/user/', '/admin/accounts/userprofile/'):
+            self._create_students(3, offset=len(User.objects.all()))
+            with CaptureQueriesContext(connection) as few:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self._create_students(20, offset=len(User.objects.all()))
+            with CaptureQueriesContext(connection) as many:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(len(few), len(many), url)
+
+
+class CachedIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.client.force_login(self.user)
+        self.client.get('/accounts/profile/')
+
+    def test_authenticated_page_view_skips_identity_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get('/accounts/profile/').status_code, 200)
+        identity = [
+            query['sql'] for query in ctx.captured_queries
+            if 'django_session' in query['sql'] or 'accounts_' in query['sql']
+        ]
+        self.assertEqual(identity, [])
+
+    def test_profile_save_invalidates_cached_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.first_name = 'Ada'
+            profile.save()
+        response = self.client.get('/accounts/profile/')
+        self.assertEqual(response.context['user'].profile.first_name, 'Ada')
+
+    def test_sessions_from_the_plain_model_backend_still_resolve(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get('/accounts/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.client.force_login(self.user)
+
+    def _upload(self):
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        Image.new('RGB', (1200, 800), (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+        upload = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+        response = self.client.post('/accounts/ajax/upload-image/', {'profile_image': upload})
+        self.assertTrue(response.json()['success'])
+
+    def test_upload_is_processed_into_variants(self):
+        # Processing is queued on commit; run the task directly here
+        self._upload()
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.image_variants, {})
+
+        process_profile_image(profile.pk, profile.profile_image.name)
+        profile.refresh_from_db()
+        self.assertEqual(set(profile.image_variants), {'avatar', 'thumbnail', 'card'})
+        with default_storage.open(profile.image_variants['avatar']['webp']) as stored:
+            avatar = Image.open(stored)
+            self.assertEqual((avatar.format, avatar.size), ('WEBP', (64, 64)))
+            self.assertFalse(avatar.getexif())
+
+    def test_rejects_non_image(self):
+        upload = SimpleUploadedFile('me.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.post('/accounts/ajax/upload-image/', {'profile_image': upload})
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(UserProfile.objects.get(user=self.user).profile_image)
+
+    @override_settings(MAX_IMAGE_SIZE=1024, MAX_FILE_SIZE=1024)
+    def test_oversize_upload_is_reported_past_csrf_checks(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = 'a' * 32
+        client.cookies['csrftoken'] = token
+        upload = SimpleUploadedFile('me.jpg', b'\xff\xd8\xff' + bytes(2 * 1024 * 1024))
+        # The token comes before the file, as browsers send form fields in order
+        response = client.post(
+            '/accounts/ajax/upload-image/', {'csrfmiddlewaretoken': token, 'profile_image': upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['success'])
+        self.assertIn('too large', response.json()['error'])
+        self.assertFalse(UserProfile.objects.get(user=self.user).profile_image)
+
+
+
+@override_settings(EMAIL_OUTBOX_DELIVER_ON_COMMIT=False)
+class BulkEmailJobTests(TestCase):
+    def test_failed_chunk_is_retried_and_resumes_where_it_stopped(self):
+        judges = [
+            User.objects.create_user(
+                username=f'judge{i}', email=f'judge{i}@example.com', password=None, user_type='judge'
+            )
+            for i in range(3)
+        ]
+        job = BackgroundJob.objects.create(
+            kind=JOB_JUDGE_APPROVAL_EMAILS, total=3, payload={'user_ids': [j.pk for j in judges]}
+        )
+        calls = []
+
+        def flaky_queue(emails):
+            calls.append(len(emails))
+            if len(calls) == 2:
+                raise ConnectionError('Database went away')
+            queue_emails(emails)
+
+        with mock.patch('accounts.tasks.BULK_EMAIL_CHUNK_SIZE', 1), \
+                mock.patch('accounts.tasks.queue_emails', flaky_queue):
+            queue_bulk_account_emails.apply(args=[job.pk])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (BackgroundJob.STATUS_SUCCEEDED, 3))
+        # The first chunk was not queued a second time
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(OutboundEmail.objects.filter(job=job).count(), 3)
+
+
+class BenchmarkCommandTests(TestCase):
+    @override_settings(DEBUG=False)
+    def test_refuses_to_run_without_debug(self):
+        with self.assertRaisesMessage(CommandError, '--force'):
+            call_command('benchmark_user_admin', users=10)
+        self.assertFalse(User.objects.exists())
+
+    @override_settings(DEBUG=True)
+    def test_seeded_users_are_searchable(self):
+        call_command('benchmark_user_admin', users=6, runs=1, max_ms=60000, stdout=io.StringIO())
+        users = filter_profiles(User.objects.all(), 'bench-user-4', prefix='profile__')
+        self.assertEqual(list(users.values_list('username', flat=True)), ['bench-user-4'])
+
+
+class ProfileSearchTests(TestCase):
+    def setUp(self):
+        for username, organization in (('alice', 'Lincoln High'), ('bob', 'Valley College')):
+            user = User.objects.create_user(
+                username=username, email=f'{username}@example.com', password=None
+            )
+            user.profile.school_organization = organization
+            user.profile.save()
+
+    def _usernames(self, query):
+        users = filter_profiles(User.objects.all(), query, prefix='profile__')
+        return sorted(users.values_list('username', flat=True))
+
+    def test_terms_match_anywhere_in_the_document(self):
+        self.assertEqual(self._usernames('LICE'), ['alice'])
+        self.assertEqual(self._usernames('example lincoln'), ['alice'])
+        self.assertEqual(self._usernames('valley lincoln'), [])
+
+    def test_short_terms_match_word_prefixes_only(self):
+        # "li" is inside "alice" but only starts a word in "lincoln"
+        self.assertEqual(self._usernames('li'), ['alice'])
+        self.assertEqual(self._usernames('co'), ['bob'])
+        self.assertEqual(self._usernames('ic'), [])
+        self.assertEqual(self._usernames('b'), ['bob'])
+
+    def test_autocomplete_orders_by_email_without_trigram_ranking(self):
+        # SQLite has no pg_trgm: same filters, deterministic ordering
+        results = autocomplete_profiles('example.com')
+        self.assertEqual([profile.user.username for profile in results], ['alice', 'bob'])
+        self.assertEqual(len(autocomplete_profiles('example.com', limit=1)), 1)
+
+    def test_admin_changelist_search(self):
+        cache.clear()
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password=None
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/admin/accounts/user/', {'q': 'valley'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user.username for user in response.context['cl'].result_list], ['bob'])
+
+
+class VerificationTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password=None
+        )
+        self.uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+
+    def _check(self, token):
+        return validate_token(self.uid, token)[0]
+
+    def _issue_at(self, when):
+        # Tokens embed their timestamp; distinct times give distinct tokens
+        with mock.patch.object(default_token_generator, '_now', return_value=when):
+            return issue_token(self.user)
+
+    def test_issued_link_is_valid(self):
+        self.assertEqual(self._check(issue_token(self.user)), TOKEN_VALID)
+
+    def test_superseded_link_is_invalid(self):
+        now = datetime.now()
+        old = self._issue_at(now - timedelta(minutes=5))
+        new = self._issue_at(now)
+        self.assertNotEqual(old, new)
+        self.assertEqual(self._check(old), TOKEN_INVALID)
+        self.assertEqual(self._check(new), TOKEN_VALID)
+
+    def test_expired_and_purged_links_are_invalid(self):
+        token = issue_token(self.user)
+        EmailVerification.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self._check(token), TOKEN_INVALID)
+        cache.clear()
+        self.assertEqual(purge_expired_tokens(), 1)
+        self.assertEqual(self._check(token), TOKEN_INVALID)
+
+    def test_legacy_links_only_before_the_cutoff_and_without_rows(self):
+        token = default_token_generator.make_token(self.user)
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        with self.settings(EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL=''):
+            self.assertEqual(self._check(token), TOKEN_INVALID)
+        cache.clear()
+        with self.settings(EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL=timezone.localdate().isoformat()):
+            self.assertEqual(self._check(token), TOKEN_INVALID)
+        cache.clear()
+        with self.settings(EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL=tomorrow):
+            self.assertEqual(self._check(token), TOKEN_VALID)
+            # Once the store has issued a link, only stored links count
+            self._issue_at(datetime.now() - timedelta(minutes=5))
+            self.assertEqual(self._check(token), TOKEN_INVALID)
@@ -0,0 +1,145 @@
+"""
+Email verification token store.
+
+Every verification link we send is recorded as an EmailVerification row.
+Issuing a new link supersedes the user's previous live rows, so resends
+cannot grow the table without bound. Validation results are cached for a
+short TTL, so link-scanning mail proxies that fetch the same URL again
+and again never reach the database.
+
+A link is only valid while its row is live: superseded, expired and
+purged links are rejected even though the signed token still checks out.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+
+from .models import User, EmailVerification
+
+# Outcomes of validating a verification link
+TOKEN_VALID = 'valid'
+TOKEN_ALREADY_VERIFIED = 'already_verified'
+TOKEN_INVALID = 'invalid'
+
+
+def _expiry():
+    return timezone.now() + timedelta(hours=settings.EMAIL_VERIFICATION_TOKEN_LIFETIME)
+
+
+def issue_token(user):
+    """Create a verification token for ``user``, superseding older ones"""
+    return issue_tokens([user])[user.pk]
+
+
+def issue_tokens(users):
+    """Issue tokens for many users with one DELETE and one INSERT"""
+    tokens = {user.pk: default_token_generator.make_token(user) for user in users}
+    if not tokens:
+        return tokens
+    expires_at = _expiry()
+    with transaction.atomic():
+        EmailVerification.objects.filter(user_id__in=tokens, is_used=False).delete()
+        EmailVerification.objects.bulk_create(
+            [
+                EmailVerification(
+                    user=user, email=user.email, token=tokens[user.pk], expires_at=expires_at
+                )
+                for user in users
+            ],
+            ignore_conflicts=True,
+        )
+    return tokens
+
+
+def _cache_key(uidb64, token):
+    digest = hashlib.sha256(f'{uidb64}:{token}'.encode()).hexdigest()
+    return f'accounts:verify:{digest}'
+
+
+def validate_token(uidb64, token):
+    """
+    Check a verification link.
+
+    Returns ``(outcome, user)``; ``user`` is None when the outcome was
+    served from cache. Terminal outcomes (already verified / invalid) are
+    cached, a valid link is not, because it is about to be consumed.
+    """
+    key = _cache_key(uidb64, token)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, None
+
+    outcome, user = _validate_uncached(uidb64, token)
+    if outcome != TOKEN_VALID:
+        cache.set(key, outcome, settings.EMAIL_VERIFICATION_CACHE_TIMEOUT)
+    return outcome, user
+
+
+def _legacy_link_allowed(user):
+    """Links from before the store existed: only for users it never issued to"""
+    cutoff = parse_date(settings.EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL or '')
+    if cutoff is None or timezone.localdate() >= cutoff:
+        return False
+    return not EmailVerification.objects.filter(user=user).exists()
+
+
+def _validate_uncached(uidb64, token):
+    try:
+        uid = force_str(urlsafe_base64_decode(uidb64))
+        user = User.objects.get(pk=uid)
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        return TOKEN_INVALID, None
+
+    if not default_token_generator.check_token(user, token):
+        return TOKEN_INVALID, user
+
+    record = EmailVerification.objects.filter(user=user, token=token).first()
+    if record is None:
+        live = _legacy_link_allowed(user)
+    else:
+        live = not record.is_used and not record.is_expired
+    if not live:
+        return (TOKEN_ALREADY_VERIFIED if user.is_verified else TOKEN_INVALID), user
+
+    if user.is_verified:
+        return TOKEN_ALREADY_VERIFIED, user
+    return TOKEN_VALID, user
+
+
+def consume_token(uidb64, token, user):
+    """Mark a token used and remember the outcome for repeat visits"""
+    EmailVerification.objects.filter(user=user, token=token, is_used=False).update(is_used=True)
+    cache.set(
+        _cache_key(uidb64, token),
+        TOKEN_ALREADY_VERIFIED,
+        settings.EMAIL_VERIFICATION_CACHE_TIMEOUT,
+    )
+
+
+def purge_expired_tokens(batch_size=1000, max_batches=None):
+    """
+    Delete expired tokens (used or not) in small batches.
+
+    Each batch is a separate short statement over at most ``batch_size``
+    rows found through the expires_at index, so the purge never holds long
+    locks. Returns the number of rows deleted.
+    """
+    expired = EmailVerification.objects.filter(expires_at__lt=timezone.now()).order_by()
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        count, _ = EmailVerification.objects.filter(pk__in=ids).delete()
+        deleted += count
+        batches += 1
+    return deleted
@@ -33,6 +33,7 @@ urlpatterns = [
    
    # AJAX
    path('ajax/upload-image/', views.ProfileImageUploadView.as_view(), name='upload_image'),
+   path('ajax/user-search/', views.UserSearchView.as_view(), name='user_search'),
    
    # Password Reset
    path('password-reset/', views.CustomPasswordResetView.as_view(), name='password_reset'),
@@ -1,40 +1,46 @@
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
+from core.mail import queue_mail, queue_emails, build_outbound_email
+from .tokens import issue_token
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def build_verification_email(user, base_url, site_domain, token=None, job=None):
+    """Build an unsaved outbox row for a verification email"""
+    verification_link = f"{base_url.rstrip('/')}{user.get_verification_path(token)}"
+    html_message = render_to_string('emails/verification_email.html', {
+        'user': user,
+        'verification_link': verification_link,
+        'site_name': 'Video Platform',
+        'site_domain': site_domain,
+    })
+    return build_outbound_email(
+        subject='Verify your Video Platform account',
+        message=strip_tags(html_message),
+        recipient_list=[user.email],
+        html_message=html_message,
+        job=job,
+    )
+
+
 def send_verification_email(user, request):
     """Send email verification email to user"""
     try:
-        # Generate verification link
-        verification_link = user.get_verification_link(request)
-        
-        # Render email template
-        subject = 'Verify your Video Platform account'
-        html_message = render_to_string('emails/verification_email.html', {
-            'user': user,
-            'verification_link': verification_link,
-            'site_name': 'Video Platform',
-            'site_domain': get_current_site(request).domain,
-        })
-        plain_message = strip_tags(html_message)
-        
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
+        email = build_verification_email(
+            user,
+            base_url=request.build_absolute_uri('/'),
+            site_domain=get_current_site(request).domain,
+            token=issue_token(user),
         )
         
-        logger.info(f"Verification email sent to {user.email}")
+        # Queue email for background delivery
+        queue_emails([email])
+        
+        logger.info(f"Verification email queued for {user.email}")
         return True
         
     except Exception as e:
@@ -52,16 +58,15 @@ def send_welcome_email(user):
         })
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
             html_message=html_message,
-            fail_silently=True,
+            dedupe_key=f'welcome:{user.pk}',
         )
         
-        logger.info(f"Welcome email sent to {user.email}")
+        logger.info(f"Welcome email queued for {user.email}")
         return True
         
     except Exception as e:
@@ -69,26 +74,30 @@ def send_welcome_email(user):
         return False
 
 
+def build_judge_approval_email(user, job=None):
+    """Build an unsaved outbox row for a judge approval notification"""
+    html_message = render_to_string('emails/judge_approval_email.html', {
+        'user': user,
+        'site_name': 'Video Platform',
+    })
+    return build_outbound_email(
+        subject='Your judge application has been approved!',
+        message=strip_tags(html_message),
+        recipient_list=[user.email],
+        html_message=html_message,
+        dedupe_key=f'judge-approved:{user.pk}',
+        job=job,
+    )
+
+
 def send_judge_approval_notification(user):
     """Send notification when judge is approved"""
     try:
-        subject = 'Your judge application has been approved!'
-        html_message = render_to_string('emails/judge_approval_email.html', {
-            'user': user,
-            'site_name': 'Video Platform',
-        })
-        plain_message = strip_tags(html_message)
+        email = build_judge_approval_email(user)
         
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=True,
-        )
+        queue_emails([email])
         
-        logger.info(f"Judge approval email sent to {user.email}")
+        logger.info(f"Judge approval email queued for {user.email}")
         return True
         
     except Exception as e:
@@ -110,16 +119,15 @@ def notify_admin_new_judge(user):
         })
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=admin_emails,
             html_message=html_message,
-            fail_silently=True,
+            dedupe_key=f'admin-new-judge:{user.pk}',
         )
         
-        logger.info(f"Admin notification sent for new judge: {user.email}")
+        logger.info(f"Admin notification queued for new judge: {user.email}")
         return True
         
     except Exception as e:
@@ -138,76 +146,15 @@ def send_deactivation_email(user, deactivation):
         })
         plain_message = strip_tags(html_message)
         
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=True,
-        )
-        
-        logger.info(f"Deactivation email sent to {user.email}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to send deactivation email to {user.email}: {str(e)}")
-        return False
-
-
-def notify_admin_reactivation_request(email, message):
-    """Notify admin of reactivation request"""
-    try:
-        admin_emails = [admin[1] for admin in settings.ADMINS]
-        if not admin_emails:
-            return False
-            
-        subject = f'Account Reactivation Request: {email}'
-        html_message = render_to_string('emails/admin_reactivation_request.html', {
-            'email': email,
-            'message': message,
-            'site_name': 'Video Platform',
-        })
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=admin_emails,
-            html_message=html_message,
-            fail_silently=True,
-        )
-        
-        logger.info(f"Admin notification sent for reactivation request: {email}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Failed to send admin notification for reactivation {email}: {str(e)}")
-        return False
-
-
-def send_deactivation_email(user, deactivation):
-    """Send account deactivation confirmation email"""
-    try:
-        subject = 'Account Deactivated - Video Platform'
-        html_message = render_to_string('emails/deactivation_email.html', {
-            'user': user,
-            'deactivation': deactivation,
-            'site_name': 'Video Platform',
-        })
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
             html_message=html_message,
-            fail_silently=True,
+            dedupe_key=f'deactivated:{user.pk}',
         )
         
-        logger.info(f"Deactivation email sent to {user.email}")
+        logger.info(f"Deactivation email queued for {user.email}")
         return True
         
     except Exception as e:
@@ -230,16 +177,14 @@ def notify_admin_reactivation_request(email, message):
         })
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=admin_emails,
             html_message=html_message,
-            fail_silently=True,
         )
         
-        logger.info(f"Admin notification sent for reactivation request: {email}")
+        logger.info(f"Admin notification queued for reactivation request: {email}")
         return True
         
     except Exception as e:
@@ -257,16 +202,14 @@ def send_reactivation_approval_email(user):
         })
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_mail(
             subject=subject,
             message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
             html_message=html_message,
-            fail_silently=True,
         )
         
-        logger.info(f"Reactivation approval email sent to {user.email}")
+        logger.info(f"Reactivation approval email queued for {user.email}")
         return True
         
     except Exception as e:
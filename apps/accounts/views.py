@@ -1,27 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView, CreateView, UpdateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import login, logout
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponseRedirect
 from django.views import View
-from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_decode
-from django.utils.encoding import force_str
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from core.ratelimit import RateLimitMixin
+from core.storage import sign_urls
+from evaluations.leaderboard import board_size, student_standing
+from evaluations.models import JudgeAssignment, VideoEvaluation
 from .models import User, UserProfile, EmailVerification
+from .images import validate_profile_image, variant_names
 from .forms import CustomUserCreationForm, UserProfileForm, UserAccountForm
+from .search import autocomplete_profiles
+from .tokens import validate_token, consume_token, TOKEN_VALID, TOKEN_ALREADY_VERIFIED
 from .utils import send_verification_email, send_welcome_email, send_judge_approval_notification, notify_admin_new_judge
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class SignUpView(CreateView):
+class SignUpView(RateLimitMixin, CreateView):
     model = User
+    ratelimit_rules = [('ip', '10/h'), ('email', '3/h')]
     form_class = CustomUserCreationForm
     template_name = 'accounts/signup.html'
     success_url = reverse_lazy('accounts:verification_sent')
@@ -64,47 +70,43 @@ class EmailVerificationView(View):
     """Handle email verification from link"""
     
     def get(self, request, uidb64, token):
-        try:
-            # Decode user ID
-            uid = force_str(urlsafe_base64_decode(uidb64))
-            user = User.objects.get(pk=uid)
+        # Repeat hits (e.g. mail proxies scanning links) are answered from
+        # the token cache without touching the database
+        outcome, user = validate_token(uidb64, token)
+        
+        if outcome == TOKEN_VALID:
+            user.is_verified = True
+            user.save()
+            consume_token(uidb64, token, user)
             
-            # Check token validity
-            if default_token_generator.check_token(user, token):
-                if not user.is_verified:
-                    user.is_verified = True
-                    user.save()
-                    
-                    # Send welcome email
-                    send_welcome_email(user)
-                    
-                    messages.success(
-                        request,
-                        'Email verified successfully! Your account is now active.'
-                    )
-                    
-                    # Auto-login the user
-                    login(request, user)
-                    
-                    # Redirect based on user type and approval status
-                    if user.is_judge and not user.is_approved:
-                        return redirect('accounts:pending_approval')
-                    else:
-                        return redirect('accounts:dashboard')
-                else:
-                    messages.info(request, 'Email already verified.')
-                    return redirect('accounts:login')
+            # Send welcome email
+            send_welcome_email(user)
+            
+            messages.success(
+                request,
+                'Email verified successfully! Your account is now active.'
+            )
+            
+            # Auto-login the user
+            login(request, user)
+            
+            # Redirect based on user type and approval status
+            if user.is_judge and not user.is_approved:
+                return redirect('accounts:pending_approval')
             else:
-                messages.error(request, 'Invalid or expired verification link.')
-                return redirect('accounts:resend_verification')
-                
-        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-            messages.error(request, 'Invalid verification link.')
-            return redirect('accounts:resend_verification')
+                return redirect('accounts:dashboard')
+        
+        if outcome == TOKEN_ALREADY_VERIFIED:
+            messages.info(request, 'Email already verified.')
+            return redirect('accounts:login')
+        
+        messages.error(request, 'Invalid or expired verification link.')
+        return redirect('accounts:resend_verification')
 
 
-class ResendVerificationView(TemplateView):
+class ResendVerificationView(RateLimitMixin, TemplateView):
     template_name = 'accounts/resend_verification.html'
+    ratelimit_rules = [('ip', '10/h'), ('email', '3/h')]
     
     def post(self, request):
         email = request.POST.get('email')
@@ -158,6 +160,13 @@ class ProfileEditView(LoginRequiredMixin, UpdateView):
         kwargs['user'] = self.request.user
         return kwargs
     
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        upload_error = getattr(self.request, 'upload_error', None)
+        if upload_error:
+            form.add_error('profile_image', upload_error)
+        return form
+    
     def form_valid(self, form):
         messages.success(self.request, 'Profile updated successfully!')
         return super().form_valid(form)
@@ -221,13 +230,26 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         
         # Student-specific context
         if user.is_student:
-            context['total_videos'] = 0  # Will implement in Week 2
-            context['pending_evaluations'] = 0  # Will implement in Week 3
+            counts = user.video_submissions.aggregate(
+                total=Count('pk'),
+                # Not yet scored by any judge
+                pending=Count('pk', filter=Q(score_summary__isnull=True)),
+            )
+            context['total_videos'] = counts['total']
+            context['pending_evaluations'] = counts['pending']
+            context['standing'] = student_standing(user)
+            if context['standing']:
+                context['ranked_count'] = board_size()
         
         # Judge-specific context
         elif user.is_judge:
-            context['videos_to_review'] = 0  # Will implement in Week 3
-            context['completed_reviews'] = 0  # Will implement in Week 3
+            completed = VideoEvaluation.objects.filter(
+                judge=user, status=VideoEvaluation.STATUS_COMPLETED
+            )
+            context['videos_to_review'] = user.judge_assignments.filter(
+                status=JudgeAssignment.STATUS_ASSIGNED, video__is_active=True
+            ).count()
+            context['completed_reviews'] = completed.count()
         
         return context
 
@@ -249,24 +271,43 @@ class ProfileImageUploadView(LoginRequiredMixin, View):
     """AJAX view for profile image upload"""
     
     def post(self, request):
-        if 'profile_image' in request.FILES:
+        files = request.FILES
+        upload_error = getattr(request, 'upload_error', None)
+        if upload_error:
+            # Rejected by core.uploadhandlers while streaming in
+            return JsonResponse({
+                'success': False,
+                'error': upload_error
+            })
+
+        if 'profile_image' in files:
             image = request.FILES['profile_image']
             
-            # Basic validation
-            if image.size > 5 * 1024 * 1024:  # 5MB limit
+            try:
+                validate_profile_image(image)
+            except ValidationError as e:
                 return JsonResponse({
                     'success': False, 
-                    'error': 'Image too large (max 5MB)'
+                    'error': e.messages[0]
                 })
             
-            # Save image to profile
+            # Save image to profile; size variants are rendered by a worker
             profile = request.user.profile
             profile.profile_image = image
             profile.save()
+            profile.refresh_from_db(fields=['image_variants'])
+            # Sign every variant URL in one batch
+            sign_urls(variant_names(profile.image_variants))
             
             return JsonResponse({
                 'success': True,
-                'image_url': profile.profile_image.url
+                'image_url': profile.avatar_urls['jpeg'],
+                'images': {
+                    'avatar': profile.avatar_urls,
+                    'thumbnail': profile.thumbnail_urls,
+                    'card': profile.card_urls,
+                },
+                'processing': not profile.image_variants,
             })
         
         return JsonResponse({
@@ -275,17 +316,42 @@ class ProfileImageUploadView(LoginRequiredMixin, View):
         })
 
 
+class UserSearchView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """AJAX autocomplete over users and profiles (staff only)"""
+    
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if len(query) < 2:
+            return JsonResponse({'results': []})
+        
+        results = [
+            {
+                'id': profile.user.pk,
+                'email': profile.user.email,
+                'username': profile.user.username,
+                'name': profile.full_name,
+                'user_type': profile.user.user_type,
+            }
+            for profile in autocomplete_profiles(query)
+        ]
+        return JsonResponse({'results': results})
+
+
 # Password Reset Views (using Django's built-in views with custom templates)
 from django.contrib.auth.views import (
     PasswordResetView, PasswordResetDoneView, 
     PasswordResetConfirmView, PasswordResetCompleteView
 )
 
-class CustomPasswordResetView(PasswordResetView):
+class CustomPasswordResetView(RateLimitMixin, PasswordResetView):
     template_name = 'accounts/password_reset.html'
     email_template_name = 'emails/password_reset_email.html'
     html_email_template_name = 'emails/password_reset_email.html'
     success_url = reverse_lazy('accounts:password_reset_done')
+    ratelimit_rules = [('ip', '10/h'), ('email', '3/h')]
 
 
 class CustomPasswordResetDoneView(PasswordResetDoneView):
@@ -1,3 +1,120 @@
 from django.contrib import admin
+from django.contrib import messages
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.html import format_html
+from django.template.defaultfilters import filesizeformat
+from .models import BackgroundJob, ContentBlob, OutboundEmail
 
-# Register your models here.
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """Read-only job list; the change page doubles as a progress page"""
+    change_form_template = 'admin/core/backgroundjob/change_form.html'
+    list_display = ('__str__', 'kind', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('created_by',)
+    readonly_fields = (
+        'kind', 'description', 'status', 'progress_display', 'delivery_display',
+        'result_display', 'error', 'created_by', 'created_at', 'started_at', 'finished_at'
+    )
+    fields = readonly_fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        job = self.get_object(request, object_id)
+        extra_context = extra_context or {}
+        extra_context['job_in_progress'] = job is not None and (
+            not job.is_finished
+            or job.emails.filter(status=OutboundEmail.STATUS_PENDING).exists()
+        )
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def progress_display(self, obj):
+        return f'{obj.processed} / {obj.total} ({obj.progress_percentage}%)'
+    progress_display.short_description = 'Progress'
+
+    def delivery_display(self, obj):
+        """Delivery state of any emails queued by this job"""
+        counts = obj.emails.aggregate(
+            sent=Count('pk', filter=Q(status=OutboundEmail.STATUS_SENT)),
+            pending=Count('pk', filter=Q(status=OutboundEmail.STATUS_PENDING)),
+            failed=Count('pk', filter=Q(status=OutboundEmail.STATUS_FAILED)),
+        )
+        if not any(counts.values()):
+            return '-'
+        return format_html(
+            '<span style="color: green;">{} sent</span>, '
+            '<span style="color: orange;">{} pending</span>, '
+            '<span style="color: red;">{} failed</span>',
+            counts['sent'], counts['pending'], counts['failed']
+        )
+    delivery_display.short_description = 'Email Delivery'
+
+    def result_display(self, obj):
+        """Download link for jobs that store a file (payload['file'])"""
+        name = obj.payload.get('file')
+        if obj.status != BackgroundJob.STATUS_SUCCEEDED or not name:
+            return '-'
+        return format_html('<a href="{}">Download {}</a>', default_storage.url(name), name.rsplit('/', 1)[-1])
+    result_display.short_description = 'Result'
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient_display', 'status_display', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('=dedupe_key', 'subject')
+    readonly_fields = (
+        'dedupe_key', 'subject', 'body', 'html_body', 'from_email', 'recipients',
+        'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at'
+    )
+    actions = ['retry_failed']
+
+    def recipient_display(self, obj):
+        return ', '.join(obj.recipients)
+    recipient_display.short_description = 'Recipients'
+
+    def status_display(self, obj):
+        colors = {
+            OutboundEmail.STATUS_SENT: 'green',
+            OutboundEmail.STATUS_PENDING: 'orange',
+            OutboundEmail.STATUS_FAILED: 'red',
+        }
+        return format_html(
+            '<span style="color: {};">{}</span>',
+            colors.get(obj.status, 'gray'), obj.get_status_display()
+        )
+    status_display.short_description = 'Status'
+
+    def retry_failed(self, request, queryset):
+        """Put failed emails back in the queue"""
+        count = queryset.filter(status=OutboundEmail.STATUS_FAILED).update(
+            status=OutboundEmail.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{count} emails re-queued.', messages.SUCCESS)
+    retry_failed.short_description = "Retry selected failed emails"
+
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'name', 'size_display', 'ref_count', 'created_at')
+    search_fields = ('=digest', '=name')
+    readonly_fields = ('digest', 'name', 'size', 'ref_count', 'derived', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Blobs are deleted by their last reference (core.blobs.release_blob)
+        return False
+
+    def size_display(self, obj):
+        return filesizeformat(obj.size)
+    size_display.short_description = 'Size'
+    size_display.admin_order_field = 'size'
@@ -0,0 +1,82 @@
+"""
+Content-addressed, reference-counted storage (ContentBlob).
+
+Uploads are hashed while they are read. ``acquire_blob`` then either
+registers the freshly stored object as the blob for its digest, or hands
+back the existing blob, in which case the caller drops its own copy and
+points at the blob instead. Storage use, and any processing keyed by the
+digest, then scales with unique content rather than with upload attempts.
+
+The blob row is locked while its count changes, so a concurrent acquire
+and release of the same content cannot lose the object.
+"""
+import hashlib
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+
+from .models import ContentBlob
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream):
+    """Return ``(sha256 hex digest, size)`` of a binary stream"""
+    sha256 = hashlib.sha256()
+    size = 0
+    while True:
+        data = stream.read(HASH_CHUNK_SIZE)
+        if not data:
+            break
+        sha256.update(data)
+        size += len(data)
+    return sha256.hexdigest(), size
+
+
+def hash_file(path):
+    with open(path, 'rb') as handle:
+        return hash_stream(handle)
+
+
+def acquire_blob(digest, size, name):
+    """
+    Take a reference on the blob for ``digest``.
+
+    ``name`` is the caller's stored copy; it becomes the blob's object if
+    the content is new. Returns ``(blob, created)``. When ``created`` is
+    False and ``blob.name != name`` the caller's copy is redundant.
+    Must be called inside a transaction.
+    """
+    blob, created = ContentBlob.objects.select_for_update().get_or_create(
+        digest=digest, defaults={'name': name, 'size': size}
+    )
+    ContentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    blob.ref_count += 1
+    return blob, created
+
+
+def release_blob(blob_id):
+    """Drop a reference; the last one deletes the blob and its object"""
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            ContentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        blob.delete()
+        transaction.on_commit(lambda: default_storage.delete(blob.name))
+    logger.info(f"Content blob {blob.digest} released")
+
+
+def record_derived(blob_id, key, value):
+    """Store a processing output for the blob's content under ``key``"""
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().get(pk=blob_id)
+        blob.derived[key] = value
+        blob.save(update_fields=['derived', 'updated_at'])
+    return blob
@@ -0,0 +1,188 @@
+"""
+Transactional email outbox.
+
+Web requests call ``queue_mail``/``queue_emails`` which perform a single
+INSERT. The outbox worker (``deliver_outbox``, run by Celery beat or
+``manage.py process_email_outbox``) drains due rows over one SMTP
+connection per batch and retries failures with exponential backoff.
+
+Dedupe keys are scoped to a window (``EMAIL_OUTBOX_DEDUPE_WINDOW``
+seconds): retries and double submits within it collapse into one
+message, while a genuine repeat later on (a second deactivation, another
+reactivation request) is sent again.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _default_dedupe_key(subject, body, recipients):
+    digest = hashlib.sha256()
+    for part in (subject, body, *sorted(recipients)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return f"content:{digest.hexdigest()}"
+
+
+def _windowed(dedupe_key):
+    window = int(time.time() // settings.EMAIL_OUTBOX_DEDUPE_WINDOW)
+    return f"{dedupe_key}@{window}"
+
+
+def build_outbound_email(subject, message, recipient_list, html_message='',
+                         from_email=None, dedupe_key=None, job=None):
+    """Build an unsaved OutboundEmail row (for use with bulk_create)"""
+    recipients = list(recipient_list)
+    return OutboundEmail(
+        dedupe_key=_windowed(dedupe_key or _default_dedupe_key(subject, message, recipients)),
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=recipients,
+        job=job,
+    )
+
+
+def queue_emails(emails):
+    """
+    Insert prepared OutboundEmail rows in one statement.
+
+    Rows whose ``dedupe_key`` is already in the outbox are skipped, so
+    retried requests and double submits within the dedupe window never
+    produce duplicate mail.
+    """
+    # INSERT ... ON CONFLICT DO NOTHING: one statement, idempotent
+    OutboundEmail.objects.bulk_create(emails, ignore_conflicts=True)
+
+    if settings.EMAIL_OUTBOX_DELIVER_ON_COMMIT:
+        from .tasks import drain_email_outbox
+        transaction.on_commit(drain_email_outbox.delay)
+
+
+def queue_mail(subject, message, recipient_list, html_message='',
+               from_email=None, dedupe_key=None):
+    """Queue an email for background delivery (drop-in for ``send_mail``)"""
+    queue_emails([
+        build_outbound_email(
+            subject, message, recipient_list,
+            html_message=html_message,
+            from_email=from_email,
+            dedupe_key=dedupe_key,
+        )
+    ])
+
+
+def _retry_delay(attempts):
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 60 * 60))
+
+
+def _to_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def deliver_outbox(batch_size=None):
+    """
+    Deliver one batch of due emails over a single connection.
+
+    Rows are claimed in a short transaction with ``SELECT ... FOR UPDATE
+    SKIP LOCKED``, which leases them by moving ``next_attempt_at``
+    ``EMAIL_OUTBOX_LEASE_SECONDS`` ahead, so several workers can drain the
+    outbox concurrently without sending twice. Sending happens outside
+    any transaction; a worker that dies mid-batch leaves its rows to be
+    picked up again once the lease runs out.
+    Returns the number of rows processed.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if not batch:
+            return 0
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        )
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Could not reach the mail server at all: push the whole batch back
+        logger.error(f"Email outbox could not open connection: {str(e)}")
+        for email in batch:
+            _mark_failed_attempt(email, e, max_attempts)
+        OutboundEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error']
+        )
+        return len(batch)
+
+    try:
+        for email in batch:
+            try:
+                _to_message(email, connection).send()
+            except Exception as e:
+                logger.warning(f"Email outbox delivery failed for {email.pk}: {str(e)}")
+                _mark_failed_attempt(email, e, max_attempts)
+            else:
+                email.attempts += 1
+                email.status = OutboundEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+
+    sent = sum(1 for email in batch if email.status == OutboundEmail.STATUS_SENT)
+    logger.info(f"Email outbox delivered {sent}/{len(batch)} messages")
+    return len(batch)
+
+
+def _mark_failed_attempt(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = OutboundEmail.STATUS_FAILED
+    else:
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+
+
+def drain_outbox(max_batches=None):
+    """Deliver batches until the outbox has no due rows left"""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        processed = deliver_outbox()
+        if not processed:
+            break
+        total += processed
+        batches += 1
+    return total
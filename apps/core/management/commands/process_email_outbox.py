@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued transactional emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to sleep between polls when --loop is set',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = drain_outbox()
+            if delivered:
+                self.stdout.write(f'Processed {delivered} queued emails.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
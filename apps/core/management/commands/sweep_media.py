@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sweeper import sweep_orphaned_media
+
+
+class Command(BaseCommand):
+    help = 'Delete stored media files that no database row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List orphaned files without deleting them',
+        )
+        parser.add_argument(
+            '--prefix', action='append', choices=list(settings.MEDIA_SWEEP_RULES),
+            help='Only sweep this prefix (repeatable)',
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=settings.MEDIA_SWEEP_PAGE_SIZE,
+            help='Objects listed and checked per batch',
+        )
+        parser.add_argument(
+            '--rate', type=int, default=settings.MEDIA_SWEEP_RATE,
+            help='Maximum deletes per second (0: unlimited)',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=settings.MEDIA_SWEEP_GRACE_HOURS,
+            help='Only delete files older than this',
+        )
+
+    def handle(self, *args, **options):
+        def report(names):
+            for name in names:
+                self.stdout.write(name)
+
+        stats = sweep_orphaned_media(
+            dry_run=options['dry_run'],
+            prefixes=options['prefix'],
+            page_size=options['page_size'],
+            rate=options['rate'],
+            grace=timedelta(hours=options['grace_hours']),
+            report=report if options['dry_run'] or options['verbosity'] > 1 else None,
+        )
+        if options['dry_run']:
+            summary = f"Dry run: {stats['orphaned']} of {stats['scanned']} files are orphaned."
+        else:
+            summary = f"Deleted {stats['deleted']} orphaned files ({stats['scanned']} scanned)."
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,156 @@
+"""
+Media file serving for deployments without GCS.
+
+``serve_file`` answers conditional and byte-range requests itself (ETag,
+``If-None-Match``/``If-Modified-Since``, ``Range`` and ``If-Range``; one
+range per request, which is what video players send). With
+``MEDIA_SENDFILE_BACKEND`` set, the byte transfer is then handed to the
+front server:
+
+- ``nginx``: ``X-Accel-Redirect`` to ``MEDIA_SENDFILE_URL``, which must be
+  an ``internal`` location aliased to ``MEDIA_ROOT``.
+- ``xsendfile``: ``X-Sendfile`` with the absolute path (Apache
+  mod_xsendfile, lighttpd).
+
+Both servers handle ``Range`` natively. Without a backend the file is
+returned as a FileResponse positioned at the range start, which WSGI
+servers with ``wsgi.file_wrapper`` (gunicorn) send with sendfile(2).
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    A file limited to ``length`` bytes from its current position.
+
+    ``fileno`` is kept so ``wsgi.file_wrapper`` can still use sendfile;
+    gunicorn stops at the response's Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    # Same format as nginx, so validators agree whichever server answers
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single byte range, ``None`` to
+    serve the whole file, or ``False`` if the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        # Absent, malformed or multi-range: a full response is always valid
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+        if not int(last):
+            return False
+    if start >= size:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Weak validators never match for ranges
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date >= int(mtime)
+
+
+def serve_file(request, path, name, cache_control='max-age=86400'):
+    """
+    Respond with the file at ``path`` (``name`` is its MEDIA_ROOT-relative
+    name). Raises FileNotFoundError if there is no such file.
+    """
+    stat = os.stat(path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _file_response(request, path, name, stat, etag)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _file_response(request, path, name, stat, etag):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_URL + name
+        return response
+    if backend:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        file = open(path, 'rb')
+        file.seek(start)
+        response = FileResponse(RangeFile(file, length), content_type=content_type)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    return response
@@ -1,3 +1,253 @@
+import copy
+
+from django.conf import settings
+from django.core.files import File
 from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class DirtyFieldsMixin:
+    """
+    Track field values loaded from the database so that a plain ``save()``
+    only writes the columns that actually changed.
+
+    Saving an unchanged instance is a no-op (no query, no signals). Passing
+    ``update_fields`` explicitly bypasses the tracking.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Unrefreshed fields keep their pending changes
+        self._snapshot_fields(set(fields) if fields is not None else None)
+
+    def _tracked_value(self, field):
+        value = self.__dict__.get(field.attname)
+        if isinstance(value, File):
+            # A newly assigned upload is always a change
+            if not getattr(value, '_committed', True) or not isinstance(value, FieldFile):
+                return ('uncommitted', id(value))
+            return value.name
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def _snapshot_fields(self, field_names=None):
+        values = {
+            field.attname: self._tracked_value(field)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field_names is None or field.name in field_names or field.attname in field_names)
+        }
+        if field_names is None:
+            self._loaded_values = values
+        else:
+            self._loaded_values = {**getattr(self, '_loaded_values', {}), **values}
+
+    def get_dirty_fields(self):
+        """Names of concrete fields whose value differs from the loaded one"""
+        loaded = getattr(self, '_loaded_values', None)
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if loaded is None or field.attname not in loaded:
+                # Never loaded (new instance or deferred field now set)
+                dirty.append(field.name)
+            elif self._tracked_value(field) != loaded[field.attname]:
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self, *field_names):
+        dirty = self.get_dirty_fields()
+        if not field_names:
+            return bool(dirty)
+        return any(name in dirty for name in field_names)
+
+    def save(self, *args, **kwargs):
+        tracked = (
+            not self._state.adding
+            and hasattr(self, '_loaded_values')
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        )
+        explicit_fields = kwargs.get('update_fields')
+        if tracked:
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            auto_now = [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False)
+            ]
+            kwargs['update_fields'] = set(dirty) | set(auto_now)
+        super().save(*args, **kwargs)
+        self._snapshot_fields(set(explicit_fields) if explicit_fields is not None else None)
+
+
+class BackgroundJob(models.Model):
+    """Long-running admin operation executed by a Celery worker"""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('Queued')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_SUCCEEDED, _('Succeeded')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    kind = models.CharField(max_length=50)
+    description = models.CharField(max_length=255, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_backgroundjob'
+        verbose_name = _('Background Job')
+        verbose_name_plural = _('Background Jobs')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.description or f"{self.kind} #{self.pk}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    @property
+    def progress_percentage(self):
+        if not self.total:
+            return 100 if self.is_finished else 0
+        return int((self.processed / self.total) * 100)
+
+    def mark_running(self):
+        self.status = self.STATUS_RUNNING
+        self.started_at = timezone.now()
+        self.save(update_fields=['status', 'started_at'])
+
+    def mark_finished(self, error=''):
+        self.status = self.STATUS_FAILED if error else self.STATUS_SUCCEEDED
+        self.error = error
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'finished_at', 'processed'])
+
+    def advance(self, count):
+        """Record progress without touching other columns"""
+        self.processed += count
+        BackgroundJob.objects.filter(pk=self.pk).update(processed=models.F('processed') + count)
+
+
+class OutboundEmail(models.Model):
+    """Transactional email waiting to be delivered by the outbox worker"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    dedupe_key = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text=_('Idempotency key; a message is queued at most once per key')
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    job = models.ForeignKey(
+        BackgroundJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails',
+        help_text=_('Bulk job that queued this email, if any')
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_outboundemail'
+        verbose_name = _('Outbound Email')
+        verbose_name_plural = _('Outbound Emails')
+        ordering = ['-created_at']
+        indexes = [
+            # The worker only ever scans due, pending rows
+            models.Index(
+                fields=['next_attempt_at'],
+                name='core_outbox_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class ContentBlob(models.Model):
+    """
+    One stored object per unique content (sha256), shared by reference.
+
+    ``ref_count`` is the number of records pointing at the blob; the
+    object is deleted when it drops to zero (see core.blobs). Processing
+    stages record their outputs for the content in ``derived``, so an
+    identical upload reuses them instead of doing the work again.
+    """
+
+    digest = models.CharField(max_length=64, unique=True, help_text=_('sha256 of the content (hex)'))
+    name = models.CharField(max_length=255, unique=True, help_text=_('Storage name of the object'))
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    derived = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'core_contentblob'
+        verbose_name = _('Content Blob')
+        verbose_name_plural = _('Content Blobs')
+        ordering = ['-created_at']
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.ref_count} refs)"
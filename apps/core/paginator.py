@@ -0,0 +1,54 @@
+"""
+Pagination helpers for very large tables.
+"""
+import json
+import logging
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """
+    Return the PostgreSQL planner's row estimate for ``queryset``.
+
+    Returns None on other databases or if the estimate cannot be obtained.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except Exception as e:
+        logger.warning(f"Could not estimate row count: {str(e)}")
+        return None
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids exact ``COUNT(*)`` on large result sets.
+
+    Small results (below ``estimate_threshold``) are counted exactly; above
+    it the planner estimate is used, which is what admin pagination needs.
+    """
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query'):
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,238 @@
+"""
+Sliding-window rate limiting.
+
+Limits are declared as ``(key, rate)`` rules, e.g. ``('ip', '10/h')`` or
+``('email', '3/h')``, and enforced per route. The Redis backend keeps a
+sorted set of hit timestamps per key and checks/records a hit atomically
+in one Lua round trip; the in-memory backend does the same per process
+and is used in development and tests.
+
+Checks run before the view body, so a throttled request is answered with
+a 429 before any ORM work or email is attempted.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+_RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Parse ``'5/m'`` or ``'20/15m'`` into ``(limit, window_seconds)``"""
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * _UNIT_SECONDS[unit]
+
+
+class MemoryBackend:
+    """Per-process sliding window log"""
+    # Keys idle for a whole window are dropped this often
+    evict_interval = 60
+
+    def __init__(self):
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._next_eviction = time.monotonic() + self.evict_interval
+
+    def _evict(self, now):
+        self._hits = {
+            key: (window, hits) for key, (window, hits) in self._hits.items()
+            if hits and hits[-1] > now - window
+        }
+        self._next_eviction = now + self.evict_interval
+
+    def hit(self, key, limit, window):
+        """Record a hit if allowed; return seconds to wait (0 when allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now)
+            _, hits = self._hits.setdefault(key, (window, deque()))
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) < limit:
+                hits.append(now)
+                return 0
+            return max(1, int(hits[0] + window - now) + 1)
+
+    def reset(self):
+        with self._lock:
+            self._hits.clear()
+
+
+# KEYS[1] = key; ARGV = now_ms, window_ms, limit, member
+_SLIDING_WINDOW_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return tonumber(oldest[2]) + tonumber(ARGV[2]) - tonumber(ARGV[1])
+"""
+
+
+class RedisBackend:
+    """Sliding window log in a Redis sorted set, shared by all instances"""
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self._script = get_redis_connection('default').register_script(_SLIDING_WINDOW_LUA)
+
+    def hit(self, key, limit, window):
+        now_ms = int(time.time() * 1000)
+        member = f'{now_ms}-{uuid.uuid4().hex[:8]}'
+        try:
+            wait_ms = int(self._script(keys=[key], args=[now_ms, window * 1000, limit, member]))
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take signup down
+            logger.warning(f"Rate limit check failed for {key}: {str(e)}")
+            return 0
+        return 0 if wait_ms <= 0 else max(1, wait_ms // 1000 + 1)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.RATELIMIT_BACKEND == 'redis':
+                    _backend = RedisBackend()
+                else:
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def client_ip(request):
+    """
+    Client address. Each of the ``RATELIMIT_TRUSTED_PROXY_HOPS`` proxies in
+    front of the app appends the address it saw to X-Forwarded-For, so the
+    client is that many entries from the right; anything further left was
+    sent by the client and cannot be trusted.
+    """
+    hops = settings.RATELIMIT_TRUSTED_PROXY_HOPS
+    forwarded = [
+        address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+        if address.strip()
+    ]
+    if hops > 0 and len(forwarded) >= hops:
+        return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _submitted_email(request):
+    data = getattr(request, 'data', None)
+    if data is None:
+        data = request.POST
+    return (data.get('email') or '').strip().lower()
+
+
+KEY_FUNCTIONS = {
+    'ip': client_ip,
+    'email': _submitted_email,
+}
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else request.path
+
+
+def check_rate_limits(request, rules, scope=None):
+    """
+    Apply ``rules`` to ``request``.
+
+    Returns the number of seconds the client must wait, or 0 if every rule
+    allowed the request. Rules whose key is empty (e.g. no email submitted)
+    are skipped.
+    """
+    if not settings.RATELIMIT_ENABLED:
+        return 0
+
+    backend = get_backend()
+    scope = scope or _route(request)
+    for key_name, rate in rules:
+        value = KEY_FUNCTIONS[key_name](request)
+        if not value:
+            continue
+        limit, window = parse_rate(rate)
+        digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+        wait = backend.hit(f'rl:{scope}:{key_name}:{digest}', limit, window)
+        if wait:
+            logger.info(f"Rate limited {scope} by {key_name} for {wait}s")
+            return wait
+    return 0
+
+
+def rate_limited_response(retry_after):
+    response = HttpResponse(
+        'Too many requests. Please wait a moment and try again.',
+        status=429,
+        content_type='text/plain',
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(rules, methods=('POST',)):
+    """Decorator for function views (use with ``method_decorator`` on classes)"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check_rate_limits(request, rules)
+                if wait:
+                    return rate_limited_response(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+class RateLimitMixin:
+    """Class-based view mixin; checked before the view's own dispatch"""
+    ratelimit_rules = ()
+    ratelimit_methods = ('POST',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.ratelimit_methods:
+            wait = check_rate_limits(request, self.ratelimit_rules)
+            if wait:
+                return rate_limited_response(wait)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle using the same backend and rule format.
+
+    Set ``ratelimit_rules`` on the view, e.g.
+    ``ratelimit_rules = [('ip', '60/m')]``.
+    """
+
+    def allow_request(self, request, view):
+        rules = getattr(view, 'ratelimit_rules', ())
+        self._wait = check_rate_limits(request, rules)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
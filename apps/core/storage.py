@@ -0,0 +1,217 @@
+"""
+Signed media URL cache.
+
+Signing a GCS URL for private media is a remote IAM ``signBlob`` call when
+the service has no private key (Cloud Run). Signed URLs are therefore
+cached in two tiers: a small in-process LRU in front of the shared cache
+(Redis in production).
+
+Expirations are aligned to buckets of ``expiration - refresh_margin``
+seconds: every URL for a blob signed within one bucket is identical
+(browsers can cache it too), stays valid for at least ``refresh_margin``
+seconds after it is handed out, and is re-signed when the next bucket
+starts.
+
+``sign_urls``/``prime_signed_urls`` let list views sign every miss on a
+page at once instead of one template ``.url`` call at a time.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from storages.backends.gcloud import GoogleCloudStorage
+from storages.utils import clean_name
+
+logger = logging.getLogger(__name__)
+
+
+class LocalURLCache:
+    """Thread-safe LRU of ``key -> (url, valid_until)``"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, url, valid_until):
+        with self._lock:
+            self._entries[key] = (url, valid_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = None
+_executor = None
+_init_lock = threading.Lock()
+
+
+def _get_local_cache():
+    global _local_cache
+    if _local_cache is None:
+        with _init_lock:
+            if _local_cache is None:
+                _local_cache = LocalURLCache(settings.SIGNED_URL_LOCAL_CACHE_SIZE)
+    return _local_cache
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SIGNED_URL_SIGNING_WORKERS,
+                    thread_name_prefix='url-signer',
+                )
+    return _executor
+
+
+class CachedSignedURLMixin:
+    """
+    Storage mixin that serves ``url()`` from the signed URL cache.
+
+    The storage must implement ``sign_url(name, expiration)`` and have an
+    ``expiration`` timedelta and a ``bucket_name``.
+    """
+
+    def url(self, name, parameters=None):
+        if parameters:
+            # Custom response headers etc. are signed on demand
+            return super().url(name, parameters=parameters)
+        return sign_urls([name], storage=self)[name]
+
+    def signing_window(self, now):
+        """Return ``(bucket, expires_at)`` for a URL handed out at ``now``"""
+        lifetime = int(self.expiration.total_seconds())
+        margin = min(settings.SIGNED_URL_REFRESH_MARGIN, lifetime // 2)
+        step = lifetime - margin
+        bucket = int(now // step)
+        return bucket, (bucket + 1) * step + margin
+
+    def cache_key(self, name, bucket):
+        return f'signed-url:{self.bucket_name}:{bucket}:{name}'
+
+
+def sign_urls(names, storage=None):
+    """
+    Return ``{name: url}`` for ``names``, signing only what is not cached.
+
+    Looks up the local LRU, then the shared cache in one ``get_many``,
+    and signs the remaining names concurrently.
+    """
+    storage = storage or default_storage
+    names = [name for name in dict.fromkeys(names) if name]
+    if not isinstance(storage, CachedSignedURLMixin):
+        return {name: storage.url(name) for name in names}
+
+    now = time.time()
+    bucket, expires_at = storage.signing_window(now)
+    valid_until = expires_at - settings.SIGNED_URL_REFRESH_MARGIN
+    local = _get_local_cache()
+
+    urls = {}
+    keys = {}
+    for name in names:
+        key = storage.cache_key(name, bucket)
+        url = local.get(key, now)
+        if url is None:
+            keys[key] = name
+        else:
+            urls[name] = url
+    if not keys:
+        return urls
+
+    for key, url in cache.get_many(list(keys)).items():
+        urls[keys.pop(key)] = url
+        local.set(key, url, valid_until)
+    if not keys:
+        return urls
+
+    expiration = datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+    pending = list(keys.items())
+    if len(pending) == 1:
+        signed = [storage.sign_url(pending[0][1], expiration)]
+    else:
+        signed = list(_get_executor().map(
+            lambda item: storage.sign_url(item[1], expiration), pending
+        ))
+
+    timeout = max(1, int(valid_until - now))
+    fresh = {}
+    for (key, name), url in zip(pending, signed):
+        urls[name] = url
+        fresh[key] = url
+        local.set(key, url, valid_until)
+    cache.set_many(fresh, timeout)
+    return urls
+
+
+def prime_signed_urls(files, storage=None):
+    """
+    Sign the URLs of many FieldFiles up front.
+
+    Call this in list views before rendering; the template's ``.url``
+    calls are then served from the in-process cache.
+    """
+    files = [f for f in files if f]
+    if files:
+        sign_urls([f.name for f in files], storage=storage or files[0].storage)
+
+
+class SignedURLGoogleCloudStorage(CachedSignedURLMixin, GoogleCloudStorage):
+    """
+    Private GCS storage with cached signed URLs.
+
+    With ``service_account_name`` set, URLs are signed through IAM
+    ``signBlob`` as that account using the runtime's access token, which
+    is how Cloud Run signs without a private key.
+    """
+
+    def __init__(self, **kwargs):
+        self._credentials_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def get_default_settings(self):
+        return {**super().get_default_settings(), 'service_account_name': None}
+
+    def _access_token(self):
+        credentials = self.client._credentials
+        if not credentials.valid:
+            from google.auth.transport.requests import Request
+
+            with self._credentials_lock:
+                if not credentials.valid:
+                    credentials.refresh(Request())
+        return credentials.token
+
+    def sign_url(self, name, expiration):
+        blob = self.bucket.blob(self._normalize_name(clean_name(name)))
+        params = {'version': 'v4', 'expiration': expiration}
+        if self.custom_endpoint:
+            params['bucket_bound_hostname'] = self.custom_endpoint
+        if self.service_account_name:
+            params['service_account_email'] = self.service_account_name
+            params['access_token'] = self._access_token()
+        return blob.generate_signed_url(**params)
@@ -0,0 +1,167 @@
+"""
+Orphaned media sweeper.
+
+Rows that point at stored files are deleted (accounts, submissions, whole
+contents) or repointed (a replaced profile image) without always deleting
+the file, so the bucket slowly fills with objects nothing references. The
+sweeper reconciles the storage listing against the database one page at
+a time:
+
+- each prefix in ``MEDIA_SWEEP_RULES`` is listed through the
+  ``MEDIA_SWEEP_BACKEND`` lister (GCS, or the local filesystem);
+- the rule for the prefix returns which names of a page are still
+  referenced, in a few queries per page;
+- unreferenced objects older than ``MEDIA_SWEEP_GRACE_HOURS`` are deleted
+  in batches, at most ``MEDIA_SWEEP_RATE`` per second.
+
+The grace period protects files that are stored before the row that
+references them is committed (uploads in flight). Prefixes without a
+rule are never touched.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class MediaLister:
+    """Interface for listing and bulk-deleting stored media"""
+
+    def pages(self, prefix, page_size):
+        """Yield lists of ``(name, modified)`` for the objects under ``prefix``"""
+        raise NotImplementedError
+
+    def delete(self, names):
+        for name in names:
+            default_storage.delete(name)
+
+
+class GCSMediaLister(MediaLister):
+    """Pages through the media bucket and deletes with batched requests"""
+
+    # Most requests the GCS JSON API accepts in one batch
+    MAX_BATCH = 100
+
+    def _location(self):
+        location = default_storage.location
+        return f'{location}/' if location else ''
+
+    def pages(self, prefix, page_size):
+        location = self._location()
+        blobs = default_storage.bucket.list_blobs(
+            prefix=default_storage._normalize_name(prefix),
+            page_size=page_size,
+            fields='items(name,updated),nextPageToken',
+        )
+        for page in blobs.pages:
+            yield [(blob.name[len(location):], blob.updated) for blob in page]
+
+    def delete(self, names):
+        bucket = default_storage.bucket
+        for start in range(0, len(names), self.MAX_BATCH):
+            # An object deleted meanwhile is not an error
+            with default_storage.client.batch(raise_exception=False):
+                for name in names[start:start + self.MAX_BATCH]:
+                    bucket.delete_blob(default_storage._normalize_name(name))
+
+
+class FileSystemMediaLister(MediaLister):
+    """Walks MEDIA_ROOT (development and tests)"""
+
+    def pages(self, prefix, page_size):
+        root = default_storage.location
+        page = []
+        for directory, subdirectories, files in os.walk(default_storage.path(prefix)):
+            subdirectories.sort()
+            for filename in sorted(files):
+                path = os.path.join(directory, filename)
+                modified = datetime.fromtimestamp(os.stat(path).st_mtime, tz=dt_timezone.utc)
+                page.append((os.path.relpath(path, root).replace(os.sep, '/'), modified))
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def delete(self, names):
+        super().delete(names)
+        # Drop directories the deletes emptied (HLS outputs, upload parts)
+        root = os.path.normpath(default_storage.location)
+        for directory in {os.path.dirname(default_storage.path(name)) for name in names}:
+            while os.path.normpath(directory) != root:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+
+_lister = None
+
+
+def get_media_lister():
+    global _lister
+    if _lister is None:
+        _lister = import_string(settings.MEDIA_SWEEP_BACKEND)()
+    return _lister
+
+
+def sweep_orphaned_media(
+    dry_run=False, prefixes=None, page_size=None, rate=None, grace=None, report=None
+):
+    """
+    Delete stored media that no row references.
+
+    ``rate`` caps deletes per second (0: no limit) and ``grace`` is the
+    minimum age of a deleted object. ``report`` is called with the names
+    of each orphaned batch (for dry-run output). Returns counts of
+    scanned, orphaned and deleted objects.
+    """
+    page_size = page_size or settings.MEDIA_SWEEP_PAGE_SIZE
+    rate = settings.MEDIA_SWEEP_RATE if rate is None else rate
+    grace = grace if grace is not None else timedelta(hours=settings.MEDIA_SWEEP_GRACE_HOURS)
+    cutoff = timezone.now() - grace
+    lister = get_media_lister()
+    stats = {'scanned': 0, 'orphaned': 0, 'deleted': 0}
+    started = time.monotonic()
+
+    for prefix, rule in settings.MEDIA_SWEEP_RULES.items():
+        if prefixes and prefix not in prefixes:
+            continue
+        referenced = import_string(rule)
+        for page in lister.pages(prefix, page_size):
+            stats['scanned'] += len(page)
+            candidates = [name for name, modified in page if modified < cutoff]
+            if not candidates:
+                continue
+            live = referenced(candidates)
+            orphans = [name for name in candidates if name not in live]
+            if not orphans:
+                continue
+            stats['orphaned'] += len(orphans)
+            if report is not None:
+                report(orphans)
+            if dry_run:
+                continue
+
+            lister.delete(orphans)
+            stats['deleted'] += len(orphans)
+            if rate:
+                # Stay under the delete rate averaged over the whole sweep
+                ahead = stats['deleted'] / rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    if stats['deleted']:
+        logger.info(
+            f"Media sweep deleted {stats['deleted']} orphaned objects "
+            f"({stats['scanned']} scanned)"
+        )
+    return stats
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .mail import drain_outbox
+from .sweeper import sweep_orphaned_media as sweep
+
+
+@shared_task(ignore_result=True)
+def drain_email_outbox():
+    """Deliver all due emails in the outbox"""
+    return drain_outbox()
+
+
+@shared_task(ignore_result=True)
+def sweep_orphaned_media():
+    """Periodic deletion of stored media that no row references"""
+    sweep()
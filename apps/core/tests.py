@@ -1,3 +1,297 @@
-from django.test import TestCase
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+
+from . import storage as signed_storage
+from .mail import deliver_outbox, queue_mail
+from .models import ContentBlob, OutboundEmail
+from .paginator import EstimatedCountPaginator, estimate_count
+from .ratelimit import MemoryBackend, client_ip
+from .sweeper import sweep_orphaned_media
+from .storage import CachedSignedURLMixin, sign_urls
+
+
+class CountingSignedStorage(CachedSignedURLMixin, FileSystemStorage):
+    bucket_name = 'test-bucket'
+    expiration = timedelta(hours=1)
+
+    def __init__(self):
+        super().__init__()
+        self.signed = []
+        self._lock = threading.Lock()
+
+    def sign_url(self, name, expiration):
+        with self._lock:
+            self.signed.append(name)
+        return f'https://signed.example/{name}?expires={int(expiration.timestamp())}'
+
+
+@override_settings(SIGNED_URL_REFRESH_MARGIN=600)
+class SignedURLCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        signed_storage._get_local_cache().clear()
+        self.storage = CountingSignedStorage()
+
+    def test_batch_signs_each_miss_once(self):
+        names = [f'thumbnails/{i}.jpg' for i in range(50)]
+        urls = sign_urls(names, storage=self.storage)
+        self.assertEqual(sorted(self.storage.signed), sorted(names))
+        self.assertEqual(len(urls), 50)
+
+        # Template .url calls after priming are served from the cache
+        self.assertEqual(self.storage.url(names[0]), urls[names[0]])
+        self.assertEqual(len(self.storage.signed), 50)
+
+    def test_shared_cache_is_used_when_local_cache_is_cold(self):
+        url = self.storage.url('videos/a.mp4')
+        signed_storage._get_local_cache().clear()
+        self.assertEqual(self.storage.url('videos/a.mp4'), url)
+        self.assertEqual(self.storage.signed, ['videos/a.mp4'])
+
+    def test_expiry_leaves_at_least_the_refresh_margin(self):
+        bucket, expires_at = self.storage.signing_window(1_000_000)
+        later_bucket, _ = self.storage.signing_window(1_000_000 + 3000)
+        self.assertGreaterEqual(expires_at - 1_000_000, 600)
+        self.assertLessEqual(expires_at - 1_000_000, 3600)
+        self.assertNotEqual(bucket, later_bucket)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SENDFILE_BACKEND='')
+class MediaViewTests(TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.name = f'videos/user_{self.student.pk}/clip.mp4'
+        for name in (self.name, 'profiles/a.jpg', 'uploads/x/part'):
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.content)
+
+    def _get(self, name, **headers):
+        response = self.client.get(f'/media/{name}', **headers)
+        if response.status_code in (200, 206):
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_range_requests(self):
+        self.client.force_login(self.student)
+        response = self._get(self.name, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response.body, self.content[100:200])
+
+        response = self._get(self.name, HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.body, self.content[-24:])
+
+        etag = response['ETag']
+        response = self._get(self.name, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.content)
+        response = self._get(self.name, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = self._get(self.name, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(self._get(self.name, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_private_media_requires_access(self):
+        self.assertEqual(self._get(self.name).status_code, 403)
+        self.assertEqual(self._get('profiles/a.jpg').status_code, 200)
+        self.client.force_login(self.student)
+        self.assertEqual(self._get('uploads/x/part').status_code, 403)
+        self.assertEqual(self._get('profiles/../uploads/x/part').status_code, 403)
+        self.assertEqual(self._get('../secret').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='nginx', MEDIA_SENDFILE_URL='/protected-media/')
+    def test_transfer_is_offloaded_to_nginx(self):
+        self.client.force_login(self.student)
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+
+
+class ValidatingUploadHandlerTests(SimpleTestCase):
+    png = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 8
+
+    def _parse(self, name, content):
+        request = RequestFactory().post('/upload/', {'file': SimpleUploadedFile(name, content)})
+        return request, request.FILES
+
+    def test_valid_file_is_accepted_with_checksum(self):
+        request, files = self._parse('avatar.png', self.png)
+        self.assertEqual(files['file'].read(), self.png)
+        self.assertEqual(files['file'].sha256, hashlib.sha256(self.png).hexdigest())
+        self.assertIsNone(getattr(request, 'upload_error', None))
+
+    def test_content_not_matching_extension_is_rejected(self):
+        request, files = self._parse('avatar.png', b'\xff\xd8\xff\xe0' + self.png[4:])
+        self.assertNotIn('file', files)
+        self.assertIn('not a valid .png', request.upload_error)
+
+        request, files = self._parse('script.php', self.png)
+        self.assertNotIn('file', files)
+
+    @override_settings(MAX_IMAGE_SIZE=1024, FILE_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_size_limit_is_enforced_while_streaming(self):
+        request, files = self._parse('avatar.png', self.png)
+        self.assertNotIn('file', files)
+        self.assertIn('too large', request.upload_error)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SWEEP_RATE=0)
+class OrphanedMediaSweepTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='student', email='student@example.com', password=None)
+        digest = 'ab' * 32
+        ContentBlob.objects.create(digest=digest, name='videos/user_1/live.mp4', size=1, ref_count=1)
+        UserProfile.objects.filter(user=user).update(profile_image='profiles/live.jpg')
+        self.live = ['profiles/live.jpg', 'videos/user_1/live.mp4', f'hls/{digest}/240p/index.m3u8']
+        self.orphans = ['profiles/old.jpg', 'videos/user_1/gone.mp4', f'hls/{"cd" * 32}/240p/seg_00000.ts']
+        self.recent = 'thumbnails/new.jpg'
+        self.unknown = 'other/file.txt'
+        old = time.time() - 60 * 60 * 48
+        for name in self.live + self.orphans + [self.recent, self.unknown]:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x')
+            if name != self.recent:
+                os.utime(path, (old, old))
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+    def test_dry_run_then_sweep_deletes_only_old_unreferenced_files(self):
+        reported = []
+        stats = sweep_orphaned_media(dry_run=True, page_size=2, report=reported.extend)
+        self.assertEqual(sorted(reported), sorted(self.orphans))
+        self.assertEqual(stats['deleted'], 0)
+        self.assertTrue(all(self._exists(name) for name in self.orphans))
+
+        stats = sweep_orphaned_media(page_size=2)
+        self.assertEqual(stats['deleted'], len(self.orphans))
+        self.assertFalse(any(self._exists(name) for name in self.orphans))
+        self.assertTrue(all(self._exists(name) for name in self.live + [self.recent, self.unknown]))
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'hls', 'cd' * 32)))
+
+
+@override_settings(EMAIL_OUTBOX_DELIVER_ON_COMMIT=False, EMAIL_OUTBOX_DEDUPE_WINDOW=3600)
+class EmailOutboxTests(TestCase):
+    def _queue(self, subject='Hello'):
+        queue_mail(subject, 'Body', ['someone@example.com'], dedupe_key='greeting:1')
+
+    def test_repeats_are_dropped_only_within_the_window(self):
+        now = time.time()
+        with mock.patch('core.mail.time.time', return_value=now):
+            self._queue()
+            self._queue()
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        with mock.patch('core.mail.time.time', return_value=now + 3600):
+            self._queue()
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_rows_are_leased_while_sending_outside_the_claim(self):
+        self._queue()
+        queue_mail('Other', 'Body', ['other@example.com'])
+        seen = []
+
+        class Message:
+            def __init__(self, email):
+                self.email = email
+
+            def send(self):
+                # Another worker finds nothing due while this batch is out
+                seen.append((deliver_outbox(), OutboundEmail.objects.get(pk=self.email.pk).next_attempt_at))
+                if self.email.subject == 'Other':
+                    raise OSError('Mailbox unavailable')
+
+        with mock.patch('core.mail._to_message', lambda email, connection: Message(email)):
+            self.assertEqual(deliver_outbox(), 2)
+        self.assertEqual([processed for processed, _ in seen], [0, 0])
+        self.assertTrue(all(leased > timezone.now() for _, leased in seen))
+
+        sent = OutboundEmail.objects.get(subject='Hello')
+        self.assertEqual((sent.status, sent.attempts), (OutboundEmail.STATUS_SENT, 1))
+        failed = OutboundEmail.objects.get(subject='Other')
+        self.assertEqual((failed.status, failed.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+        self.queryset = User.objects.order_by('pk')
+
+    def test_no_estimate_outside_postgresql(self):
+        self.assertIsNone(estimate_count(self.queryset))
+        self.assertEqual(EstimatedCountPaginator(self.queryset, 2).count, 3)
+
+    def test_large_estimate_replaces_the_exact_count(self):
+        with mock.patch('core.paginator.estimate_count', return_value=50000):
+            paginator = EstimatedCountPaginator(self.queryset, 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 50000)
+        self.assertEqual(paginator.num_pages, 500)
+
+    def test_small_estimate_is_counted_exactly(self):
+        with mock.patch('core.paginator.estimate_count', return_value=9999):
+            paginator = EstimatedCountPaginator(self.queryset, 2)
+            with self.assertNumQueries(1):
+                self.assertEqual(paginator.count, 3)
+
+    def test_lists_are_counted_with_len(self):
+        with mock.patch('core.paginator.estimate_count') as estimate:
+            self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
+        estimate.assert_not_called()
+
+
+class RateLimitTests(SimpleTestCase):
+    def _ip(self, forwarded=None):
+        extra = {'REMOTE_ADDR': '10.0.0.1'}
+        if forwarded is not None:
+            extra['HTTP_X_FORWARDED_FOR'] = forwarded
+        return client_ip(RequestFactory().get('/', **extra))
+
+    def test_client_ip_ignores_spoofed_forwarded_entries(self):
+        with self.settings(RATELIMIT_TRUSTED_PROXY_HOPS=1):
+            self.assertEqual(self._ip('6.6.6.6, 203.0.113.7'), '203.0.113.7')
+            self.assertEqual(self._ip('203.0.113.7'), '203.0.113.7')
+            self.assertEqual(self._ip(), '10.0.0.1')
+        with self.settings(RATELIMIT_TRUSTED_PROXY_HOPS=2):
+            self.assertEqual(self._ip('6.6.6.6, 203.0.113.7, 198.51.100.2'), '203.0.113.7')
+            # Fewer entries than proxies: the header was not set by them
+            self.assertEqual(self._ip('203.0.113.7'), '10.0.0.1')
+        with self.settings(RATELIMIT_TRUSTED_PROXY_HOPS=0):
+            self.assertEqual(self._ip('203.0.113.7'), '10.0.0.1')
+
+    def test_memory_backend_limits_and_evicts_idle_keys(self):
+        now = time.monotonic()
+        with mock.patch('core.ratelimit.time.monotonic', return_value=now):
+            backend = MemoryBackend()
+            self.assertEqual(backend.hit('a', 1, 10), 0)
+            self.assertGreater(backend.hit('a', 1, 10), 0)
+            self.assertEqual(backend.hit('b', 1, 300), 0)
+        with mock.patch('core.ratelimit.time.monotonic', return_value=now + backend.evict_interval):
+            self.assertEqual(backend.hit('c', 1, 10), 0)
+        self.assertEqual(set(backend._hits), {'b', 'c'})
@@ -0,0 +1,156 @@
+"""
+Upload handlers that validate multipart file uploads while they stream in.
+
+Each file is checked as its bytes arrive instead of after the whole
+request has been received:
+
+- its extension must be an allowed image or video extension;
+- its first bytes must be the magic number of a matching container;
+- its running size may not exceed the limit for its kind;
+- a request whose Content-Length already exceeds the largest limit is
+  stopped at its first file, before any file data is read. The ordinary
+  fields ahead of it (the CSRF token among them) are still parsed, so
+  the view can report the error.
+
+An invalid file stops parsing with ``StopUpload(connection_reset=True)``:
+the rest of the body is never read, and the server drops the connection
+instead of receiving hundreds of megabytes that would be rejected anyway.
+The reason is left on ``request.upload_error`` for the view to report.
+Accepted files carry their sha256, computed incrementally, as
+``file.sha256``.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+
+logger = logging.getLogger(__name__)
+
+# Bytes needed to recognise every supported container
+HEADER_SIZE = 16
+
+# container -> extensions it may be uploaded as
+CONTAINER_EXTENSIONS = {
+    'jpeg': {'jpg', 'jpeg'},
+    'png': {'png'},
+    'gif': {'gif'},
+    'webp': {'webp'},
+    'isobmff': {'mp4', 'm4v', 'mov'},
+    'matroska': {'mkv', 'webm'},
+    'avi': {'avi'},
+}
+
+# Top-level boxes an MP4/QuickTime file can start with
+_ISOBMFF_BOXES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide')
+
+
+def sniff_container(header):
+    """Identify a file's container from its first bytes, or return None"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF':
+        return {b'WEBP': 'webp', b'AVI ': 'avi'}.get(header[8:12])
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'matroska'
+    if header[4:8] in _ISOBMFF_BOXES:
+        return 'isobmff'
+    return None
+
+
+def content_matches_extension(header, extension):
+    container = sniff_container(header)
+    return container is not None and extension in CONTAINER_EXTENSIONS[container]
+
+
+def upload_size_limit(extension):
+    """Size limit for an uploaded file, or None if its type is not allowed"""
+    if extension in settings.ALLOWED_IMAGE_EXTENSIONS:
+        return settings.MAX_IMAGE_SIZE
+    if extension in settings.ALLOWED_VIDEO_EXTENSIONS:
+        return settings.MAX_FILE_SIZE
+    return None
+
+
+class ValidatingUploadMixin:
+    """Validation shared by the memory and temporary-file handlers"""
+
+    # Multipart overhead and ordinary fields allowed on top of the file
+    REQUEST_OVERHEAD = 1024 * 1024
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        largest = max(settings.MAX_FILE_SIZE, settings.MAX_IMAGE_SIZE)
+        self.oversize_error = None
+        if content_length and content_length > largest + self.REQUEST_OVERHEAD:
+            # Rejected at the first file, once the fields before it are parsed
+            self.oversize_error = f'Upload too large (max {filesizeformat(largest)})'
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        if self.oversize_error:
+            self.reject(self.oversize_error)
+        self.extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+        self.size_limit = upload_size_limit(self.extension)
+        if self.size_limit is None:
+            self.reject(f'Unsupported file type: {file_name}')
+        self.header = b''
+        self.received = 0
+        self.sha256 = hashlib.sha256()
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+    def validate_chunk(self, raw_data):
+        self.received += len(raw_data)
+        if self.received > self.size_limit:
+            self.reject(f'{self.file_name} is too large (max {filesizeformat(self.size_limit)})')
+        if len(self.header) < HEADER_SIZE:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+            if len(self.header) == HEADER_SIZE:
+                self.check_header()
+        self.sha256.update(raw_data)
+
+    def check_header(self):
+        if not content_matches_extension(self.header, self.extension):
+            self.reject(f'{self.file_name} is not a valid .{self.extension} file')
+
+    def complete(self, file):
+        if file is not None:
+            if len(self.header) < HEADER_SIZE:
+                # Shorter than a header: check what there is
+                self.check_header()
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+    def reject(self, message):
+        logger.info(f"Upload rejected: {message}")
+        if self.request is not None:
+            self.request.upload_error = message
+        raise StopUpload(connection_reset=True)
+
+
+class ValidatingMemoryFileUploadHandler(ValidatingUploadMixin, MemoryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self.validate_chunk(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return self.complete(super().file_complete(file_size))
+
+
+class ValidatingTemporaryFileUploadHandler(ValidatingUploadMixin, TemporaryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        self.validate_chunk(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return self.complete(super().file_complete(file_size))
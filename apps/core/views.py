@@ -1,5 +1,54 @@
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import Http404, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.module_loading import import_string
+from django.views import View
 from django.views.generic import TemplateView
 
+from .media import serve_file
+
 class HomeView(TemplateView):
     template_name = 'core/home.html'
+
+
+@lru_cache(maxsize=None)
+def _access_check(dotted_path):
+    return import_string(dotted_path)
+
+
+class MediaView(View):
+    """
+    Serve MEDIA_ROOT when media is not on GCS.
+
+    Paths under a prefix in MEDIA_ACCESS_RULES are private: the rule's
+    check decides, and a rule of None means the files are never served.
+    Everything else is public.
+    """
+    http_method_names = ['get', 'head']
+
+    def get(self, request, path):
+        name = posixpath.normpath(path).lstrip('/')
+        if name in ('.', '..') or name.startswith('../'):
+            raise Http404
+
+        private = False
+        for prefix, check in settings.MEDIA_ACCESS_RULES.items():
+            if name.startswith(prefix):
+                if check is None or not _access_check(check)(request, name):
+                    return HttpResponseForbidden()
+                private = True
+                break
+
+        try:
+            return serve_file(
+                request,
+                safe_join(settings.MEDIA_ROOT, name),
+                name,
+                cache_control='private, max-age=3600' if private else 'max-age=86400',
+            )
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            raise Http404
@@ -1,3 +1,67 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import (
+    CriteriaScore,
+    EvaluationCriteria,
+    JudgeAssignment,
+    VideoEvaluation,
+    VideoScoreSummary,
+)
+from .exports import score_rows
+from .views import csv_export_response
+
+
+@admin.register(EvaluationCriteria)
+class EvaluationCriteriaAdmin(admin.ModelAdmin):
+    list_display = ('name', 'max_score', 'weight', 'is_active', 'order')
+    list_editable = ('order',)
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+
+
+class CriteriaScoreInline(admin.TabularInline):
+    model = CriteriaScore
+    extra = 0
+    autocomplete_fields = ('criteria',)
+
+
+@admin.register(VideoEvaluation)
+class VideoEvaluationAdmin(admin.ModelAdmin):
+    list_display = ('video', 'judge', 'status', 'overall_score', 'evaluated_at')
+    list_filter = ('status',)
+    list_select_related = ('video', 'judge')
+    search_fields = ('video__title', 'judge__email')
+    raw_id_fields = ('video', 'judge')
+    readonly_fields = ('overall_score', 'created_at', 'updated_at')
+    inlines = [CriteriaScoreInline]
+    actions = ['export_scores_csv']
+
+    def export_scores_csv(self, request, queryset):
+        """Stream the criteria scores of the selected evaluations as CSV"""
+        rows = score_rows(CriteriaScore.objects.filter(evaluation__in=queryset.values('pk')))
+        return csv_export_response(rows, f'scores-{timezone.now():%Y%m%d}.csv')
+    export_scores_csv.short_description = 'Export scores of selected evaluations (CSV)'
+
+
+@admin.register(VideoScoreSummary)
+class VideoScoreSummaryAdmin(admin.ModelAdmin):
+    list_display = ('video', 'mean_score', 'evaluation_count', 'min_score', 'max_score', 'score_stddev')
+    list_select_related = ('video',)
+    search_fields = ('video__title',)
+    readonly_fields = (
+        'video', 'evaluation_count', 'mean_score', 'min_score', 'max_score', 'score_stddev', 'updated_at'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(JudgeAssignment)
+class JudgeAssignmentAdmin(admin.ModelAdmin):
+    list_display = ('video', 'judge', 'status', 'expertise_match', 'assigned_at')
+    list_filter = ('status', 'expertise_match')
+    list_select_related = ('video', 'judge')
+    search_fields = ('video__title', 'judge__email')
+    raw_id_fields = ('video', 'judge')
+    readonly_fields = ('assigned_at', 'updated_at')
@@ -0,0 +1,230 @@
+"""
+Batch assignment of judges to submissions.
+
+Every active submission gets ``JUDGES_PER_SUBMISSION`` judges, chosen
+from approved, verified judges:
+
+- a judge never reviews a student of their own organization
+  (``UserProfile.school_organization``);
+- judges whose expertise area matches the submission's competition are
+  preferred, as long as they are at most ``JUDGE_EXPERTISE_SLACK``
+  assignments busier than the least loaded judge;
+- otherwise the least loaded judge is taken, so open work stays evenly
+  spread. Ties are broken randomly, so no judge becomes a hot spot.
+
+The whole batch is planned in memory with a few queries up front. Judges
+sit in min-heaps keyed by open assignments, one overall and one per
+expertise area; stale heap entries are skipped lazily. Each pick costs
+O(log judges), so 100k submissions and 1k judges plan in seconds. The
+result is written with bulk inserts.
+
+Submissions are topped up rather than re-planned. Dropping a judge
+(``drop_judge``) marks their open assignments dropped, reassigns just
+those submissions and clears ``UserProfile.accepts_assignments``, so the
+judge gets no new work until an admin sets it again.
+"""
+import heapq
+import logging
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from videos.models import VideoSubmission
+from .models import JudgeAssignment
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+class JudgePool:
+    """Judges ordered by open assignments, overall and per expertise area"""
+
+    def __init__(self, judges, loads, rng):
+        self.rng = rng
+        self.loads = {}
+        self.organization = {}
+        self.expertise = {}
+        self.heap = []
+        self.by_expertise = defaultdict(list)
+        for judge_id, organization, expertise in judges:
+            self.loads[judge_id] = loads.get(judge_id, 0)
+            self.organization[judge_id] = _normalize(organization)
+            self.expertise[judge_id] = _normalize(expertise)
+            self._push(judge_id)
+
+    def _entry(self, judge_id):
+        return (self.loads[judge_id], self.rng.random(), judge_id)
+
+    def _push(self, judge_id):
+        heapq.heappush(self.heap, self._entry(judge_id))
+        if self.expertise[judge_id]:
+            heapq.heappush(self.by_expertise[self.expertise[judge_id]], self._entry(judge_id))
+
+    def _pop(self, heap):
+        """Pop the least loaded judge, skipping entries made stale by later loads"""
+        while heap:
+            load, _, judge_id = heapq.heappop(heap)
+            if load == self.loads[judge_id]:
+                return judge_id
+        return None
+
+    def min_load(self):
+        while self.heap and self.heap[0][0] != self.loads[self.heap[0][2]]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def _eligible(self, judge_id, excluded, organization):
+        return judge_id not in excluded and not (
+            organization and self.organization[judge_id] == organization
+        )
+
+    def pick(self, count, excluded, organization, expertise, slack):
+        """
+        Choose up to ``count`` judges for one submission; returns
+        ``[(judge_id, expertise_match)]`` and updates their loads.
+        """
+        chosen = {}
+        # (heap, judge) pairs popped but not chosen; they go back unchanged
+        skipped = []
+        if expertise and expertise in self.by_expertise:
+            heap = self.by_expertise[expertise]
+            limit = (self.min_load() or 0) + slack
+            while len(chosen) < count:
+                judge_id = self._pop(heap)
+                if judge_id is None:
+                    break
+                if self.loads[judge_id] > limit:
+                    # Everyone left in this heap is at least as busy
+                    skipped.append((heap, judge_id))
+                    break
+                if self._eligible(judge_id, excluded, organization) and judge_id not in chosen:
+                    chosen[judge_id] = True
+                else:
+                    skipped.append((heap, judge_id))
+
+        while len(chosen) < count:
+            judge_id = self._pop(self.heap)
+            if judge_id is None:
+                break
+            if self._eligible(judge_id, excluded, organization) and judge_id not in chosen:
+                chosen[judge_id] = bool(expertise) and self.expertise[judge_id] == expertise
+            else:
+                skipped.append((self.heap, judge_id))
+
+        for heap, judge_id in skipped:
+            if judge_id not in chosen:
+                heapq.heappush(heap, self._entry(judge_id))
+        for judge_id in chosen:
+            # Their other entries are stale now; both heaps get a fresh one
+            self.loads[judge_id] += 1
+            self._push(judge_id)
+        return list(chosen.items())
+
+
+def eligible_judges():
+    return User.objects.filter(
+        user_type='judge', is_active=True, is_approved=True, is_verified=True,
+        profile__accepts_assignments=True,
+    ).values_list('pk', 'profile__school_organization', 'profile__expertise_area')
+
+
+def open_loads():
+    return dict(
+        JudgeAssignment.objects.filter(status=JudgeAssignment.STATUS_ASSIGNED)
+        .values_list('judge').annotate(open=Count('pk')).order_by()
+    )
+
+
+def plan_assignments(videos=None, judges_per_video=None, seed=None):
+    """
+    Plan judges for active submissions that have fewer than
+    ``judges_per_video`` live (not dropped) assignments. ``videos``
+    narrows the submissions considered. Returns unsaved assignments.
+    """
+    judges_per_video = judges_per_video or settings.JUDGES_PER_SUBMISSION
+    slack = settings.JUDGE_EXPERTISE_SLACK
+    live = Q(judge_assignments__status__in=[
+        JudgeAssignment.STATUS_ASSIGNED, JudgeAssignment.STATUS_COMPLETED
+    ])
+
+    if videos is None:
+        videos = VideoSubmission.objects.all()
+    needy = (
+        videos.filter(is_active=True)
+        .annotate(assigned=Count('judge_assignments', filter=live))
+        .filter(assigned__lt=judges_per_video)
+    )
+    targets = list(
+        needy.order_by('uploaded_at', 'pk').values_list(
+            'pk', 'assigned', 'student__profile__school_organization', 'competition__expertise_area'
+        )
+    )
+    if not targets:
+        return []
+
+    # Judges already on (or dropped from) a submission are not picked again
+    existing = defaultdict(set)
+    for video_id, judge_id in JudgeAssignment.objects.filter(
+        video__in=needy.values('pk')
+    ).values_list('video_id', 'judge_id'):
+        existing[video_id].add(judge_id)
+
+    pool = JudgePool(eligible_judges(), open_loads(), random.Random(seed))
+    planned = []
+    underfilled = 0
+    for video_id, assigned, organization, expertise in targets:
+        needed = judges_per_video - assigned
+        chosen = pool.pick(
+            needed, existing.get(video_id, frozenset()), _normalize(organization),
+            _normalize(expertise), slack,
+        )
+        if len(chosen) < needed:
+            underfilled += 1
+        planned.extend(
+            JudgeAssignment(video_id=video_id, judge_id=judge_id, expertise_match=match)
+            for judge_id, match in chosen
+        )
+    if underfilled:
+        logger.warning(f"{underfilled} submissions could not get {judges_per_video} eligible judges")
+    return planned
+
+
+def assign_judges(videos=None, judges_per_video=None, seed=None):
+    """Plan and store assignments; returns the number created"""
+    planned = plan_assignments(videos, judges_per_video, seed)
+    with transaction.atomic():
+        created = JudgeAssignment.objects.bulk_create(
+            planned, batch_size=INSERT_BATCH_SIZE, ignore_conflicts=True
+        )
+    logger.info(f"Assigned {len(created)} judge reviews")
+    return len(created)
+
+
+def drop_judge(judge, judges_per_video=None):
+    """
+    Take a judge off their open assignments and new ones, and give those
+    submissions other judges. Returns the number of replacement assignments.
+    """
+    with transaction.atomic():
+        UserProfile.objects.filter(user=judge).update(
+            accepts_assignments=False, updated_at=timezone.now()
+        )
+        open_assignments = JudgeAssignment.objects.select_for_update().filter(
+            judge=judge, status=JudgeAssignment.STATUS_ASSIGNED
+        )
+        video_ids = list(open_assignments.values_list('video_id', flat=True))
+        open_assignments.update(status=JudgeAssignment.STATUS_DROPPED, updated_at=timezone.now())
+    if not video_ids:
+        return 0
+    logger.info(f"Judge {judge.pk} dropped from {len(video_ids)} submissions")
+    return assign_judges(VideoSubmission.objects.filter(pk__in=video_ids), judges_per_video)
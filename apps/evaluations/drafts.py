@@ -0,0 +1,363 @@
+"""
+Write-coalescing autosave for draft evaluations.
+
+The feedback editor posts small deltas (a splice of the feedback text,
+or a few criteria scores) every few seconds. They are applied to a
+buffered copy of the draft, kept per evaluation in Redis, and the
+evaluation is marked dirty. A periodic task
+(``tasks.flush_evaluation_drafts``, every ``DRAFT_FLUSH_INTERVAL``
+seconds) writes each dirty draft to the database once, so database
+writes are bounded by the number of open drafts per interval however
+often judges type. An explicit save, and completing the evaluation,
+flush that one draft immediately.
+
+A flush moves the ids it takes to a processing set and only clears them
+once their drafts are written; ids left there by a worker that died
+mid-flush are returned to the dirty set by the next flush.
+
+In development drafts are buffered in process memory instead, which the
+worker running the periodic flush cannot see, so each delta is also
+written straight through (``DRAFT_WRITE_THROUGH``).
+
+Every accepted delta bumps the draft's version. A delta must name the
+version it was made against; a tab holding an older version gets a
+conflict with the current draft and rebases onto it, so two open tabs
+cannot silently overwrite each other. ``VideoEvaluation.draft_version``
+records the version last written, and a flush never replaces a newer
+one.
+"""
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CriteriaScore, EvaluationCriteria, VideoEvaluation
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = 'draft:'
+REDIS_DIRTY_KEY = 'draft-dirty'
+REDIS_PROCESSING_KEY = 'draft-flushing'
+# Buffered drafts outlive many flush intervals; this only clears abandoned ones
+REDIS_TTL = 7 * 24 * 60 * 60
+FLUSH_BATCH_SIZE = 500
+MAX_FEEDBACK_LENGTH = 50000
+
+
+class DraftConflict(Exception):
+    """The delta was made against an older version of the draft"""
+
+    def __init__(self, version, state):
+        super().__init__(f'Draft is at version {version}')
+        self.version = version
+        self.state = state
+
+
+class DraftUnavailable(Exception):
+    pass
+
+
+def stored_draft(evaluation_id):
+    """``(version, state)`` of the draft as last written to the database"""
+    row = (
+        VideoEvaluation.objects.filter(pk=evaluation_id)
+        .values_list('draft_version', 'written_feedback').first()
+    )
+    if row is None:
+        return None
+    scores = CriteriaScore.objects.filter(evaluation_id=evaluation_id).values_list(
+        'criteria_id', 'score', 'notes'
+    )
+    return row[0], {
+        'feedback': row[1],
+        'scores': {str(criteria_id): {'score': score, 'notes': notes} for criteria_id, score, notes in scores},
+    }
+
+
+def apply_changes(state, changes, criteria):
+    """
+    Return ``state`` with a delta applied. ``changes`` may hold
+    ``feedback`` (new text), ``feedback_patch`` (``[start, end, text]``
+    replacing that slice) and ``scores`` (``{criteria_id: {score, notes}}``).
+    ``criteria`` maps active criteria ids to their instances.
+    """
+    if 'scores' in changes and not isinstance(changes['scores'], (dict, type(None))):
+        raise ValidationError('Scores must be given as {criteria_id: {score, notes}}')
+    state = {'feedback': state['feedback'], 'scores': dict(state['scores'])}
+    if 'feedback' in changes:
+        state['feedback'] = str(changes['feedback'])
+    if 'feedback_patch' in changes:
+        try:
+            start, end, text = changes['feedback_patch']
+            start, end, text = int(start), int(end), str(text)
+        except (TypeError, ValueError):
+            raise ValidationError('feedback_patch must be [start, end, text]')
+        if not 0 <= start <= end <= len(state['feedback']):
+            raise ValidationError('feedback_patch is outside the feedback text')
+        state['feedback'] = state['feedback'][:start] + text + state['feedback'][end:]
+    if len(state['feedback']) > MAX_FEEDBACK_LENGTH:
+        raise ValidationError(f'Feedback is limited to {MAX_FEEDBACK_LENGTH} characters')
+
+    for criteria_id, value in (changes.get('scores') or {}).items():
+        try:
+            item = criteria[int(criteria_id)]
+        except (KeyError, ValueError):
+            raise ValidationError(f'Unknown criterion {criteria_id}')
+        if not isinstance(value, dict):
+            raise ValidationError('Scores must be given as {criteria_id: {score, notes}}')
+        current = state['scores'].get(str(item.pk), {'score': None, 'notes': ''})
+        score = value.get('score', current['score'])
+        if score is not None and (not isinstance(score, int) or not 0 <= score <= item.max_score):
+            raise ValidationError(f'{item} must be scored between 0 and {item.max_score}')
+        state['scores'][str(item.pk)] = {'score': score, 'notes': str(value.get('notes', current['notes']))}
+    return state
+
+
+class MemoryDrafts:
+    """Per-process draft buffer"""
+
+    def __init__(self):
+        self._drafts = {}
+        self._dirty = set()
+        self._processing = set()
+        self._lock = threading.Lock()
+
+    def get(self, evaluation_id):
+        with self._lock:
+            return self._drafts.get(evaluation_id)
+
+    def apply(self, evaluation_id, base_version, change, initial):
+        with self._lock:
+            version, state = self._drafts.get(evaluation_id) or initial()
+            if version != base_version:
+                raise DraftConflict(version, state)
+            self._drafts[evaluation_id] = (version + 1, change(state))
+            self._dirty.add(evaluation_id)
+            return self._drafts[evaluation_id]
+
+    def take_dirty(self, count):
+        with self._lock:
+            taken = [self._dirty.pop() for _ in range(min(count, len(self._dirty)))]
+            self._processing.update(taken)
+        return taken
+
+    def mark_dirty(self, evaluation_ids):
+        with self._lock:
+            self._dirty.update(evaluation_ids)
+
+    def done(self, evaluation_ids):
+        with self._lock:
+            self._processing.difference_update(evaluation_ids)
+
+    def recover(self):
+        with self._lock:
+            self._dirty.update(self._processing)
+            self._processing.clear()
+
+    def discard(self, evaluation_id):
+        with self._lock:
+            self._drafts.pop(evaluation_id, None)
+            self._dirty.discard(evaluation_id)
+
+    def reset(self):
+        with self._lock:
+            self._drafts.clear()
+            self._dirty.clear()
+            self._processing.clear()
+
+
+class RedisDrafts:
+    """
+    Drafts in one Redis hash each (version and JSON state), with a set of
+    dirty evaluation ids and one of ids being flushed. Deltas are applied in a WATCH/MULTI transaction,
+    so concurrent requests for one draft are serialized without locks.
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.redis = get_redis_connection('default')
+
+    def _key(self, evaluation_id):
+        return f'{REDIS_KEY_PREFIX}{evaluation_id}'
+
+    def _read(self, client, evaluation_id):
+        version, state = client.hmget(self._key(evaluation_id), 'version', 'state')
+        if version is None:
+            return None
+        return int(version), json.loads(state)
+
+    def get(self, evaluation_id):
+        try:
+            return self._read(self.redis, evaluation_id)
+        except Exception as e:
+            raise DraftUnavailable(str(e))
+
+    def apply(self, evaluation_id, base_version, change, initial):
+        from redis.exceptions import WatchError
+
+        key = self._key(evaluation_id)
+        try:
+            with self.redis.pipeline() as pipe:
+                while True:
+                    try:
+                        pipe.watch(key)
+                        version, state = self._read(pipe, evaluation_id) or initial()
+                        if version != base_version:
+                            raise DraftConflict(version, state)
+                        state = change(state)
+                        pipe.multi()
+                        pipe.hset(key, mapping={'version': version + 1, 'state': json.dumps(state)})
+                        pipe.expire(key, REDIS_TTL)
+                        pipe.sadd(REDIS_DIRTY_KEY, evaluation_id)
+                        pipe.execute()
+                        return version + 1, state
+                    except WatchError:
+                        continue
+        except (DraftConflict, ValidationError):
+            raise
+        except Exception as e:
+            logger.warning(f"Draft buffer write failed for evaluation {evaluation_id}: {e}")
+            raise DraftUnavailable(str(e))
+
+    def take_dirty(self, count):
+        members = self.redis.srandmember(REDIS_DIRTY_KEY, count) or []
+        if not members:
+            return []
+        # SMOVE is atomic per id, so two flushes never take the same one
+        with self.redis.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.smove(REDIS_DIRTY_KEY, REDIS_PROCESSING_KEY, member)
+            moved = pipe.execute()
+        return [int(member) for member, ok in zip(members, moved) if ok]
+
+    def mark_dirty(self, evaluation_ids):
+        if evaluation_ids:
+            self.redis.sadd(REDIS_DIRTY_KEY, *evaluation_ids)
+
+    def done(self, evaluation_ids):
+        if evaluation_ids:
+            self.redis.srem(REDIS_PROCESSING_KEY, *evaluation_ids)
+
+    def recover(self):
+        with self.redis.pipeline() as pipe:
+            pipe.sunionstore(REDIS_DIRTY_KEY, REDIS_DIRTY_KEY, REDIS_PROCESSING_KEY)
+            pipe.delete(REDIS_PROCESSING_KEY)
+            pipe.execute()
+
+    def discard(self, evaluation_id):
+        with self.redis.pipeline() as pipe:
+            pipe.delete(self._key(evaluation_id))
+            pipe.srem(REDIS_DIRTY_KEY, evaluation_id)
+            pipe.srem(REDIS_PROCESSING_KEY, evaluation_id)
+            pipe.execute()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.DRAFT_BACKEND == 'redis':
+                    _backend = RedisDrafts()
+                else:
+                    _backend = MemoryDrafts()
+    return _backend
+
+
+def current_draft(evaluation_id):
+    """``(version, state)`` of the buffered draft, or of the stored one"""
+    return get_backend().get(evaluation_id) or stored_draft(evaluation_id)
+
+
+def autosave(evaluation, base_version, changes):
+    """
+    Buffer a delta against ``base_version``; returns the new
+    ``(version, state)``. Raises DraftConflict for a stale version and
+    ValidationError for an invalid delta.
+    """
+    criteria = EvaluationCriteria.objects.filter(is_active=True).in_bulk()
+    version, state = get_backend().apply(
+        evaluation.pk,
+        base_version,
+        lambda state: apply_changes(state, changes, criteria),
+        lambda: stored_draft(evaluation.pk),
+    )
+    if settings.DRAFT_WRITE_THROUGH:
+        flush_draft(evaluation.pk)
+    return version, state
+
+
+def flush_draft(evaluation_id):
+    """Write a buffered draft to the database; returns True if it was written"""
+    from .scoring import refresh_evaluation, save_scores
+
+    buffered = get_backend().get(evaluation_id)
+    if buffered is None:
+        return False
+    version, state = buffered
+    with transaction.atomic():
+        evaluation = VideoEvaluation.objects.select_for_update().filter(
+            pk=evaluation_id, status=VideoEvaluation.STATUS_DRAFT, draft_version__lt=version
+        ).first()
+        if evaluation is None:
+            # Already written, completed or deleted
+            return False
+        scored = {
+            int(criteria_id): value for criteria_id, value in state['scores'].items()
+            if value['score'] is not None
+        }
+        cleared = [
+            int(criteria_id) for criteria_id, value in state['scores'].items() if value['score'] is None
+        ]
+        # A score cleared after an earlier flush must not count towards completion
+        deleted, _ = CriteriaScore.objects.filter(
+            evaluation_id=evaluation_id, criteria_id__in=cleared
+        ).delete()
+        if deleted and not scored:
+            refresh_evaluation(evaluation_id)
+        if scored:
+            criteria = EvaluationCriteria.objects.filter(is_active=True).in_bulk(list(scored))
+            save_scores(evaluation, {
+                criteria[criteria_id]: (value['score'], value['notes'])
+                for criteria_id, value in scored.items() if criteria_id in criteria
+            })
+        VideoEvaluation.objects.filter(pk=evaluation_id).update(
+            written_feedback=state['feedback'], draft_version=version, updated_at=timezone.now()
+        )
+    return True
+
+
+def flush_drafts(batch_size=FLUSH_BATCH_SIZE):
+    """Write every dirty draft once; returns the number written"""
+    backend = get_backend()
+    # Ids a previous run took but never finished; rewriting one that was
+    # written is a no-op, as flush_draft skips versions already stored
+    backend.recover()
+    written = 0
+    failed = []
+    while True:
+        evaluation_ids = backend.take_dirty(batch_size)
+        if not evaluation_ids:
+            break
+        for evaluation_id in evaluation_ids:
+            try:
+                written += flush_draft(evaluation_id)
+            except Exception as e:
+                logger.error(f"Could not flush draft of evaluation {evaluation_id}: {str(e)}")
+                failed.append(evaluation_id)
+        backend.done([evaluation_id for evaluation_id in evaluation_ids if evaluation_id not in failed])
+    # Retried on the next run rather than in this loop
+    backend.mark_dirty(failed)
+    backend.done(failed)
+    if written:
+        logger.info(f"Flushed {written} evaluation drafts")
+    return written
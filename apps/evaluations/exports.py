@@ -0,0 +1,189 @@
+"""
+Exports of criteria scores, one row per score.
+
+Rows come from a single joined ``values_list`` query read with
+``.iterator(chunk_size=...)``, which PostgreSQL serves from a server-side
+cursor, so neither export ever holds the result set in memory:
+
+- CSV is streamed straight to the client (``StreamingHttpResponse``);
+- Parquet is written by a worker (``tasks.export_scores``) in record
+  batches to a temporary file, then saved to media storage under
+  ``exports/``. The file name is kept in the job's payload, and the
+  admin job page links to it once the job has succeeded.
+"""
+import csv
+import logging
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import BackgroundJob
+from .models import CriteriaScore
+
+logger = logging.getLogger(__name__)
+
+JOB_SCORE_EXPORT = 'score_export'
+
+EXPORT_CHUNK_SIZE = 2000
+PARQUET_BATCH_SIZE = 50000
+
+# (column, lookup) in export order
+SCORE_COLUMNS = [
+    ('evaluation_id', 'evaluation_id'),
+    ('video_id', 'evaluation__video_id'),
+    ('video_title', 'evaluation__video__title'),
+    ('student_email', 'evaluation__video__student__email'),
+    ('competition', 'evaluation__video__competition__slug'),
+    ('judge_email', 'evaluation__judge__email'),
+    ('status', 'evaluation__status'),
+    ('overall_score', 'evaluation__overall_score'),
+    ('evaluated_at', 'evaluation__evaluated_at'),
+    ('criteria', 'criteria__name'),
+    ('score', 'score'),
+    ('max_score', 'criteria__max_score'),
+    ('weight', 'criteria__weight'),
+    ('notes', 'notes'),
+]
+
+
+def score_rows(scores=None, competition_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield export rows (tuples in ``SCORE_COLUMNS`` order) without buffering the query"""
+    if scores is None:
+        scores = CriteriaScore.objects.all()
+    if competition_id:
+        scores = scores.filter(evaluation__video__competition_id=competition_id)
+    return (
+        scores.order_by('evaluation_id', 'pk')
+        .values_list(*[lookup for _, lookup in SCORE_COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+# Spreadsheets evaluate cells starting with these as formulas (tab and
+# carriage return are stripped or interpreted ahead of one)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _safe_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _ in SCORE_COLUMNS])
+    for row in rows:
+        # Titles, names and notes are user input; keep them from running as formulas
+        yield writer.writerow([_safe_cell(value) for value in row])
+
+
+def _parquet_schema():
+    # Imported here so web processes, which only stream CSV, skip loading Arrow
+    import pyarrow as pa
+
+    return pa.schema([
+        ('evaluation_id', pa.int64()),
+        ('video_id', pa.int64()),
+        ('video_title', pa.string()),
+        ('student_email', pa.string()),
+        ('competition', pa.string()),
+        ('judge_email', pa.string()),
+        ('status', pa.string()),
+        ('overall_score', pa.decimal128(5, 2)),
+        ('evaluated_at', pa.timestamp('us', tz='UTC')),
+        ('criteria', pa.string()),
+        ('score', pa.int64()),
+        ('max_score', pa.int64()),
+        ('weight', pa.decimal128(3, 2)),
+        ('notes', pa.string()),
+    ])
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_parquet(rows, fileobj, batch_size=PARQUET_BATCH_SIZE, progress=None):
+    """
+    Write rows to ``fileobj`` as Parquet, one record batch per
+    ``batch_size`` rows; ``progress(count)`` is called after each.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    written = 0
+    with pq.ParquetWriter(fileobj, schema, compression='zstd') as writer:
+        for batch in _batches(rows, batch_size):
+            columns = zip(*batch)
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            written += len(batch)
+            if progress:
+                progress(len(batch))
+    return written
+
+
+def start_export(user, competition_id=None):
+    """Queue a Parquet export of the scores; returns its BackgroundJob"""
+    from .tasks import export_scores
+
+    scores = CriteriaScore.objects.all()
+    if competition_id:
+        scores = scores.filter(evaluation__video__competition_id=competition_id)
+    job = BackgroundJob.objects.create(
+        kind=JOB_SCORE_EXPORT,
+        description='Criteria score export (Parquet)',
+        total=scores.count(),
+        payload={'competition_id': competition_id},
+        created_by=user,
+    )
+    transaction.on_commit(lambda: export_scores.delay(job.pk))
+    return job
+
+
+def run_export(job):
+    """Write the job's Parquet file to media storage and record its name"""
+    name = f"exports/scores-{job.pk}-{timezone.now():%Y%m%d%H%M%S}.parquet"
+    rows = score_rows(competition_id=job.payload.get('competition_id'))
+    with tempfile.TemporaryFile() as tmp:
+        count = write_parquet(rows, tmp, progress=job.advance)
+        tmp.seek(0)
+        job.payload['file'] = default_storage.save(name, File(tmp, name=name))
+    BackgroundJob.objects.filter(pk=job.pk).update(payload=job.payload)
+    logger.info(f"Score export job {job.pk} wrote {count} rows to {job.payload['file']}")
+    return job.payload['file']
+
+
+def can_download_export(request, name):
+    """Media access rule for ``exports/``: staff only"""
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def referenced_exports(names):
+    """The export files among ``names`` that a job still links to (for core.sweeper)"""
+    return set(
+        BackgroundJob.objects.filter(kind=JOB_SCORE_EXPORT, payload__file__in=list(names))
+        .values_list('payload__file', flat=True)
+    )
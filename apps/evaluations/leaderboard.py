@@ -0,0 +1,423 @@
+"""
+Leaderboards.
+
+Every active submission with a completed evaluation is ranked on the
+overall board (``all``) and on its competition's board (``c<id>``) by its
+mean overall score, and on one board per active criterion
+(``all:k<id>``, ``c<id>:k<id>``) by its mean normalized score on that
+criterion.
+
+A video's entries are recomputed after every transaction that changed its
+summary, so boards stay live without ever sorting all scores:
+
+- ``LeaderboardEntry`` rows hold every entry. Reads go to
+  ``(board, score)`` index ranges when ``LEADERBOARD_BACKEND`` is
+  ``'database'``, and to these rows whenever Redis fails.
+- With ``'redis'``, each board is mirrored in a sorted set. Rank, top-N
+  and neighbours are then O(log n) ZREVRANK/ZREVRANGE calls.
+
+Scores are encoded as one integer: the score in hundredths, then a
+tie-breaker that ranks the earlier submission first. Every entry on a
+board therefore has a distinct score, and both backends order ties the
+same way. ``rebuild`` recomputes all entries from the database and
+reloads Redis. It can also just report drift.
+"""
+import logging
+import threading
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, ExpressionWrapper, F, FloatField, Value
+
+from videos.models import VideoSubmission
+from .models import CriteriaScore, LeaderboardEntry, VideoEvaluation, VideoScoreSummary
+
+logger = logging.getLogger(__name__)
+
+SCORE_SCALE = 100
+# Room for the tie-breaker below each score step (video ids must stay below it)
+TIE_SLOTS = 10 ** 9
+REDIS_KEY_PREFIX = 'lb:'
+
+Standing = namedtuple('Standing', 'rank video_id score')
+
+
+def encode_score(score, video_id):
+    return int(round(Decimal(score) * SCORE_SCALE)) * TIE_SLOTS + (TIE_SLOTS - 1 - video_id)
+
+
+def decode_score(value):
+    return Decimal(int(value) // TIE_SLOTS) / SCORE_SCALE
+
+
+def board_key(competition_id=None, criteria_id=None):
+    key = f'c{competition_id}' if competition_id else 'all'
+    if criteria_id:
+        key += f':k{criteria_id}'
+    return key
+
+
+def _standings(first_rank, rows):
+    return [
+        Standing(first_rank + index, video_id, decode_score(score))
+        for index, (video_id, score) in enumerate(rows)
+    ]
+
+
+class DatabaseLeaderboard:
+    """Reads boards from LeaderboardEntry index ranges"""
+
+    def _entries(self, board):
+        return LeaderboardEntry.objects.filter(board=board)
+
+    def _score(self, board, video_id):
+        return self._entries(board).filter(video_id=video_id).values_list('score', flat=True).first()
+
+    def rank(self, board, video_id):
+        score = self._score(board, video_id)
+        if score is None:
+            return None
+        return self._entries(board).filter(score__gt=score).count() + 1
+
+    def top(self, board, limit):
+        if limit <= 0:
+            return []
+        rows = self._entries(board).order_by('-score').values_list('video_id', 'score')[:limit]
+        return _standings(1, rows)
+
+    def around(self, board, video_id, radius):
+        score = self._score(board, video_id)
+        if score is None:
+            return []
+        above = list(
+            self._entries(board).filter(score__gt=score).order_by('score')
+            .values_list('video_id', 'score')[:radius]
+        )[::-1]
+        below = list(
+            self._entries(board).filter(score__lt=score).order_by('-score')
+            .values_list('video_id', 'score')[:radius]
+        )
+        rank = self._entries(board).filter(score__gt=score).count() + 1
+        return _standings(rank - len(above), above + [(video_id, score)] + below)
+
+    def count(self, board):
+        return self._entries(board).count()
+
+    # The entry rows are written by update_video_rankings itself
+    def add(self, video_id, scores):
+        pass
+
+    def remove(self, board, video_ids):
+        pass
+
+    def load(self, board, rows):
+        pass
+
+
+class RedisLeaderboard(DatabaseLeaderboard):
+    """
+    Mirrors each board in a Redis sorted set. Reads fall back to the
+    database if Redis fails; a failed write is repaired by ``rebuild``.
+    """
+
+    LOAD_CHUNK = 5000
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.redis = get_redis_connection('default')
+
+    def _key(self, board):
+        return f'{REDIS_KEY_PREFIX}{board}'
+
+    def _rows(self, pairs):
+        return [(int(member), int(score)) for member, score in pairs]
+
+    def rank(self, board, video_id):
+        try:
+            rank = self.redis.zrevrank(self._key(board), video_id)
+        except Exception as e:
+            logger.warning(f"Leaderboard read failed for {board}: {e}")
+            return super().rank(board, video_id)
+        return None if rank is None else rank + 1
+
+    def top(self, board, limit):
+        if limit <= 0:
+            # ZREVRANGE 0 -1 would return the whole board
+            return []
+        try:
+            rows = self.redis.zrevrange(self._key(board), 0, limit - 1, withscores=True)
+        except Exception as e:
+            logger.warning(f"Leaderboard read failed for {board}: {e}")
+            return super().top(board, limit)
+        return _standings(1, self._rows(rows))
+
+    def around(self, board, video_id, radius):
+        key = self._key(board)
+        try:
+            rank = self.redis.zrevrank(key, video_id)
+            if rank is None:
+                return []
+            start = max(0, rank - radius)
+            rows = self.redis.zrevrange(key, start, rank + radius, withscores=True)
+        except Exception as e:
+            logger.warning(f"Leaderboard read failed for {board}: {e}")
+            return super().around(board, video_id, radius)
+        return _standings(start + 1, self._rows(rows))
+
+    def count(self, board):
+        try:
+            return self.redis.zcard(self._key(board))
+        except Exception as e:
+            logger.warning(f"Leaderboard read failed for {board}: {e}")
+            return super().count(board)
+
+    def add(self, video_id, scores):
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for board, score in scores.items():
+                pipe.zadd(self._key(board), {video_id: score})
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Leaderboard update failed for video {video_id}: {e}")
+
+    def remove(self, board, video_ids):
+        try:
+            self.redis.zrem(self._key(board), *video_ids)
+        except Exception as e:
+            logger.warning(f"Leaderboard update failed for {board}: {e}")
+
+    def load(self, board, rows):
+        """Replace the board with ``rows`` of ``(video_id, score)`` atomically"""
+        key = self._key(board)
+        staging = f'{key}:loading'
+        self.redis.delete(staging)
+        batch = {}
+        for video_id, score in rows:
+            batch[video_id] = score
+            if len(batch) >= self.LOAD_CHUNK:
+                self.redis.zadd(staging, batch)
+                batch = {}
+        if batch:
+            self.redis.zadd(staging, batch)
+        if self.redis.exists(staging):
+            self.redis.rename(staging, key)
+        else:
+            self.redis.delete(key)
+
+    def scores(self, board, video_ids):
+        pipe = self.redis.pipeline(transaction=False)
+        for video_id in video_ids:
+            pipe.zscore(self._key(board), video_id)
+        return {
+            video_id: None if score is None else int(score)
+            for video_id, score in zip(video_ids, pipe.execute())
+        }
+
+    def boards(self):
+        return {
+            key.decode()[len(REDIS_KEY_PREFIX):]
+            for key in self.redis.scan_iter(match=f'{REDIS_KEY_PREFIX}*')
+            if not key.endswith(b':loading')
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.LEADERBOARD_BACKEND == 'redis':
+                    _backend = RedisLeaderboard()
+                else:
+                    _backend = DatabaseLeaderboard()
+    return _backend
+
+
+def ranking_scores(video_ids):
+    """
+    The entries active submissions among ``video_ids`` should have, as
+    ``{video_id: {board: encoded score}}``, computed in two queries.
+    """
+    videos = dict(
+        VideoSubmission.objects.filter(pk__in=video_ids, is_active=True)
+        .values_list('pk', 'competition_id')
+    )
+    means = VideoScoreSummary.objects.filter(
+        video_id__in=videos, mean_score__isnull=False
+    ).values_list('video_id', 'mean_score')
+    scores = {}
+    for video_id, mean in means:
+        competition_id = videos[video_id]
+        scores[video_id] = {board_key(): encode_score(mean, video_id)}
+        if competition_id:
+            scores[video_id][board_key(competition_id)] = encode_score(mean, video_id)
+
+    criteria_means = (
+        CriteriaScore.objects.filter(
+            evaluation__video_id__in=scores,
+            evaluation__status=VideoEvaluation.STATUS_COMPLETED,
+            criteria__is_active=True,
+        )
+        .order_by()
+        .values('evaluation__video_id', 'criteria_id')
+        .annotate(mean=Avg(ExpressionWrapper(
+            Value(100.0) * F('score') / F('criteria__max_score'), output_field=FloatField()
+        )))
+    )
+    for row in criteria_means:
+        video_id, criteria_id = row['evaluation__video_id'], row['criteria_id']
+        score = encode_score(round(row['mean'], 2), video_id)
+        scores[video_id][board_key(criteria_id=criteria_id)] = score
+        if videos[video_id]:
+            scores[video_id][board_key(videos[video_id], criteria_id)] = score
+    return scores
+
+
+def _apply(video_ids, desired):
+    """Write the differences between stored and ``desired`` entries; return their count"""
+    current = {}
+    for video_id, board, score in LeaderboardEntry.objects.filter(video_id__in=video_ids).values_list(
+        'video_id', 'board', 'score'
+    ):
+        current.setdefault(video_id, {})[board] = score
+
+    stale = [
+        (board, video_id)
+        for video_id, boards in current.items()
+        for board in boards
+        if board not in desired.get(video_id, {})
+    ]
+    changed = {
+        video_id: {board: score for board, score in boards.items() if current.get(video_id, {}).get(board) != score}
+        for video_id, boards in desired.items()
+    }
+    changed = {video_id: boards for video_id, boards in changed.items() if boards}
+
+    with transaction.atomic():
+        for board, video_id in stale:
+            # Deleting one by one sends post_delete, which updates Redis
+            LeaderboardEntry.objects.filter(board=board, video_id=video_id).delete()
+        LeaderboardEntry.objects.bulk_create(
+            [
+                LeaderboardEntry(board=board, video_id=video_id, score=score)
+                for video_id, boards in changed.items()
+                for board, score in boards.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['board', 'video'],
+            update_fields=['score'],
+        )
+        backend = get_backend()
+        for video_id, boards in changed.items():
+            transaction.on_commit(lambda video_id=video_id, boards=boards: backend.add(video_id, boards))
+    return len(stale) + sum(len(boards) for boards in changed.values())
+
+
+def update_video_rankings(video_id):
+    """Bring one video's entries on every board up to date"""
+    _apply([video_id], ranking_scores([video_id]))
+
+
+def top(limit=10, competition_id=None, criteria_id=None):
+    return get_backend().top(board_key(competition_id, criteria_id), limit)
+
+
+def video_rank(video_id, competition_id=None, criteria_id=None):
+    return get_backend().rank(board_key(competition_id, criteria_id), video_id)
+
+
+def board_size(competition_id=None, criteria_id=None):
+    return get_backend().count(board_key(competition_id, criteria_id))
+
+
+def best_entry(student, competition_id=None, criteria_id=None):
+    """The student's highest-ranked submission on a board, or None"""
+    return (
+        LeaderboardEntry.objects.filter(
+            board=board_key(competition_id, criteria_id), video__student=student
+        )
+        .order_by('-score').values_list('video_id', flat=True).first()
+    )
+
+
+def student_standing(student, competition_id=None, criteria_id=None):
+    """The Standing of the student's best submission, or None"""
+    video_id = best_entry(student, competition_id, criteria_id)
+    if video_id is None:
+        return None
+    board = board_key(competition_id, criteria_id)
+    score = LeaderboardEntry.objects.filter(board=board, video_id=video_id).values_list(
+        'score', flat=True
+    ).first()
+    rank = get_backend().rank(board, video_id)
+    if rank is None or score is None:
+        return None
+    return Standing(rank, video_id, decode_score(score))
+
+
+def around_student(student, radius=2, competition_id=None, criteria_id=None):
+    """The standings just above and below the student's best submission"""
+    video_id = best_entry(student, competition_id, criteria_id)
+    if video_id is None:
+        return []
+    return get_backend().around(board_key(competition_id, criteria_id), video_id, radius)
+
+
+def rebuild(check=False, batch_size=1000):
+    """
+    Recompute every entry from the database and reload Redis.
+
+    With ``check`` nothing is written; the drift found is returned as
+    ``{'entries': ..., 'redis': ...}`` (counts of entries to change).
+    """
+    drift = {'entries': 0, 'redis': 0}
+    last_video = 0
+    while True:
+        video_ids = list(
+            VideoSubmission.objects.filter(pk__gt=last_video).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not video_ids:
+            break
+        desired = ranking_scores(video_ids)
+        if check:
+            stored = {}
+            for video_id, board, score in LeaderboardEntry.objects.filter(
+                video_id__in=video_ids
+            ).values_list('video_id', 'board', 'score'):
+                stored.setdefault(video_id, {})[board] = score
+            drift['entries'] += sum(
+                len(set(stored.get(v, {}).items()) ^ set(desired.get(v, {}).items()))
+                for v in set(stored) | set(desired)
+            )
+        else:
+            drift['entries'] += _apply(video_ids, desired)
+        last_video = video_ids[-1]
+
+    backend = get_backend()
+    if isinstance(backend, RedisLeaderboard):
+        boards = set(LeaderboardEntry.objects.values_list('board', flat=True).distinct())
+        for board in boards | backend.boards():
+            entries = LeaderboardEntry.objects.filter(board=board).order_by('pk')
+            if check:
+                stored = entries.count()
+                missing = 0
+                for start in range(0, stored, batch_size):
+                    rows = dict(entries.values_list('video_id', 'score')[start:start + batch_size])
+                    for video_id, score in backend.scores(board, list(rows)).items():
+                        missing += score is None
+                        drift['redis'] += score != rows[video_id]
+                # Members Redis has but the database does not
+                drift['redis'] += backend.count(board) - (stored - missing)
+            else:
+                backend.load(board, entries.values_list('video_id', 'score').iterator(chunk_size=batch_size))
+    if not check:
+        logger.info(f"Leaderboards rebuilt ({drift['entries']} entries corrected)")
+    return drift
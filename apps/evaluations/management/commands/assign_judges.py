@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from evaluations.assignment import assign_judges, drop_judge
+from videos.models import VideoSubmission
+
+
+class Command(BaseCommand):
+    help = 'Assign judges to active submissions that do not have enough of them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--judges-per-video', type=int,
+            help='Judges per submission (default: JUDGES_PER_SUBMISSION)',
+        )
+        parser.add_argument(
+            '--competition', type=int,
+            help='Only assign submissions of this competition',
+        )
+        parser.add_argument(
+            '--drop-judge', type=int, metavar='USER_ID',
+            help='Take this judge off their open assignments and reassign those submissions',
+        )
+        parser.add_argument(
+            '--seed', type=int,
+            help='Random seed for tie-breaking, for reproducible plans',
+        )
+
+    def handle(self, *args, **options):
+        if options['drop_judge']:
+            try:
+                judge = User.objects.get(pk=options['drop_judge'], user_type='judge')
+            except User.DoesNotExist:
+                raise CommandError(f"No judge with id {options['drop_judge']}")
+            created = drop_judge(judge, options['judges_per_video'])
+            self.stdout.write(self.style.SUCCESS(f'Reassigned {created} reviews.'))
+            return
+
+        videos = None
+        if options['competition']:
+            videos = VideoSubmission.objects.filter(competition_id=options['competition'])
+        created = assign_judges(videos, options['judges_per_video'], options['seed'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} assignments.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from evaluations.reports import REPORT_TEMPLATES, generate_reports
+
+
+class Command(BaseCommand):
+    help = 'Render PDF reports for students or judges and bundle them into a zip in media storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(REPORT_TEMPLATES))
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only report on this user (repeatable); default: all active users of the kind',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or list(
+            User.objects.filter(user_type=options['kind'], is_active=True)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        bundle, rendered, reused = generate_reports(options['kind'], user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'{bundle}: {rendered} reports rendered, {reused} unchanged.'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from evaluations.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute leaderboard entries from the scores and reload the Redis boards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report entries that are out of date; exit with status 1 if any are',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Videos recomputed per batch',
+        )
+
+    def handle(self, *args, **options):
+        drift = rebuild(check=options['check'], batch_size=options['batch_size'])
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Leaderboards rebuilt; {drift['entries']} entries corrected."
+            ))
+            return
+        if drift['entries'] or drift['redis']:
+            self.stderr.write(
+                f"Out of date: {drift['entries']} database entries, {drift['redis']} Redis entries."
+            )
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS('Leaderboards are consistent.'))
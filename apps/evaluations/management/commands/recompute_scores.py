@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from evaluations.scoring import recompute_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute overall evaluation scores and video score summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Evaluations or videos updated per transaction',
+        )
+
+    def handle(self, *args, **options):
+        evaluations, summaries = recompute_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {evaluations} evaluations and {summaries} video summaries.'
+        ))
@@ -0,0 +1,253 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:43
+
+import core.models
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("videos", "0005_content_blobs"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CriteriaScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.PositiveIntegerField()),
+                ("notes", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "Criteria Score",
+                "verbose_name_plural": "Criteria Scores",
+                "db_table": "evaluations_criteriascore",
+            },
+        ),
+        migrations.CreateModel(
+            name="EvaluationCriteria",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True)),
+                (
+                    "max_score",
+                    models.PositiveIntegerField(
+                        default=10,
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                (
+                    "weight",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("1.00"),
+                        help_text="Relative weight in the overall score",
+                        max_digits=3,
+                        validators=[
+                            django.core.validators.MinValueValidator(Decimal("0.01"))
+                        ],
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=True)),
+                ("order", models.PositiveSmallIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Evaluation Criteria",
+                "verbose_name_plural": "Evaluation Criteria",
+                "db_table": "evaluations_evaluationcriteria",
+                "ordering": ["order", "name"],
+            },
+            bases=(core.models.DirtyFieldsMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name="VideoEvaluation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("draft", "Draft"), ("completed", "Completed")],
+                        default="draft",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "overall_score",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        editable=False,
+                        help_text="Weighted score out of 100, maintained from the criteria scores",
+                        max_digits=5,
+                        null=True,
+                    ),
+                ),
+                ("written_feedback", models.TextField(blank=True)),
+                ("evaluated_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Video Evaluation",
+                "verbose_name_plural": "Video Evaluations",
+                "db_table": "evaluations_videoevaluation",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="VideoScoreSummary",
+            fields=[
+                (
+                    "video",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="score_summary",
+                        serialize=False,
+                        to="videos.videosubmission",
+                    ),
+                ),
+                ("evaluation_count", models.PositiveIntegerField(default=0)),
+                (
+                    "mean_score",
+                    models.DecimalField(decimal_places=2, max_digits=5, null=True),
+                ),
+                (
+                    "min_score",
+                    models.DecimalField(decimal_places=2, max_digits=5, null=True),
+                ),
+                (
+                    "max_score",
+                    models.DecimalField(decimal_places=2, max_digits=5, null=True),
+                ),
+                (
+                    "score_stddev",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Spread of the judges' overall scores (population standard deviation)",
+                        max_digits=5,
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Video Score Summary",
+                "verbose_name_plural": "Video Score Summaries",
+                "db_table": "evaluations_videoscoresummary",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="evaluationcriteria",
+            constraint=models.CheckConstraint(
+                check=models.Q(("max_score__gte", 1)),
+                name="evaluations_criteria_max_score",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="evaluationcriteria",
+            constraint=models.CheckConstraint(
+                check=models.Q(("weight__gt", 0)), name="evaluations_criteria_weight"
+            ),
+        ),
+        migrations.AddField(
+            model_name="criteriascore",
+            name="criteria",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="scores",
+                to="evaluations.evaluationcriteria",
+            ),
+        ),
+        migrations.AddField(
+            model_name="videoevaluation",
+            name="judge",
+            field=models.ForeignKey(
+                limit_choices_to={"user_type": "judge"},
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="evaluations",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="videoevaluation",
+            name="video",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="evaluations",
+                to="videos.videosubmission",
+            ),
+        ),
+        migrations.AddField(
+            model_name="criteriascore",
+            name="evaluation",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="scores",
+                to="evaluations.videoevaluation",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="videoscoresummary",
+            index=models.Index(
+                fields=["-mean_score"], name="evaluations_summary_mean_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="videoevaluation",
+            index=models.Index(
+                fields=["judge", "-created_at"], name="evaluations_judge_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="videoevaluation",
+            index=models.Index(
+                fields=["video", "status"], name="evaluations_video_status_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="videoevaluation",
+            constraint=models.UniqueConstraint(
+                fields=("video", "judge"), name="evaluations_one_per_judge"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="criteriascore",
+            constraint=models.UniqueConstraint(
+                fields=("evaluation", "criteria"), name="evaluations_score_unique"
+            ),
+        ),
+    ]
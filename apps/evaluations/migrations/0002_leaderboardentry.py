@@ -0,0 +1,59 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("evaluations", "0001_initial"),
+        ("videos", "0006_competition_videosubmission_competition"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("board", models.CharField(max_length=50)),
+                (
+                    "score",
+                    models.BigIntegerField(
+                        help_text="Encoded score and tie-breaker; higher ranks first"
+                    ),
+                ),
+                (
+                    "video",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to="videos.videosubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Leaderboard Entry",
+                "verbose_name_plural": "Leaderboard Entries",
+                "db_table": "evaluations_leaderboardentry",
+                "indexes": [
+                    models.Index(
+                        fields=["board", "-score"], name="evaluations_board_score_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboardentry",
+            constraint=models.UniqueConstraint(
+                fields=("board", "video"), name="evaluations_board_video_unique"
+            ),
+        ),
+    ]
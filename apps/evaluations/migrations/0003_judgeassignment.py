@@ -0,0 +1,81 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("evaluations", "0002_leaderboardentry"),
+        ("videos", "0007_competition_expertise_area"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JudgeAssignment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("assigned", "Assigned"),
+                            ("completed", "Completed"),
+                            ("dropped", "Dropped"),
+                        ],
+                        default="assigned",
+                        max_length=10,
+                    ),
+                ),
+                ("expertise_match", models.BooleanField(default=False)),
+                ("assigned_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "judge",
+                    models.ForeignKey(
+                        limit_choices_to={"user_type": "judge"},
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="judge_assignments",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "video",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="judge_assignments",
+                        to="videos.videosubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Judge Assignment",
+                "verbose_name_plural": "Judge Assignments",
+                "db_table": "evaluations_judgeassignment",
+                "ordering": ["-assigned_at"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "assigned")),
+                        fields=["judge"],
+                        name="evaluations_assign_open_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="judgeassignment",
+            constraint=models.UniqueConstraint(
+                fields=("video", "judge"), name="evaluations_assignment_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("evaluations", "0003_judgeassignment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videoevaluation",
+            name="draft_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Version of the last autosaved draft written here (see evaluations.drafts)",
+            ),
+        ),
+    ]
@@ -1,3 +1,333 @@
-from django.db import models
+from decimal import Decimal
+from functools import partial
 
-# Create your models here.
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from core.models import DirtyFieldsMixin
+from videos.models import VideoSubmission
+
+
+class EvaluationCriteria(DirtyFieldsMixin, models.Model):
+    """A criterion judges score videos on"""
+
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    max_score = models.PositiveIntegerField(default=10, validators=[MinValueValidator(1)])
+    weight = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=Decimal('1.00'),
+        validators=[MinValueValidator(Decimal('0.01'))],
+        help_text=_('Relative weight in the overall score')
+    )
+    is_active = models.BooleanField(default=True)
+    order = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'evaluations_evaluationcriteria'
+        verbose_name = _('Evaluation Criteria')
+        verbose_name_plural = _('Evaluation Criteria')
+        ordering = ['order', 'name']
+        constraints = [
+            models.CheckConstraint(check=models.Q(max_score__gte=1), name='evaluations_criteria_max_score'),
+            models.CheckConstraint(check=models.Q(weight__gt=0), name='evaluations_criteria_weight'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        # Stored overall scores depend on these; recompute them all
+        scoring_changed = not self._state.adding and self.is_dirty('weight', 'max_score', 'is_active')
+        super().save(*args, **kwargs)
+        if scoring_changed:
+            from .tasks import recompute_scores
+
+            transaction.on_commit(recompute_scores.delay)
+
+
+class VideoEvaluation(models.Model):
+    """One judge's evaluation of a video"""
+
+    STATUS_DRAFT = 'draft'
+    STATUS_COMPLETED = 'completed'
+
+    STATUS_CHOICES = [
+        (STATUS_DRAFT, _('Draft')),
+        (STATUS_COMPLETED, _('Completed')),
+    ]
+
+    video = models.ForeignKey(
+        'videos.VideoSubmission',
+        on_delete=models.CASCADE,
+        related_name='evaluations'
+    )
+    judge = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        limit_choices_to={'user_type': 'judge'},
+        related_name='evaluations'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_DRAFT
+    )
+    overall_score = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_('Weighted score out of 100, maintained from the criteria scores')
+    )
+    written_feedback = models.TextField(blank=True)
+    evaluated_at = models.DateTimeField(null=True, blank=True)
+    draft_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=_('Version of the last autosaved draft written here (see evaluations.drafts)')
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'evaluations_videoevaluation'
+        verbose_name = _('Video Evaluation')
+        verbose_name_plural = _('Video Evaluations')
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'judge'], name='evaluations_one_per_judge'),
+        ]
+        indexes = [
+            models.Index(fields=['judge', '-created_at'], name='evaluations_judge_idx'),
+            models.Index(fields=['video', 'status'], name='evaluations_video_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video} by {self.judge}"
+
+    @property
+    def is_completed(self):
+        return self.status == self.STATUS_COMPLETED
+
+
+class CriteriaScore(models.Model):
+    """A judge's score on one criterion"""
+
+    evaluation = models.ForeignKey(
+        VideoEvaluation,
+        on_delete=models.CASCADE,
+        related_name='scores'
+    )
+    criteria = models.ForeignKey(
+        EvaluationCriteria,
+        on_delete=models.PROTECT,
+        related_name='scores'
+    )
+    score = models.PositiveIntegerField()
+    notes = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'evaluations_criteriascore'
+        verbose_name = _('Criteria Score')
+        verbose_name_plural = _('Criteria Scores')
+        constraints = [
+            models.UniqueConstraint(fields=['evaluation', 'criteria'], name='evaluations_score_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.criteria}: {self.score}"
+
+
+class VideoScoreSummary(models.Model):
+    """
+    Aggregate of a video's completed evaluations.
+
+    Maintained in the transaction of every score write (see
+    evaluations.scoring), so reading a video's score is one row.
+    """
+
+    video = models.OneToOneField(
+        'videos.VideoSubmission',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score_summary'
+    )
+    evaluation_count = models.PositiveIntegerField(default=0)
+    mean_score = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    min_score = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    max_score = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    score_stddev = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        help_text=_('Spread of the judges\' overall scores (population standard deviation)')
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'evaluations_videoscoresummary'
+        verbose_name = _('Video Score Summary')
+        verbose_name_plural = _('Video Score Summaries')
+        indexes = [
+            models.Index(fields=['-mean_score'], name='evaluations_summary_mean_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video_id}: {self.mean_score}"
+
+    @property
+    def score_range(self):
+        if self.min_score is None:
+            return None
+        return self.max_score - self.min_score
+
+
+class JudgeAssignment(models.Model):
+    """A submission a judge is asked to evaluate (see evaluations.assignment)"""
+
+    STATUS_ASSIGNED = 'assigned'
+    STATUS_COMPLETED = 'completed'
+    STATUS_DROPPED = 'dropped'
+
+    STATUS_CHOICES = [
+        (STATUS_ASSIGNED, _('Assigned')),
+        (STATUS_COMPLETED, _('Completed')),
+        (STATUS_DROPPED, _('Dropped')),
+    ]
+
+    video = models.ForeignKey(
+        'videos.VideoSubmission',
+        on_delete=models.CASCADE,
+        related_name='judge_assignments'
+    )
+    judge = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        limit_choices_to={'user_type': 'judge'},
+        related_name='judge_assignments'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_ASSIGNED
+    )
+    expertise_match = models.BooleanField(default=False)
+    assigned_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'evaluations_judgeassignment'
+        verbose_name = _('Judge Assignment')
+        verbose_name_plural = _('Judge Assignments')
+        ordering = ['-assigned_at']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'judge'], name='evaluations_assignment_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['judge'],
+                name='evaluations_assign_open_idx',
+                condition=models.Q(status='assigned'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.video_id} -> {self.judge_id} ({self.status})"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A video's position key on one leaderboard (see evaluations.leaderboard).
+
+    The rows are the durable copy of every board: ranks are served from
+    here when Redis is not used, and Redis is rebuilt from them.
+    """
+
+    board = models.CharField(max_length=50)
+    video = models.ForeignKey(
+        'videos.VideoSubmission',
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entries'
+    )
+    score = models.BigIntegerField(help_text=_('Encoded score and tie-breaker; higher ranks first'))
+
+    class Meta:
+        db_table = 'evaluations_leaderboardentry'
+        verbose_name = _('Leaderboard Entry')
+        verbose_name_plural = _('Leaderboard Entries')
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'video'], name='evaluations_board_video_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['board', '-score'], name='evaluations_board_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.board}: {self.video_id}"
+
+
+# Keep stored scores in step with single-row writes (admin, shell); bulk
+# writes go through evaluations.scoring and refresh once
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+@receiver(post_save, sender=CriteriaScore)
+def refresh_scores_on_save(sender, instance, **kwargs):
+    """Update the evaluation's overall score and its video's summary"""
+    from .scoring import refresh_evaluation
+
+    refresh_evaluation(instance.evaluation_id)
+
+
+@receiver(post_delete, sender=CriteriaScore)
+def refresh_scores_on_delete(sender, instance, origin=None, **kwargs):
+    if getattr(origin, 'model', type(origin)) is not CriteriaScore:
+        # Cascading from its evaluation, which refreshes the summary itself
+        return
+    from .scoring import refresh_evaluation
+
+    refresh_evaluation(instance.evaluation_id)
+
+
+@receiver([post_save, post_delete], sender=VideoEvaluation)
+def refresh_scores_for_evaluation(sender, instance, **kwargs):
+    """A status change or deletion changes the video's summary"""
+    from .scoring import refresh_video_summary
+
+    refresh_video_summary(instance.video_id)
+
+
+@receiver(post_save, sender=VideoEvaluation)
+def complete_assignment(sender, instance, **kwargs):
+    """A completed evaluation closes the judge's assignment for the video"""
+    if instance.status == VideoEvaluation.STATUS_COMPLETED:
+        JudgeAssignment.objects.filter(
+            video_id=instance.video_id, judge_id=instance.judge_id, status=JudgeAssignment.STATUS_ASSIGNED
+        ).update(status=JudgeAssignment.STATUS_COMPLETED, updated_at=timezone.now())
+
+
+@receiver(post_save, sender=VideoSubmission)
+def rerank_video(sender, instance, created, **kwargs):
+    """Moving a video to another competition or deactivating it moves its entries"""
+    if not created:
+        from .leaderboard import update_video_rankings
+
+        transaction.on_commit(partial(update_video_rankings, instance.pk))
+
+
+@receiver(post_delete, sender=LeaderboardEntry)
+def remove_ranking(sender, instance, **kwargs):
+    """Drop the entry from the Redis copy of its board too"""
+    from .leaderboard import get_backend
+
+    transaction.on_commit(partial(get_backend().remove, instance.board, [instance.video_id]))
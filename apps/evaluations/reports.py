@@ -0,0 +1,337 @@
+"""
+PDF reports: feedback for students and judging summaries for judges.
+
+A report set is built in three steps:
+
+1. Contexts are loaded for a batch of users with a fixed number of
+   queries (users, submissions, evaluations, criteria scores), however
+   many reports the batch holds. They are plain, JSON-safe data.
+2. Each report is keyed by a hash of its template sources and context.
+   A PDF already stored under ``reports/cache/<epoch>-<key>.pdf`` is
+   reused, so an unchanged report is not rendered again. The epoch
+   advances every ``REPORT_CACHE_MAX_AGE_DAYS``; the media sweeper
+   deletes entries older than the previous epoch, so the cache only holds
+   reports rendered in the last one or two epochs.
+3. The remaining reports are rendered with xhtml2pdf in a process pool
+   (``REPORT_RENDER_WORKERS``), cached, and every PDF of the set is
+   bundled into one zip under ``reports/bundles/``.
+
+Rendering runs in ``tasks.generate_reports``; the bundle is linked from
+the admin job page like other job results.
+"""
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import User
+from core.models import BackgroundJob
+from videos.models import VideoSubmission
+from .models import CriteriaScore, VideoEvaluation
+
+logger = logging.getLogger(__name__)
+
+SITE_NAME = 'Video Platform'
+REPORT_BATCH_SIZE = 500
+CACHE_PREFIX = 'reports/cache/'
+BUNDLE_PREFIX = 'reports/bundles/'
+
+REPORT_STUDENT = 'student'
+REPORT_JUDGE = 'judge'
+
+REPORT_TEMPLATES = {
+    REPORT_STUDENT: 'reports/student_feedback.html',
+    REPORT_JUDGE: 'reports/judge_summary.html',
+}
+BASE_TEMPLATE = 'reports/base.html'
+
+JOB_KINDS = {
+    REPORT_STUDENT: 'student_reports',
+    REPORT_JUDGE: 'judge_reports',
+}
+
+
+class ReportError(Exception):
+    pass
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def _score(value):
+    return str(value) if value is not None else None
+
+
+def _person(user):
+    return user.profile.full_name or user.username
+
+
+def _scores_by_evaluation(evaluation_ids):
+    scores = defaultdict(list)
+    rows = (
+        CriteriaScore.objects.filter(evaluation__in=evaluation_ids)
+        .order_by('criteria__order', 'criteria__name')
+        .values_list('evaluation_id', 'criteria__name', 'score', 'criteria__max_score', 'notes')
+    )
+    for evaluation_id, criteria, score, max_score, notes in rows:
+        scores[evaluation_id].append(
+            {'criteria': criteria, 'score': score, 'max_score': max_score, 'notes': notes}
+        )
+    return scores
+
+
+def _completed():
+    return VideoEvaluation.objects.filter(status=VideoEvaluation.STATUS_COMPLETED)
+
+
+def student_contexts(user_ids):
+    """``{user_id: context}`` for students' feedback reports"""
+    students = User.objects.filter(pk__in=user_ids, user_type='student').select_related('profile')
+    contexts = {
+        student.pk: {
+            'student': {
+                'name': _person(student),
+                'organization': student.profile.school_organization,
+            },
+            'videos': [],
+        }
+        for student in students
+    }
+    videos = (
+        VideoSubmission.objects.filter(student__in=list(contexts), is_active=True)
+        .select_related('competition', 'score_summary')
+        .order_by('uploaded_at', 'pk')
+    )
+    by_video = {}
+    for video in videos:
+        summary = getattr(video, 'score_summary', None)
+        by_video[video.pk] = {
+            'title': video.title,
+            'uploaded_at': _date(video.uploaded_at),
+            'competition': video.competition.name if video.competition else '',
+            'summary': summary and {
+                'mean_score': _score(summary.mean_score),
+                'evaluation_count': summary.evaluation_count,
+                'min_score': _score(summary.min_score),
+                'max_score': _score(summary.max_score),
+            },
+            'evaluations': [],
+        }
+        contexts[video.student_id]['videos'].append(by_video[video.pk])
+
+    evaluations = list(
+        _completed().filter(video__in=list(by_video)).order_by('video_id', 'evaluated_at', 'pk')
+        .values_list('pk', 'video_id', 'overall_score', 'evaluated_at', 'written_feedback')
+    )
+    scores = _scores_by_evaluation([row[0] for row in evaluations])
+    for pk, video_id, overall_score, evaluated_at, feedback in evaluations:
+        video = by_video[video_id]
+        # Judges stay anonymous to students
+        video['evaluations'].append({
+            'judge': f"Judge {len(video['evaluations']) + 1}",
+            'overall_score': _score(overall_score),
+            'evaluated_at': _date(evaluated_at),
+            'feedback': feedback,
+            'scores': scores[pk],
+        })
+    return contexts
+
+
+def judge_contexts(user_ids):
+    """``{user_id: context}`` for judges' summaries"""
+    judges = User.objects.filter(pk__in=user_ids, user_type='judge').select_related('profile')
+    contexts = {
+        judge.pk: {
+            'judge': {
+                'name': _person(judge),
+                'expertise': judge.profile.expertise_area,
+            },
+            'evaluations': [],
+        }
+        for judge in judges
+    }
+    evaluations = list(
+        _completed().filter(judge__in=list(contexts)).order_by('judge_id', 'evaluated_at', 'pk')
+        .values_list('pk', 'judge_id', 'video__title', 'overall_score', 'evaluated_at')
+    )
+    scores = _scores_by_evaluation([row[0] for row in evaluations])
+    for pk, judge_id, title, overall_score, evaluated_at in evaluations:
+        contexts[judge_id]['evaluations'].append({
+            'video_title': title,
+            'overall_score': _score(overall_score),
+            'evaluated_at': _date(evaluated_at),
+            'scores': scores[pk],
+        })
+
+    for context in contexts.values():
+        given = [e['overall_score'] for e in context['evaluations'] if e['overall_score'] is not None]
+        context['mean_score'] = f'{sum(map(float, given)) / len(given):.2f}' if given else None
+        per_criteria = defaultdict(list)
+        for evaluation in context['evaluations']:
+            for score in evaluation['scores']:
+                per_criteria[(score['criteria'], score['max_score'])].append(score['score'])
+        context['criteria_means'] = [
+            {'criteria': criteria, 'max_score': max_score, 'mean': f'{sum(values) / len(values):.1f}'}
+            for (criteria, max_score), values in per_criteria.items()
+        ]
+    return contexts
+
+
+CONTEXT_BUILDERS = {
+    REPORT_STUDENT: student_contexts,
+    REPORT_JUDGE: judge_contexts,
+}
+
+
+@lru_cache(maxsize=None)
+def _template_digest(template_name):
+    digest = hashlib.sha256()
+    for name in (BASE_TEMPLATE, template_name):
+        digest.update(get_template(name).template.source.encode())
+    return digest.hexdigest()
+
+
+def report_key(template_name, context):
+    """Content hash of everything that goes into a report"""
+    digest = hashlib.sha256(_template_digest(template_name).encode())
+    digest.update(json.dumps(context, sort_keys=True, separators=(',', ':')).encode())
+    return digest.hexdigest()
+
+
+def render_pdf(template_name, context):
+    """Render one report to PDF bytes (runs in a pool worker)"""
+    from xhtml2pdf import pisa
+
+    html = render_to_string(template_name, {'site_name': SITE_NAME, **context})
+    output = io.BytesIO()
+    result = pisa.CreatePDF(html, dest=output, encoding='utf-8')
+    if result.err:
+        raise ReportError(f'Could not render {template_name} ({result.err} errors)')
+    return output.getvalue()
+
+
+def _render_all(template_name, contexts):
+    """Render contexts in parallel; yields PDFs in order"""
+    workers = settings.REPORT_RENDER_WORKERS
+    # Daemonic processes (e.g. prefork pool children) cannot start a pool
+    if workers <= 1 or len(contexts) <= 1 or multiprocessing.current_process().daemon:
+        yield from (render_pdf(template_name, context) for context in contexts)
+        return
+    # Forked workers inherit the configured Django; they only render templates
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(contexts)), mp_context=multiprocessing.get_context('fork')
+    ) as pool:
+        yield from pool.map(render_pdf, [template_name] * len(contexts), contexts)
+
+
+def _filename(kind, user_id, context):
+    # Contexts name their subject after the report kind
+    return f"{kind}-{user_id}-{slugify(context[kind]['name']) or 'report'}.pdf"
+
+
+def cache_epoch():
+    """Index of the current cache period"""
+    return int(time.time() // (settings.REPORT_CACHE_MAX_AGE_DAYS * 24 * 60 * 60))
+
+
+def generate_reports(kind, user_ids, progress=None):
+    """
+    Render (or reuse) the reports of ``kind`` for ``user_ids`` and bundle
+    them into a zip in storage. Returns ``(bundle name, rendered, reused)``.
+    """
+    template_name = REPORT_TEMPLATES[kind]
+    build = CONTEXT_BUILDERS[kind]
+    entries = []
+    rendered = reused = 0
+    epoch = cache_epoch()
+
+    for start in range(0, len(user_ids), REPORT_BATCH_SIZE):
+        chunk = user_ids[start:start + REPORT_BATCH_SIZE]
+        contexts = build(chunk)
+        pending = {}
+        for user_id in chunk:
+            if user_id not in contexts:
+                continue
+            name = f'{CACHE_PREFIX}{epoch}-{report_key(template_name, contexts[user_id])}.pdf'
+            entries.append((_filename(kind, user_id, contexts[user_id]), name))
+            if name in pending or default_storage.exists(name):
+                reused += 1
+            else:
+                pending[name] = contexts[user_id]
+
+        pdfs = _render_all(template_name, list(pending.values()))
+        for name, pdf in zip(pending, pdfs):
+            default_storage.save(name, ContentFile(pdf))
+            rendered += 1
+        if progress:
+            progress(len(chunk))
+
+    bundle = f"{BUNDLE_PREFIX}{kind}-reports-{timezone.now():%Y%m%d%H%M%S}.zip"
+    with tempfile.TemporaryFile() as tmp:
+        # PDFs are compressed already
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as archive:
+            for filename, name in entries:
+                with default_storage.open(name) as pdf, archive.open(filename, 'w') as member:
+                    for chunk in pdf.chunks():
+                        member.write(chunk)
+        tmp.seek(0)
+        bundle = default_storage.save(bundle, File(tmp, name=bundle))
+    logger.info(f"Report bundle {bundle}: {rendered} rendered, {reused} reused")
+    return bundle, rendered, reused
+
+
+def start_report_job(user, kind, user_ids):
+    """Queue generation of a report set; returns its BackgroundJob"""
+    from .tasks import generate_reports as generate_reports_task
+
+    job = BackgroundJob.objects.create(
+        kind=JOB_KINDS[kind],
+        description=f'{kind.title()} reports ({len(user_ids)} users)',
+        total=len(user_ids),
+        payload={'report': kind, 'user_ids': user_ids},
+        created_by=user,
+    )
+    transaction.on_commit(lambda: generate_reports_task.delay(job.pk))
+    return job
+
+
+def can_download_report(request, name):
+    """Media access rule for ``reports/``: staff only"""
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def referenced_reports(names):
+    """
+    Cached PDFs of the current and previous epoch, and bundles a job still
+    links to, among ``names`` (for core.sweeper). The previous epoch stays
+    so a job that started before the epoch advanced can still bundle it.
+    """
+    names = list(names)
+    epoch = cache_epoch()
+    live_epochs = {str(epoch), str(epoch - 1)}
+    cached = {
+        name for name in names
+        if name.startswith(CACHE_PREFIX)
+        and name[len(CACHE_PREFIX):].split('-', 1)[0] in live_epochs
+    }
+    bundles = BackgroundJob.objects.filter(
+        kind__in=JOB_KINDS.values(), payload__file__in=names
+    ).values_list('payload__file', flat=True)
+    return cached | set(bundles)
@@ -0,0 +1,229 @@
+"""
+Database-side maintenance of evaluation scores.
+
+``VideoEvaluation.overall_score`` is the weighted mean of its criteria
+scores, each normalized by the criterion's maximum, on a 0-100 scale:
+
+    100 * sum(score / max_score * weight) / sum(weight)
+
+over active criteria. ``VideoScoreSummary`` holds the mean, count, range
+and standard deviation of a video's completed evaluations. Both are
+computed by the database (a correlated subquery and one aggregate query)
+and written in the transaction of the score write that changed them, so
+pages read stored values instead of recomputing totals in Python.
+
+Writes to a video's summary are serialized on the submission row, so
+judges scoring the same video concurrently cannot leave a stale
+aggregate behind. Once the transaction commits, the video's leaderboard
+entries follow (see evaluations.leaderboard).
+"""
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import (
+    Avg,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Min,
+    OuterRef,
+    StdDev,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from videos.models import VideoSubmission
+from .leaderboard import rebuild as rebuild_leaderboards, update_video_rankings
+from .models import CriteriaScore, EvaluationCriteria, VideoEvaluation, VideoScoreSummary
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELD = DecimalField(max_digits=5, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+def overall_score_subquery(evaluation_ref=OuterRef('pk')):
+    """SQL expression for the overall score of the evaluation ``evaluation_ref``"""
+    weighted = ExpressionWrapper(
+        100 * Sum(Cast('score', FloatField()) * F('criteria__weight') / F('criteria__max_score'))
+        / Sum('criteria__weight'),
+        output_field=FloatField(),
+    )
+    scores = (
+        CriteriaScore.objects.filter(evaluation=evaluation_ref, criteria__is_active=True)
+        .order_by()
+        .values('evaluation')
+        .annotate(value=weighted)
+        .values('value')
+    )
+    return Subquery(scores, output_field=SCORE_FIELD)
+
+
+def _summary_aggregates():
+    return {
+        'evaluation_count': Count('pk'),
+        'mean_score': Avg('overall_score'),
+        'min_score': Min('overall_score'),
+        'max_score': Max('overall_score'),
+        'score_stddev': StdDev('overall_score'),
+    }
+
+
+def _completed_evaluations():
+    return VideoEvaluation.objects.filter(
+        status=VideoEvaluation.STATUS_COMPLETED, overall_score__isnull=False
+    )
+
+
+def _as_score(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _summary_values(stats):
+    return {
+        'evaluation_count': stats['evaluation_count'],
+        **{
+            field: _as_score(stats[field])
+            for field in ('mean_score', 'min_score', 'max_score', 'score_stddev')
+        },
+    }
+
+
+def refresh_video_summary(video_id):
+    """Recompute a video's summary from its completed evaluations"""
+    with transaction.atomic():
+        locked = VideoSubmission.objects.select_for_update().filter(pk=video_id).values_list('pk')
+        if not locked:
+            return None
+        transaction.on_commit(partial(update_video_rankings, video_id))
+        stats = _completed_evaluations().filter(video_id=video_id).aggregate(**_summary_aggregates())
+        if not stats['evaluation_count']:
+            VideoScoreSummary.objects.filter(video_id=video_id).delete()
+            return None
+        summary, _ = VideoScoreSummary.objects.update_or_create(
+            video_id=video_id, defaults=_summary_values(stats)
+        )
+    return summary
+
+
+def refresh_evaluation(evaluation_id):
+    """Recompute an evaluation's overall score, then its video's summary"""
+    with transaction.atomic():
+        VideoEvaluation.objects.filter(pk=evaluation_id).update(
+            overall_score=overall_score_subquery(), updated_at=timezone.now()
+        )
+        video_id = (
+            VideoEvaluation.objects.filter(pk=evaluation_id).values_list('video_id', flat=True).first()
+        )
+        if video_id is not None:
+            refresh_video_summary(video_id)
+
+
+def save_scores(evaluation, scores):
+    """
+    Store a judge's scores, ``{criteria: (score, notes)}``, and update the
+    overall score and video summary once for the whole batch.
+    """
+    rows = []
+    for criteria, (score, notes) in scores.items():
+        if not criteria.is_active:
+            raise ValidationError(f'{criteria} is no longer used')
+        if not 0 <= score <= criteria.max_score:
+            raise ValidationError(f'{criteria} must be scored between 0 and {criteria.max_score}')
+        rows.append(CriteriaScore(evaluation=evaluation, criteria=criteria, score=score, notes=notes or ''))
+
+    with transaction.atomic():
+        CriteriaScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['evaluation', 'criteria'],
+            update_fields=['score', 'notes'],
+        )
+        refresh_evaluation(evaluation.pk)
+    evaluation.refresh_from_db(fields=['overall_score', 'updated_at'])
+    return evaluation
+
+
+def complete_evaluation(evaluation):
+    """Mark an evaluation completed once every active criterion is scored"""
+    from .drafts import flush_draft, get_backend as get_draft_backend
+
+    # Autosaved changes not yet flushed belong to the completed evaluation
+    flush_draft(evaluation.pk)
+    missing = EvaluationCriteria.objects.filter(is_active=True).exclude(
+        scores__evaluation=evaluation
+    )
+    if missing.exists():
+        raise ValidationError('Score every criterion before completing the evaluation')
+    evaluation.status = VideoEvaluation.STATUS_COMPLETED
+    evaluation.evaluated_at = timezone.now()
+    # post_save refreshes the video's summary in the same transaction
+    with transaction.atomic():
+        evaluation.save(update_fields=['status', 'evaluated_at', 'updated_at'])
+    get_draft_backend().discard(evaluation.pk)
+    return evaluation
+
+
+def recompute_all(batch_size=1000):
+    """
+    Recompute every overall score and summary, e.g. after criteria weights
+    changed. Works in primary key batches so no statement holds locks on
+    the whole table. Returns ``(evaluations, summaries)`` updated.
+    """
+    evaluations = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            VideoEvaluation.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        with transaction.atomic():
+            evaluations += VideoEvaluation.objects.filter(pk__in=pks).update(
+                overall_score=overall_score_subquery()
+            )
+        last_pk = pks[-1]
+
+    summaries = 0
+    last_video = 0
+    while True:
+        video_ids = list(
+            VideoSubmission.objects.filter(pk__gt=last_video).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not video_ids:
+            break
+        with transaction.atomic():
+            # Same locks as refresh_video_summary
+            list(VideoSubmission.objects.select_for_update().filter(pk__in=video_ids).values_list('pk'))
+            rows = list(
+                _completed_evaluations().filter(video_id__in=video_ids)
+                .order_by().values('video_id').annotate(**_summary_aggregates())
+            )
+            VideoScoreSummary.objects.bulk_create(
+                [VideoScoreSummary(video_id=row['video_id'], **_summary_values(row)) for row in rows],
+                update_conflicts=True,
+                unique_fields=['video'],
+                update_fields=['evaluation_count', 'mean_score', 'min_score', 'max_score',
+                               'score_stddev', 'updated_at'],
+            )
+            summaries += len(rows)
+            VideoScoreSummary.objects.filter(video_id__in=video_ids).exclude(
+                video_id__in=[row['video_id'] for row in rows]
+            ).delete()
+        last_video = video_ids[-1]
+
+    rebuild_leaderboards(batch_size=batch_size)
+    logger.info(f"Recomputed {evaluations} evaluation scores and {summaries} video summaries")
+    return evaluations, summaries
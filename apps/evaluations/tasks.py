@@ -0,0 +1,69 @@
+import logging
+
+from celery import shared_task
+
+from core.models import BackgroundJob
+from . import assignment, drafts, exports, reports
+from .scoring import recompute_all
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def recompute_scores():
+    """Recompute stored scores after criteria weights or maxima changed"""
+    recompute_all()
+
+
+@shared_task(ignore_result=True)
+def flush_evaluation_drafts():
+    """Write autosaved drafts to the database, once per draft per run"""
+    drafts.flush_drafts()
+
+
+@shared_task(ignore_result=True)
+def assign_judges():
+    """Give new or understaffed submissions their judges"""
+    assignment.assign_judges()
+
+
+@shared_task(ignore_result=True)
+def export_scores(job_id):
+    """Write a Parquet export of the criteria scores to media storage"""
+    job = BackgroundJob.objects.get(pk=job_id)
+    if job.is_finished:
+        return
+    job.mark_running()
+    # A retried export writes the file from the start again
+    job.processed = 0
+    BackgroundJob.objects.filter(pk=job.pk).update(processed=0)
+    try:
+        exports.run_export(job)
+    except Exception as e:
+        logger.error(f"Score export job {job.pk} failed: {str(e)}")
+        job.mark_finished(error=str(e))
+        raise
+    job.mark_finished()
+
+
+@shared_task(ignore_result=True)
+def generate_reports(job_id):
+    """Render a report set to PDF and bundle it into a zip in media storage"""
+    job = BackgroundJob.objects.get(pk=job_id)
+    if job.is_finished:
+        return
+    job.mark_running()
+    # Reports rendered before a retry are reused from the cache
+    job.processed = 0
+    BackgroundJob.objects.filter(pk=job.pk).update(processed=0)
+    try:
+        bundle, _, _ = reports.generate_reports(
+            job.payload['report'], job.payload['user_ids'], progress=job.advance
+        )
+    except Exception as e:
+        logger.error(f"Report job {job.pk} failed: {str(e)}")
+        job.mark_finished(error=str(e))
+        raise
+    job.payload['file'] = bundle
+    BackgroundJob.objects.filter(pk=job.pk).update(payload=job.payload)
+    job.mark_finished()
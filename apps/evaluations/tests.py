@@ -1,3 +1,489 @@
-from django.test import TestCase
+import os
+import tempfile
+import zipfile
+from collections import Counter
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User, UserProfile
+from core.models import BackgroundJob
+from videos.models import Competition, VideoSubmission
+from . import drafts, leaderboard
+from .assignment import assign_judges, drop_judge
+from .exports import _safe_cell, referenced_exports
+from .reports import (
+    CACHE_PREFIX, cache_epoch, generate_reports, referenced_reports, start_report_job,
+    student_contexts,
+)
+from .models import (
+    CriteriaScore,
+    EvaluationCriteria,
+    JudgeAssignment,
+    LeaderboardEntry,
+    VideoEvaluation,
+    VideoScoreSummary,
+)
+from .scoring import complete_evaluation, save_scores
+
+
+class ScoreMaintenanceTests(TestCase):
+    def setUp(self):
+        student = User.objects.create_user(
+            username='student', email='student@example.com', password=None
+        )
+        self.video = VideoSubmission.objects.create(
+            student=student, title='Clip', video_file='videos/clip.mp4', file_size=1
+        )
+        self.judges = [
+            User.objects.create_user(
+                username=f'judge{i}', email=f'judge{i}@example.com', password=None, user_type='judge'
+            )
+            for i in range(2)
+        ]
+        self.clarity = EvaluationCriteria.objects.create(name='Clarity', max_score=10)
+        self.delivery = EvaluationCriteria.objects.create(name='Delivery', max_score=5, weight=Decimal('2'))
+
+    def _evaluate(self, judge, clarity, delivery):
+        evaluation = VideoEvaluation.objects.create(video=self.video, judge=judge)
+        save_scores(evaluation, {self.clarity: (clarity, ''), self.delivery: (delivery, '')})
+        return complete_evaluation(evaluation)
+
+    def test_scores_and_summary_are_maintained_on_write(self):
+        first = self._evaluate(self.judges[0], 8, 4)
+        self.assertEqual(first.overall_score, Decimal('80.00'))
+        self._evaluate(self.judges[1], 10, 2)
+
+        summary = VideoScoreSummary.objects.get(video=self.video)
+        self.assertEqual(summary.evaluation_count, 2)
+        self.assertEqual(summary.mean_score, Decimal('70.00'))
+        self.assertEqual(summary.score_range, Decimal('20.00'))
+        self.assertEqual(summary.score_stddev, Decimal('10.00'))
+
+        # A single-row edit (e.g. in the admin) updates both as well
+        score = CriteriaScore.objects.get(evaluation=first, criteria=self.delivery)
+        score.score = 5
+        score.save()
+        first.refresh_from_db()
+        self.assertEqual(first.overall_score, Decimal('93.33'))
+        summary.refresh_from_db()
+        self.assertEqual(summary.mean_score, Decimal('76.67'))
+
+        first.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.evaluation_count, 1)
+
+    def test_weight_change_recomputes_stored_scores(self):
+        self._evaluate(self.judges[0], 8, 4)
+        self._evaluate(self.judges[1], 10, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delivery.weight = Decimal('1')
+            self.delivery.save()
+        self.assertEqual(
+            sorted(VideoEvaluation.objects.values_list('overall_score', flat=True)),
+            [Decimal('70.00'), Decimal('80.00')]
+        )
+        self.assertEqual(VideoScoreSummary.objects.get().mean_score, Decimal('75.00'))
+
+    def test_incomplete_or_invalid_scores_are_rejected(self):
+        evaluation = VideoEvaluation.objects.create(video=self.video, judge=self.judges[0])
+        with self.assertRaises(ValidationError):
+            save_scores(evaluation, {self.delivery: (6, '')})
+        save_scores(evaluation, {self.clarity: (5, '')})
+        with self.assertRaises(ValidationError):
+            complete_evaluation(evaluation)
+        self.assertFalse(VideoScoreSummary.objects.exists())
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.competition = Competition.objects.create(name='Spring', slug='spring')
+        self.judge = User.objects.create_user(
+            username='judge', email='judge@example.com', password=None, user_type='judge'
+        )
+        self.clarity = EvaluationCriteria.objects.create(name='Clarity', max_score=10)
+        self.delivery = EvaluationCriteria.objects.create(name='Delivery', max_score=10)
+        self.students = [
+            User.objects.create_user(username=f's{i}', email=f's{i}@example.com', password=None)
+            for i in range(4)
+        ]
+        # (clarity, delivery) per student; the last two tie overall
+        scores = [(9, 9), (6, 8), (7, 5), (5, 7)]
+        self.videos = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for student, (clarity, delivery) in zip(self.students, scores):
+                video = VideoSubmission.objects.create(
+                    student=student, title=f'Clip {student.username}', video_file='videos/clip.mp4',
+                    file_size=1, competition=self.competition if student != self.students[0] else None,
+                )
+                evaluation = VideoEvaluation.objects.create(video=video, judge=self.judge)
+                save_scores(evaluation, {self.clarity: (clarity, ''), self.delivery: (delivery, '')})
+                complete_evaluation(evaluation)
+                self.videos.append(video)
+
+    def _ranking(self, **board):
+        return [(s.rank, s.video_id) for s in leaderboard.top(10, **board)]
+
+    def test_boards_rank_incrementally(self):
+        v = [video.pk for video in self.videos]
+        # Equal scores: the earlier submission ranks first
+        self.assertEqual(self._ranking(), [(1, v[0]), (2, v[1]), (3, v[2]), (4, v[3])])
+        competition = dict(competition_id=self.competition.pk)
+        self.assertEqual(self._ranking(**competition), [(1, v[1]), (2, v[2]), (3, v[3])])
+        self.assertEqual(
+            self._ranking(criteria_id=self.delivery.pk), [(1, v[0]), (2, v[1]), (3, v[3]), (4, v[2])]
+        )
+
+        standing = leaderboard.student_standing(self.students[2], **competition)
+        self.assertEqual((standing.rank, standing.score), (2, Decimal('60.00')))
+        around = leaderboard.around_student(self.students[2], radius=1)
+        self.assertEqual([(s.rank, s.video_id) for s in around], [(2, v[1]), (3, v[2]), (4, v[3])])
+
+        # Deactivating a submission takes it off every board
+        with self.captureOnCommitCallbacks(execute=True):
+            self.videos[1].is_active = False
+            self.videos[1].save()
+        self.assertEqual(self._ranking(**competition), [(1, v[2]), (2, v[3])])
+        self.assertIsNone(leaderboard.video_rank(v[1]))
+
+    def test_limit_is_at_least_one(self):
+        self.assertEqual(leaderboard.top(0), [])
+        self.assertEqual(leaderboard.top(-1), [])
+        cache.clear()
+        self.client.force_login(self.judge)
+        response = self.client.get('/evaluations/leaderboard/', {'limit': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['video_id'] for s in response.json()['top']], [self.videos[0].pk])
+
+    def test_rebuild_repairs_drift(self):
+        self.assertEqual(leaderboard.rebuild(check=True), {'entries': 0, 'redis': 0})
+        LeaderboardEntry.objects.filter(video=self.videos[0]).delete()
+        LeaderboardEntry.objects.filter(video=self.videos[3]).update(score=0)
+        self.assertGreater(leaderboard.rebuild(check=True)['entries'], 0)
+        leaderboard.rebuild()
+        self.assertEqual(leaderboard.rebuild(check=True), {'entries': 0, 'redis': 0})
+        self.assertEqual(leaderboard.video_rank(self.videos[0].pk), 1)
+
+
+class JudgeAssignmentTests(TestCase):
+    def setUp(self):
+        # (organization, expertise) per judge
+        profiles = [
+            ('North High', 'Robotics'), ('North High', ''), ('South High', 'Robotics'),
+            ('South High', ''), ('East High', ''), ('East High', 'Biology'),
+        ]
+        self.judges = []
+        for i, (organization, expertise) in enumerate(profiles):
+            judge = User.objects.create_user(
+                username=f'judge{i}', email=f'judge{i}@example.com', password=None, user_type='judge'
+            )
+            UserProfile.objects.filter(user=judge).update(
+                school_organization=organization, expertise_area=expertise
+            )
+            self.judges.append(judge)
+        User.objects.filter(user_type='judge').update(is_approved=True, is_verified=True)
+        self.pending = User.objects.create_user(
+            username='pending', email='pending@example.com', password=None, user_type='judge'
+        )
+
+        robotics = Competition.objects.create(name='Bots', slug='bots', expertise_area='robotics')
+        self.videos = []
+        for i in range(12):
+            student = User.objects.create_user(
+                username=f's{i}', email=f's{i}@example.com', password=None
+            )
+            UserProfile.objects.filter(user=student).update(
+                school_organization='North High' if i % 2 else 'South High'
+            )
+            self.videos.append(VideoSubmission.objects.create(
+                student=student, title=f'Clip {i}', video_file='videos/clip.mp4', file_size=1,
+                competition=robotics if i < 4 else None,
+            ))
+        self.organizations = dict(
+            UserProfile.objects.values_list('user_id', 'school_organization')
+        )
+
+    def _live(self):
+        return JudgeAssignment.objects.exclude(status=JudgeAssignment.STATUS_DROPPED)
+
+    def test_assignments_are_balanced_and_avoid_conflicts(self):
+        per_video = settings.JUDGES_PER_SUBMISSION
+        self.assertEqual(assign_judges(seed=1), len(self.videos) * per_video)
+        # Already fully staffed submissions are left alone
+        self.assertEqual(assign_judges(seed=1), 0)
+
+        assignments = list(self._live().select_related('video'))
+        self.assertEqual(Counter(a.video_id for a in assignments), {v.pk: per_video for v in self.videos})
+        for assignment in assignments:
+            self.assertNotEqual(
+                self.organizations[assignment.judge_id], self.organizations[assignment.video.student_id]
+            )
+        loads = Counter(a.judge_id for a in assignments)
+        self.assertNotIn(self.pending.pk, loads)
+        self.assertLessEqual(max(loads.values()) - min(loads.values()), settings.JUDGE_EXPERTISE_SLACK + 1)
+        # Robotics submissions went to the robotics judge who is not a schoolmate
+        for video in self.videos[:4]:
+            matches = {a.judge_id for a in assignments if a.video_id == video.pk and a.expertise_match}
+            self.assertTrue(matches)
+            self.assertLessEqual(matches, {self.judges[0].pk, self.judges[2].pk})
+
+    def test_dropped_judge_is_replaced_and_completion_closes_assignment(self):
+        assign_judges(seed=2)
+        leaving = self.judges[4]
+        dropped = set(leaving.judge_assignments.values_list('video_id', flat=True))
+        self.assertEqual(drop_judge(leaving), len(dropped))
+
+        self.assertFalse(leaving.judge_assignments.exclude(status=JudgeAssignment.STATUS_DROPPED).exists())
+        self.assertEqual(
+            Counter(self._live().values_list('video_id', flat=True)),
+            {v.pk: settings.JUDGES_PER_SUBMISSION for v in self.videos},
+        )
+
+        # The drop-out sticks: later submissions go to other judges
+        student = User.objects.create_user(username='late', email='late@example.com', password=None)
+        late = VideoSubmission.objects.create(
+            student=student, title='Late clip', video_file='videos/clip.mp4', file_size=1
+        )
+        self.assertEqual(assign_judges(seed=3), settings.JUDGES_PER_SUBMISSION)
+        self.assertNotIn(leaving.pk, late.judge_assignments.values_list('judge_id', flat=True))
+        self.assertFalse(leaving.judge_assignments.filter(status=JudgeAssignment.STATUS_ASSIGNED).exists())
+
+        assignment = self._live().first()
+        VideoEvaluation.objects.create(
+            video=assignment.video, judge=assignment.judge, status=VideoEvaluation.STATUS_COMPLETED
+        )
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.status, JudgeAssignment.STATUS_COMPLETED)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ScoreExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password=None, is_staff=True
+        )
+        student = User.objects.create_user(username='s', email='s@example.com', password=None)
+        judge = User.objects.create_user(
+            username='judge', email='judge@example.com', password=None, user_type='judge'
+        )
+        video = VideoSubmission.objects.create(
+            student=student, title='Clip', video_file='videos/clip.mp4', file_size=1
+        )
+        clarity = EvaluationCriteria.objects.create(name='Clarity', max_score=10, order=1)
+        delivery = EvaluationCriteria.objects.create(name='Delivery', max_score=10, order=2)
+        evaluation = VideoEvaluation.objects.create(video=video, judge=judge)
+        save_scores(evaluation, {clarity: (7, 'Clear, "mostly"'), delivery: (9, '')})
+        complete_evaluation(evaluation)
+        self.url = reverse('evaluations:score_export')
+
+    def test_csv_is_streamed_to_staff(self):
+        self.client.force_login(User.objects.get(username='s'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('evaluation_id,video_id,video_title'))
+        self.assertIn('Clarity,7,10,1.00,"Clear, ""mostly"""', lines[1])
+
+    def test_csv_cells_cannot_start_formulas(self):
+        VideoSubmission.objects.update(title='=HYPERLINK("http://evil.example")')
+        CriteriaScore.objects.update(notes='@SUM(A1)')
+        self.client.force_login(self.staff)
+        lines = b''.join(self.client.get(self.url).streaming_content).decode().splitlines()
+        self.assertIn(',"\'=HYPERLINK(""http://evil.example"")",', lines[1])
+        self.assertTrue(lines[1].endswith(",'@SUM(A1)"))
+        self.assertEqual(_safe_cell('\t=1+1'), "'\t=1+1")
+        self.assertEqual(_safe_cell('\r=1+1'), "'\r=1+1")
+        self.assertEqual((_safe_cell('Clear audio'), _safe_cell(7)), ('Clear audio', 7))
+
+    def test_parquet_export_is_written_by_a_job(self):
+        import pyarrow.parquet as pq
+
+        self.client.force_login(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url)
+        job = BackgroundJob.objects.get()
+        self.assertRedirects(
+            response, reverse('admin:core_backgroundjob_change', args=[job.pk]), fetch_redirect_response=False
+        )
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.total), (BackgroundJob.STATUS_SUCCEEDED, 2, 2))
+
+        table = pq.read_table(os.path.join(settings.MEDIA_ROOT, job.payload['file']))
+        self.assertEqual(table.column('score').to_pylist(), [7, 9])
+        self.assertEqual(table.column('overall_score').to_pylist(), [Decimal('80.00')] * 2)
+        self.assertEqual(
+            referenced_exports([job.payload['file'], 'exports/stale.parquet']), {job.payload['file']}
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), REPORT_RENDER_WORKERS=2)
+class ReportTests(TestCase):
+    def setUp(self):
+        self.criteria = EvaluationCriteria.objects.create(name='Clarity', max_score=10)
+        self.judge = User.objects.create_user(
+            username='judge', email='judge@example.com', password=None, user_type='judge'
+        )
+        self.students = []
+        for i in range(3):
+            student = User.objects.create_user(username=f's{i}', email=f's{i}@example.com', password=None)
+            video = VideoSubmission.objects.create(
+                student=student, title=f'Clip {i}', video_file='videos/clip.mp4', file_size=1
+            )
+            evaluation = VideoEvaluation.objects.create(
+                video=video, judge=self.judge, written_feedback=f'Feedback {i}'
+            )
+            save_scores(evaluation, {self.criteria: (5 + i, '')})
+            complete_evaluation(evaluation)
+            self.students.append(student)
+        self.student_ids = [student.pk for student in self.students]
+
+    def _bundle(self, name):
+        with zipfile.ZipFile(os.path.join(settings.MEDIA_ROOT, name)) as archive:
+            return {info.filename: archive.read(info.filename) for info in archive.infolist()}
+
+    def test_contexts_are_loaded_per_set_not_per_report(self):
+        with self.assertNumQueries(4):
+            one = student_contexts(self.student_ids[:1])
+        with self.assertNumQueries(4):
+            contexts = student_contexts(self.student_ids)
+        self.assertEqual(one[self.student_ids[0]], contexts[self.student_ids[0]])
+        video = contexts[self.student_ids[2]]['videos'][0]
+        self.assertEqual(video['evaluations'][0]['judge'], 'Judge 1')
+        self.assertEqual(video['evaluations'][0]['scores'][0]['score'], 7)
+
+    def test_unchanged_reports_are_not_rendered_again(self):
+        bundle, rendered, reused = generate_reports('student', self.student_ids)
+        self.assertEqual((rendered, reused), (3, 0))
+        files = self._bundle(bundle)
+        self.assertEqual(len(files), 3)
+        self.assertTrue(all(pdf.startswith(b'%PDF') for pdf in files.values()))
+
+        VideoEvaluation.objects.filter(video__student=self.students[0]).update(written_feedback='Revised')
+        _, rendered, reused = generate_reports('student', self.student_ids)
+        self.assertEqual((rendered, reused), (1, 2))
+
+    def test_judge_summaries_run_as_a_job(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password=None, is_staff=True
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_report_job(staff, 'judge', [self.judge.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (BackgroundJob.STATUS_SUCCEEDED, 1))
+        self.assertEqual(list(self._bundle(job.payload['file'])), [f'judge-{self.judge.pk}-judge.pdf'])
+
+    def test_cache_entries_age_out_with_the_epoch(self):
+        epoch = cache_epoch()
+        current, previous, old, legacy = (
+            f'{CACHE_PREFIX}{epoch}-{"a" * 64}.pdf', f'{CACHE_PREFIX}{epoch - 1}-{"b" * 64}.pdf',
+            f'{CACHE_PREFIX}{epoch - 2}-{"c" * 64}.pdf', f'{CACHE_PREFIX}{"d" * 64}.pdf',
+        )
+        self.assertEqual(
+            referenced_reports([current, previous, old, legacy, 'reports/bundles/gone.zip']),
+            {current, previous},
+        )
+
+
+class DraftAutosaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        drafts.get_backend().reset()
+        self.judge = User.objects.create_user(
+            username='judge', email='judge@example.com', password=None, user_type='judge'
+        )
+        student = User.objects.create_user(username='s', email='s@example.com', password=None)
+        video = VideoSubmission.objects.create(
+            student=student, title='Clip', video_file='videos/clip.mp4', file_size=1
+        )
+        self.criteria = EvaluationCriteria.objects.create(name='Clarity', max_score=10)
+        self.evaluation = VideoEvaluation.objects.create(video=video, judge=self.judge)
+        self.url = reverse('evaluations:evaluation_draft', args=[self.evaluation.pk])
+        self.client.force_login(self.judge)
+
+    def _post(self, **delta):
+        return self.client.post(self.url, delta, content_type='application/json')
+
+    @override_settings(DRAFT_WRITE_THROUGH=False)
+    def test_deltas_are_buffered_and_written_once(self):
+        text = ''
+        for version, word in enumerate(['Good ', 'pacing ', 'and ', 'tone.']):
+            # Each keystroke batch is appended at the end of the text
+            response = self._post(version=version, feedback_patch=[len(text), len(text), word])
+            self.assertEqual(response.json()['version'], version + 1)
+            text += word
+
+        self.evaluation.refresh_from_db()
+        self.assertEqual((self.evaluation.written_feedback, self.evaluation.draft_version), ('', 0))
+        self.assertEqual(self.client.get(self.url).json()['feedback'], 'Good pacing and tone.')
+
+        self.assertEqual(drafts.flush_drafts(), 1)
+        self.assertEqual(drafts.flush_drafts(), 0)
+        self.evaluation.refresh_from_db()
+        self.assertEqual(
+            (self.evaluation.written_feedback, self.evaluation.draft_version), ('Good pacing and tone.', 4)
+        )
+
+    def test_memory_drafts_are_written_through(self):
+        self._post(version=0, feedback='Strong opening')
+        self._post(version=1, feedback_patch=[14, 14, '.'])
+        self.evaluation.refresh_from_db()
+        self.assertEqual(
+            (self.evaluation.written_feedback, self.evaluation.draft_version), ('Strong opening.', 2)
+        )
+
+    @override_settings(DRAFT_WRITE_THROUGH=False)
+    def test_ids_taken_by_an_unfinished_flush_are_recovered(self):
+        self._post(version=0, feedback='Kept')
+        # A worker that died after taking the id, before writing the draft
+        self.assertEqual(drafts.get_backend().take_dirty(10), [self.evaluation.pk])
+
+        self.assertEqual(drafts.flush_drafts(), 1)
+        self.evaluation.refresh_from_db()
+        self.assertEqual(self.evaluation.written_feedback, 'Kept')
+        self.assertEqual(drafts.flush_drafts(), 0)
+
+    def test_cleared_score_blocks_completion(self):
+        self._post(version=0, scores={str(self.criteria.pk): {'score': 7}})
+        self.assertEqual(CriteriaScore.objects.get(evaluation=self.evaluation).score, 7)
+        self._post(version=1, scores={str(self.criteria.pk): {'score': None}})
+
+        self.assertFalse(CriteriaScore.objects.filter(evaluation=self.evaluation).exists())
+        with self.assertRaises(ValidationError):
+            complete_evaluation(self.evaluation)
+        self.evaluation.refresh_from_db()
+        self.assertEqual(self.evaluation.status, VideoEvaluation.STATUS_DRAFT)
+        self.assertIsNone(self.evaluation.overall_score)
+
+    def test_stale_tab_gets_the_current_draft(self):
+        self.assertEqual(self._post(version=0, feedback='From tab one').status_code, 200)
+        response = self._post(version=0, feedback='From tab two')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.json()['version'], response.json()['feedback']), (1, 'From tab one'))
+
+    def test_save_validation_and_completion(self):
+        scores = {str(self.criteria.pk): {'score': 11}}
+        self.assertEqual(self._post(version=0, scores=scores).status_code, 400)
+        self.assertEqual(self._post(version=0, scores=[8]).status_code, 400)
+        self.assertEqual(self._post(version=0, scores='8').status_code, 400)
+
+        scores = {str(self.criteria.pk): {'score': 8, 'notes': 'Crisp'}}
+        response = self._post(version=0, scores=scores, save=True)
+        self.assertTrue(response.json()['saved'])
+        self.assertEqual(CriteriaScore.objects.get(evaluation=self.evaluation).score, 8)
+
+        self._post(version=1, feedback='Final words')
+        complete_evaluation(self.evaluation)
+        self.evaluation.refresh_from_db()
+        self.assertEqual(self.evaluation.written_feedback, 'Final words')
+        self.assertEqual(self.evaluation.overall_score, Decimal('80.00'))
+        self.assertIsNone(drafts.get_backend().get(self.evaluation.pk))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
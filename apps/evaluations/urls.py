@@ -4,5 +4,7 @@ from . import views
 app_name = 'evaluations'
 
 urlpatterns = [
-    # Will be implemented in Week 3
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    path('export/scores/', views.ScoreExportView.as_view(), name='score_export'),
+    path('<int:pk>/draft/', views.EvaluationDraftView.as_view(), name='evaluation_draft'),
 ]
@@ -1,3 +1,137 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+from videos.models import VideoSubmission
+from . import drafts, exports, leaderboard
+from .models import VideoEvaluation
+
+MAX_LEADERBOARD_LIMIT = 100
+
+
+def _int_param(request, name, default=None, maximum=None, minimum=0):
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    if maximum is not None:
+        value = min(value, maximum)
+    return max(value, minimum)
+
+
+class LeaderboardView(LoginRequiredMixin, View):
+    """Top-N of a board, plus the user's own standing and neighbours (JSON)"""
+
+    def get(self, request):
+        competition_id = _int_param(request, 'competition')
+        criteria_id = _int_param(request, 'criteria')
+        limit = _int_param(request, 'limit', 10, MAX_LEADERBOARD_LIMIT, minimum=1)
+        radius = _int_param(request, 'radius', 2, 10)
+        board = dict(competition_id=competition_id, criteria_id=criteria_id)
+
+        top = leaderboard.top(limit, **board)
+        me = around = None
+        if request.user.is_student:
+            me = leaderboard.student_standing(request.user, **board)
+            around = leaderboard.around_student(request.user, radius, **board)
+
+        standings = top + (around or [])
+        videos = VideoSubmission.objects.only('title', 'student_id').in_bulk({s.video_id for s in standings})
+
+        def serialize(standing):
+            video = videos.get(standing.video_id)
+            return {
+                'rank': standing.rank,
+                'video_id': standing.video_id,
+                'title': video.title if video else '',
+                'score': str(standing.score),
+                'is_mine': bool(video and video.student_id == request.user.pk),
+            }
+
+        return JsonResponse({
+            'board': leaderboard.board_key(**board),
+            'size': leaderboard.board_size(**board),
+            'top': [serialize(standing) for standing in top],
+            'me': serialize(me) if me else None,
+            'around': [serialize(standing) for standing in around] if around is not None else None,
+        })
+
+
+def csv_export_response(rows, filename):
+    response = StreamingHttpResponse(exports.csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ScoreExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Staff export of every criteria score, optionally for one competition.
+    GET streams CSV; POST queues a Parquet export and shows its job page.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        rows = exports.score_rows(competition_id=_int_param(request, 'competition'))
+        return csv_export_response(rows, f'scores-{timezone.now():%Y%m%d}.csv')
+
+    def post(self, request):
+        job = exports.start_export(request.user, competition_id=_int_param(request, 'competition'))
+        return redirect(reverse('admin:core_backgroundjob_change', args=[job.pk]))
+
+
+class EvaluationDraftView(LoginRequiredMixin, View):
+    """
+    Autosave endpoint of a judge's draft evaluation (see evaluations.drafts).
+
+    GET returns the current draft. POST applies a delta,
+    ``{"version": n, "feedback_patch": [start, end, text], "scores": {...},
+    "save": false}``, made against version ``n``; a stale version gets a
+    409 with the current draft to rebase onto.
+    """
+
+    def get_evaluation(self):
+        return get_object_or_404(
+            VideoEvaluation, pk=self.kwargs['pk'], judge=self.request.user,
+            status=VideoEvaluation.STATUS_DRAFT,
+        )
+
+    def _draft(self, version, state, status=200, **extra):
+        return JsonResponse({'version': version, **state, **extra}, status=status)
+
+    def get(self, request, pk):
+        evaluation = self.get_evaluation()
+        try:
+            version, state = drafts.current_draft(evaluation.pk)
+        except drafts.DraftUnavailable:
+            return JsonResponse({'error': 'Autosave is unavailable, please retry.'}, status=503)
+        return self._draft(version, state)
+
+    def post(self, request, pk):
+        evaluation = self.get_evaluation()
+        try:
+            payload = json.loads(request.body)
+            base_version = int(payload['version'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': 'A JSON body with the draft version is required.'}, status=400)
+
+        try:
+            version, state = drafts.autosave(evaluation, base_version, payload)
+            saved = bool(payload.get('save'))
+            if saved:
+                # False when the draft was written already (e.g. straight through)
+                drafts.flush_draft(evaluation.pk)
+        except drafts.DraftConflict as conflict:
+            return self._draft(conflict.version, conflict.state, status=409, conflict=True)
+        except ValidationError as e:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+        except drafts.DraftUnavailable:
+            return JsonResponse({'error': 'Autosave is unavailable, please retry.'}, status=503)
+        return self._draft(version, state, saved=saved)
@@ -0,0 +1,80 @@
+"""
+Authorization of private video media served by core.views.MediaView.
+
+Video objects are shared between submissions of identical content (see
+videos.content), so access is decided per content: a viewer may fetch the
+object if they may watch any submission of it. Generated outputs carry
+the content digest in their name (``hls/<digest>/``,
+``previews/<digest>_*``, ``thumbnails/<digest>.*``); an uploaded object is
+looked up by name. A player issues many range requests while seeking, so
+the lookups are cached.
+
+Outputs generated before content deduplication (videos migration 0005)
+are named after the submission (``hls/<id>/``, ``thumbnails/video_<id>.*``).
+They stay viewable by that submission's owner until ``manage.py
+process_videos`` has regenerated every submission's outputs.
+"""
+import re
+
+from django.core.cache import cache
+
+from core.models import ContentBlob
+from .content import derived_digest, owners_cache_key
+from .models import VideoSubmission, can_view_student_video
+
+CACHE_TIMEOUT = 60 * 60
+
+_STUDENT_RE = re.compile(r'^videos/user_(\d+)/')
+_LEGACY_OUTPUT_RE = re.compile(r'^(?:hls/(\d+)/|thumbnails/video_(\d+)\.)')
+
+
+def media_digest(name):
+    digest = derived_digest(name)
+    if digest is not None:
+        return digest
+    key = f'videos:media-digest:{name}'
+    digest = cache.get(key)
+    if digest is None:
+        digest = ContentBlob.objects.filter(name=name).values_list('digest', flat=True).first()
+        if digest is not None:
+            # A blob's object never changes
+            cache.set(key, digest, CACHE_TIMEOUT)
+    return digest
+
+
+def content_owner_ids(digest):
+    """Students with a submission of the content ``digest``"""
+    key = owners_cache_key(digest)
+    owners = cache.get(key)
+    if owners is None:
+        owners = list(
+            VideoSubmission.objects.filter(blob__digest=digest)
+            .values_list('student_id', flat=True).distinct()
+        )
+        cache.set(key, owners, CACHE_TIMEOUT)
+    return owners
+
+
+def media_owner_ids(name):
+    digest = media_digest(name)
+    if digest is not None:
+        return content_owner_ids(digest)
+    # Not yet attached to its content: the upload path names the owner
+    match = _STUDENT_RE.match(name)
+    if match:
+        return [int(match.group(1))]
+    match = _LEGACY_OUTPUT_RE.match(name)
+    if match:
+        video_id = int(match.group(1) or match.group(2))
+        return list(VideoSubmission.objects.filter(pk=video_id).values_list('student_id', flat=True))
+    return []
+
+
+def can_view_media(request, name):
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    if can_view_student_video(user, None):
+        # Staff and judges may watch every submission
+        return True
+    return any(can_view_student_video(user, owner) for owner in media_owner_ids(name))
@@ -1,3 +1,88 @@
 from django.contrib import admin
+from django.template.defaultfilters import filesizeformat
+from django.utils.html import format_html_join
+from .models import Competition, VideoSubmission, VideoMetadata, UploadSession, UploadTicket
 
-# Register your models here.
+
+class VideoMetadataInline(admin.StackedInline):
+    model = VideoMetadata
+    can_delete = False
+    readonly_fields = (
+        'original_filename', 'mime_type', 'resolution', 'video_codec', 'audio_codec',
+        'bit_rate', 'sha256'
+    )
+    exclude = ('sprite',)
+
+
+@admin.register(Competition)
+class CompetitionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'expertise_area', 'is_active', 'starts_at', 'ends_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(VideoSubmission)
+class VideoSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('title', 'student', 'size_display', 'duration', 'processing_status', 'is_active', 'uploaded_at')
+    list_filter = ('is_active', 'competition', 'processing_status', 'uploaded_at')
+    list_select_related = ('student',)
+    search_fields = ('title', 'student__email')
+    raw_id_fields = ('student',)
+    readonly_fields = ('file_size', 'blob', 'processing_status', 'renditions_display', 'uploaded_at', 'updated_at')
+    date_hierarchy = 'uploaded_at'
+    inlines = [VideoMetadataInline]
+
+    def size_display(self, obj):
+        return filesizeformat(obj.file_size)
+    size_display.short_description = 'Size'
+    size_display.admin_order_field = 'file_size'
+
+    def renditions_display(self, obj):
+        """HLS renditions of the submission's content"""
+        if not obj.blob_id:
+            return '-'
+        return format_html_join(
+            ', ', '{} ({})',
+            ((r.name, r.get_status_display()) for r in obj.blob.renditions.all())
+        ) or '-'
+    renditions_display.short_description = 'Renditions'
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'status', 'progress_display', 'created_at', 'expires_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    search_fields = ('filename', 'user__email')
+    readonly_fields = (
+        'id', 'user', 'filename', 'title', 'description', 'total_size', 'offset',
+        'status', 'finalize_error', 'submission', 'created_at', 'updated_at', 'expires_at'
+    )
+    exclude = ('parts',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress_display(self, obj):
+        return f'{filesizeformat(obj.offset)} / {filesizeformat(obj.total_size)} ({obj.progress_percentage}%)'
+    progress_display.short_description = 'Progress'
+
+
+@admin.register(UploadTicket)
+class UploadTicketAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'status', 'size_display', 'created_at', 'expires_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    search_fields = ('filename', 'user__email', '=object_name')
+    readonly_fields = (
+        'id', 'user', 'object_name', 'filename', 'title', 'description', 'content_type',
+        'size', 'md5', 'status', 'submission', 'created_at', 'expires_at'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def size_display(self, obj):
+        return filesizeformat(obj.size)
+    size_display.short_description = 'Size'
@@ -0,0 +1,96 @@
+"""
+Deduplication of submitted videos on top of core.blobs.
+
+A submission is attached to the ContentBlob of its bytes. Renditions,
+posters and sprites belong to the blob, so re-uploading the same video
+costs no storage and no transcoding: the duplicate points at the existing
+object and picks up the existing outputs.
+"""
+import logging
+import re
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from core.blobs import acquire_blob
+from core.models import ContentBlob
+from .models import UploadTicket, VideoMetadata, VideoSubmission
+
+logger = logging.getLogger(__name__)
+
+# Outputs generated from a content carry its digest in their name
+_DERIVED_DIGEST_RES = (
+    re.compile(r'^hls/([0-9a-f]{64})/'),
+    re.compile(r'^previews/([0-9a-f]{64})_'),
+    re.compile(r'^thumbnails/([0-9a-f]{64})\.'),
+)
+
+
+def derived_digest(name):
+    """Digest of the content an output was generated from, or None"""
+    for pattern in _DERIVED_DIGEST_RES:
+        match = pattern.match(name)
+        if match:
+            return match.group(1)
+    return None
+
+
+def owners_cache_key(digest):
+    return f'videos:owners:{digest}'
+
+
+def link_blob(video, blob):
+    """Point a submission (saved in the same transaction) at a blob"""
+    VideoSubmission.objects.filter(pk=video.pk).update(blob=blob, video_file=blob.name)
+    VideoMetadata.objects.filter(video=video).update(sha256=blob.digest)
+    video.blob = blob
+    video.video_file.name = blob.name
+    transaction.on_commit(lambda: cache.delete(owners_cache_key(blob.digest)))
+
+
+def attach_blob(video, digest, size):
+    """
+    Attach a stored submission to the blob for its content.
+
+    If the content already exists, the submission's own copy is deleted
+    and the submission points at the existing object.
+    """
+    own_name = video.video_file.name
+    with transaction.atomic():
+        blob, created = acquire_blob(digest, size, own_name)
+        link_blob(video, blob)
+        if blob.name != own_name:
+            transaction.on_commit(lambda: default_storage.delete(own_name))
+    if not created:
+        logger.info(f"Video {video.pk} is a duplicate of content {digest}")
+    return blob
+
+
+def referenced_media(names):
+    """
+    The stored objects among ``names`` that video rows still use (for
+    core.sweeper): blob objects, submission files and thumbnails, objects
+    of issued upload tickets, and outputs of existing content.
+    """
+    names = list(names)
+    referenced = set(ContentBlob.objects.filter(name__in=names).values_list('name', flat=True))
+    referenced.update(
+        VideoSubmission.objects.filter(video_file__in=names).values_list('video_file', flat=True)
+    )
+    referenced.update(
+        VideoSubmission.objects.filter(thumbnail__in=names).values_list('thumbnail', flat=True)
+    )
+    referenced.update(
+        UploadTicket.objects.filter(
+            object_name__in=names, status=UploadTicket.STATUS_ISSUED
+        ).values_list('object_name', flat=True)
+    )
+
+    digests = {name: derived_digest(name) for name in names}
+    live = set(
+        ContentBlob.objects.filter(digest__in={d for d in digests.values() if d})
+        .values_list('digest', flat=True)
+    )
+    referenced.update(name for name, digest in digests.items() if digest in live)
+    return referenced
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from videos.models import VideoRendition, VideoSubmission
+from videos.tasks import process_video
+
+
+class Command(BaseCommand):
+    help = 'Queue HLS transcoding for submissions that are not playable yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--failed', action='store_true',
+            help='Also retry submissions whose processing failed',
+        )
+
+    def handle(self, *args, **options):
+        statuses = [VideoSubmission.PROCESSING_PENDING]
+        if options['failed']:
+            statuses.append(VideoSubmission.PROCESSING_FAILED)
+        videos = VideoSubmission.objects.filter(is_active=True, processing_status__in=statuses)
+        if options['failed']:
+            # Failed renditions are only retried from pending
+            VideoRendition.objects.filter(
+                blob__video_submissions__in=videos, status=VideoRendition.STATUS_FAILED
+            ).update(status=VideoRendition.STATUS_PENDING, error='')
+
+        queued = 0
+        for pk in videos.order_by('pk').values_list('pk', flat=True).iterator():
+            process_video.delay(pk)
+            queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} videos.'))
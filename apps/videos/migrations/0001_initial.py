@@ -0,0 +1,174 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:18
+
+import django.db.models.deletion
+import uuid
+import videos.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=200)),
+                ("description", models.TextField(blank=True)),
+                (
+                    "video_file",
+                    models.FileField(
+                        max_length=255, upload_to=videos.models.video_upload_path
+                    ),
+                ),
+                (
+                    "thumbnail",
+                    models.ImageField(
+                        blank=True, max_length=255, upload_to="thumbnails/"
+                    ),
+                ),
+                ("file_size", models.BigIntegerField()),
+                ("duration", models.DurationField(blank=True, null=True)),
+                ("is_active", models.BooleanField(default=True)),
+                ("uploaded_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "student",
+                    models.ForeignKey(
+                        limit_choices_to={"user_type": "student"},
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="video_submissions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Video Submission",
+                "verbose_name_plural": "Video Submissions",
+                "db_table": "videos_videosubmission",
+                "ordering": ["-uploaded_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="VideoMetadata",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("original_filename", models.CharField(max_length=255)),
+                ("mime_type", models.CharField(max_length=100)),
+                ("resolution", models.CharField(blank=True, max_length=20)),
+                ("sha256", models.CharField(blank=True, db_index=True, max_length=64)),
+                (
+                    "video",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metadata",
+                        to="videos.videosubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Video Metadata",
+                "verbose_name_plural": "Video Metadata",
+                "db_table": "videos_videometadata",
+            },
+        ),
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255)),
+                ("title", models.CharField(max_length=200)),
+                ("description", models.TextField(blank=True)),
+                ("total_size", models.BigIntegerField()),
+                ("offset", models.BigIntegerField(default=0)),
+                ("parts", models.JSONField(blank=True, default=list)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("finalizing", "Finalizing"),
+                            ("completed", "Completed"),
+                            ("aborted", "Aborted"),
+                        ],
+                        default="active",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "expires_at",
+                    models.DateTimeField(default=videos.models._upload_session_expiry),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "submission",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="upload_session",
+                        to="videos.videosubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Upload Session",
+                "verbose_name_plural": "Upload Sessions",
+                "db_table": "videos_uploadsession",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="videosubmission",
+            index=models.Index(
+                fields=["student", "-uploaded_at"], name="videos_sub_student_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadsession",
+            index=models.Index(
+                condition=models.Q(("status__in", ["active", "finalizing"])),
+                fields=["expires_at"],
+                name="videos_upload_live_idx",
+            ),
+        ),
+    ]
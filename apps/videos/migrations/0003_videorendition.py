@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("videos", "0002_uploadticket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videosubmission",
+            name="processing_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                help_text="State of the HLS renditions (see VideoRendition)",
+                max_length=10,
+            ),
+        ),
+        migrations.CreateModel(
+            name="VideoRendition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=10)),
+                ("width", models.PositiveIntegerField(default=0)),
+                ("height", models.PositiveIntegerField()),
+                (
+                    "video_bitrate",
+                    models.PositiveIntegerField(
+                        help_text="Target video bitrate (bits/s)"
+                    ),
+                ),
+                (
+                    "audio_bitrate",
+                    models.PositiveIntegerField(
+                        help_text="Target audio bitrate (bits/s)"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("playlist", models.CharField(blank=True, max_length=255)),
+                ("segment_count", models.PositiveIntegerField(default=0)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "video",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="renditions",
+                        to="videos.videosubmission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Video Rendition",
+                "verbose_name_plural": "Video Renditions",
+                "db_table": "videos_videorendition",
+                "ordering": ["video", "height"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="videorendition",
+            constraint=models.UniqueConstraint(
+                fields=("video", "name"), name="videos_rendition_unique"
+            ),
+        ),
+    ]
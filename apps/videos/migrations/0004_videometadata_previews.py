@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("videos", "0003_videorendition"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videometadata",
+            name="audio_codec",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="videometadata",
+            name="bit_rate",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Overall bitrate (bits/s)", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="videometadata",
+            name="sprite",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Scrub-preview sprite sheet name and grid layout (see videos.previews)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="videometadata",
+            name="video_codec",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reset_renditions(apps, schema_editor):
+    """
+    Renditions move from submissions to content blobs. Drop the existing
+    rows and mark every submission pending, so ``process_videos``
+    attaches them to their content and regenerates the outputs.
+
+    Run ``manage.py process_videos`` after migrating: until it has run,
+    submissions keep their old ``hls/<id>/`` and ``thumbnails/video_<id>.*``
+    outputs, which videos.access only serves for that purpose.
+    """
+    VideoRendition = apps.get_model("videos", "VideoRendition")
+    VideoSubmission = apps.get_model("videos", "VideoSubmission")
+    VideoRendition.objects.all().delete()
+    VideoSubmission.objects.update(processing_status="pending")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0003_contentblob"),
+        ("videos", "0004_videometadata_previews"),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_renditions, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name="videorendition",
+            options={
+                "ordering": ["blob", "height"],
+                "verbose_name": "Video Rendition",
+                "verbose_name_plural": "Video Renditions",
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name="videorendition",
+            name="videos_rendition_unique",
+        ),
+        migrations.RemoveField(
+            model_name="videorendition",
+            name="video",
+        ),
+        migrations.AddField(
+            model_name="videorendition",
+            name="blob",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="renditions",
+                to="core.contentblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="videosubmission",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Deduplicated content; video_file points at its object",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="video_submissions",
+                to="core.contentblob",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="videorendition",
+            constraint=models.UniqueConstraint(
+                fields=("blob", "name"), name="videos_rendition_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("videos", "0005_content_blobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Competition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200)),
+                ("slug", models.SlugField(max_length=100, unique=True)),
+                ("description", models.TextField(blank=True)),
+                ("is_active", models.BooleanField(default=True)),
+                ("starts_at", models.DateTimeField(blank=True, null=True)),
+                ("ends_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Competition",
+                "verbose_name_plural": "Competitions",
+                "db_table": "videos_competition",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="videosubmission",
+            name="competition",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="submissions",
+                to="videos.competition",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("videos", "0006_competition_videosubmission_competition"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="competition",
+            name="expertise_area",
+            field=models.CharField(
+                blank=True,
+                help_text="Judges with this expertise area are preferred when assigning",
+                max_length=200,
+            ),
+        ),
+    ]
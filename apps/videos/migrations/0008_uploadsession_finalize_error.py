@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("videos", "0007_competition_expertise_area"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadsession",
+            name="finalize_error",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -1,3 +1,424 @@
-from django.db import models
+import os
+import uuid
+from datetime import timedelta
+from functools import partial
 
-# Create your models here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+def video_object_name(student_id, filename):
+    """Unique storage name for a student's video"""
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join('videos', f'user_{student_id}', f'{uuid.uuid4().hex}{ext}')
+
+
+def video_upload_path(instance, filename):
+    """Generate file path for submitted videos"""
+    return video_object_name(instance.student_id, filename)
+
+
+def can_view_student_video(user, student_id):
+    """Whether ``user`` may watch the videos of the student ``student_id``"""
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or user.pk == student_id:
+        return True
+    return user.is_judge and user.can_access_platform
+
+
+class Competition(models.Model):
+    """A competition students submit videos to; each has its own rankings"""
+
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    expertise_area = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text=_('Judges with this expertise area are preferred when assigning')
+    )
+    is_active = models.BooleanField(default=True)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'videos_competition'
+        verbose_name = _('Competition')
+        verbose_name_plural = _('Competitions')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class VideoSubmission(models.Model):
+    """A student's video submission"""
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        limit_choices_to={'user_type': 'student'},
+        related_name='video_submissions'
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    video_file = models.FileField(upload_to=video_upload_path, max_length=255)
+    thumbnail = models.ImageField(upload_to='thumbnails/', blank=True, max_length=255)
+    file_size = models.BigIntegerField()
+    duration = models.DurationField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    competition = models.ForeignKey(
+        Competition,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='submissions'
+    )
+    blob = models.ForeignKey(
+        'core.ContentBlob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='video_submissions',
+        help_text=_('Deduplicated content; video_file points at its object')
+    )
+
+    PROCESSING_PENDING = 'pending'
+    PROCESSING_RUNNING = 'processing'
+    PROCESSING_READY = 'ready'
+    PROCESSING_FAILED = 'failed'
+
+    PROCESSING_CHOICES = [
+        (PROCESSING_PENDING, _('Pending')),
+        (PROCESSING_RUNNING, _('Processing')),
+        (PROCESSING_READY, _('Ready')),
+        (PROCESSING_FAILED, _('Failed')),
+    ]
+
+    processing_status = models.CharField(
+        max_length=10,
+        choices=PROCESSING_CHOICES,
+        default=PROCESSING_PENDING,
+        help_text=_('State of the HLS renditions (see VideoRendition)')
+    )
+
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'videos_videosubmission'
+        verbose_name = _('Video Submission')
+        verbose_name_plural = _('Video Submissions')
+        ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['student', '-uploaded_at'], name='videos_sub_student_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def can_view(self, user):
+        """Owners, approved judges and staff may watch a submission"""
+        return can_view_student_video(user, self.student_id)
+
+    @property
+    def is_playable(self):
+        return self.processing_status == self.PROCESSING_READY
+
+    def ready_renditions(self):
+        """HLS renditions of this submission's content that can be played"""
+        return VideoRendition.objects.filter(
+            blob_id=self.blob_id, status=VideoRendition.STATUS_READY
+        ) if self.blob_id else VideoRendition.objects.none()
+
+
+class VideoRendition(models.Model):
+    """
+    One rung of the HLS bitrate ladder of a video's content.
+
+    Renditions belong to the ContentBlob, so identical uploads share them.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_PROCESSING, _('Processing')),
+        (STATUS_READY, _('Ready')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    blob = models.ForeignKey(
+        'core.ContentBlob',
+        on_delete=models.CASCADE,
+        related_name='renditions'
+    )
+    name = models.CharField(max_length=10)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField()
+    video_bitrate = models.PositiveIntegerField(help_text=_('Target video bitrate (bits/s)'))
+    audio_bitrate = models.PositiveIntegerField(help_text=_('Target audio bitrate (bits/s)'))
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    playlist = models.CharField(max_length=255, blank=True)
+    segment_count = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'videos_videorendition'
+        verbose_name = _('Video Rendition')
+        verbose_name_plural = _('Video Renditions')
+        ordering = ['blob', 'height']
+        constraints = [
+            models.UniqueConstraint(fields=['blob', 'name'], name='videos_rendition_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.blob_id} {self.name}"
+
+    @property
+    def bandwidth(self):
+        return self.video_bitrate + self.audio_bitrate
+
+
+class VideoMetadata(models.Model):
+    """Technical details of a submitted video file"""
+
+    video = models.OneToOneField(
+        VideoSubmission,
+        on_delete=models.CASCADE,
+        related_name='metadata'
+    )
+    original_filename = models.CharField(max_length=255)
+    mime_type = models.CharField(max_length=100)
+    resolution = models.CharField(max_length=20, blank=True)
+    video_codec = models.CharField(max_length=32, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True)
+    bit_rate = models.PositiveIntegerField(null=True, blank=True, help_text=_('Overall bitrate (bits/s)'))
+    sprite = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text=_('Scrub-preview sprite sheet name and grid layout (see videos.previews)')
+    )
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+
+    class Meta:
+        db_table = 'videos_videometadata'
+        verbose_name = _('Video Metadata')
+        verbose_name_plural = _('Video Metadata')
+
+    def __str__(self):
+        return self.original_filename
+
+
+def _upload_session_expiry():
+    return timezone.now() + timedelta(hours=settings.VIDEO_UPLOAD_SESSION_LIFETIME)
+
+
+class UploadSession(models.Model):
+    """
+    State of a resumable (tus-style) video upload.
+
+    Each accepted chunk is stored as a separate part object; ``parts`` lists
+    them in order as ``[offset, size, storage_name]``. Finalizing streams
+    the parts into the submission's video file in a worker; if that fails
+    the session returns to ``active`` with ``finalize_error`` set.
+    """
+
+    STATUS_ACTIVE = 'active'
+    STATUS_FINALIZING = 'finalizing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_ABORTED = 'aborted'
+
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, _('Active')),
+        (STATUS_FINALIZING, _('Finalizing')),
+        (STATUS_COMPLETED, _('Completed')),
+        (STATUS_ABORTED, _('Aborted')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    parts = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_ACTIVE
+    )
+    submission = models.OneToOneField(
+        VideoSubmission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_session'
+    )
+    finalize_error = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(default=_upload_session_expiry)
+
+    class Meta:
+        db_table = 'videos_uploadsession'
+        verbose_name = _('Upload Session')
+        verbose_name_plural = _('Upload Sessions')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                name='videos_upload_live_idx',
+                condition=models.Q(status__in=['active', 'finalizing']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.total_size})"
+
+    @property
+    def is_complete(self):
+        return self.offset == self.total_size
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+    @property
+    def progress_percentage(self):
+        if not self.total_size:
+            return 100
+        return int((self.offset / self.total_size) * 100)
+
+
+def _upload_ticket_expiry():
+    return timezone.now() + timedelta(minutes=settings.VIDEO_UPLOAD_TICKET_LIFETIME)
+
+
+class UploadTicket(models.Model):
+    """
+    A short-lived, size-bound permission to upload one video directly to
+    object storage (see videos.storage). The submission is only created
+    once finalize has verified the stored object's size and checksum.
+    """
+
+    STATUS_ISSUED = 'issued'
+    STATUS_COMPLETED = 'completed'
+    STATUS_REJECTED = 'rejected'
+
+    STATUS_CHOICES = [
+        (STATUS_ISSUED, _('Issued')),
+        (STATUS_COMPLETED, _('Completed')),
+        (STATUS_REJECTED, _('Rejected')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_tickets'
+    )
+    object_name = models.CharField(max_length=255, unique=True)
+    filename = models.CharField(max_length=255)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    md5 = models.CharField(
+        max_length=24,
+        help_text=_('Base64 MD5 of the file, declared by the client')
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_ISSUED
+    )
+    submission = models.OneToOneField(
+        VideoSubmission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_ticket'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=_upload_ticket_expiry)
+
+    class Meta:
+        db_table = 'videos_uploadticket'
+        verbose_name = _('Upload Ticket')
+        verbose_name_plural = _('Upload Tickets')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                name='videos_ticket_issued_idx',
+                condition=models.Q(status='issued'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+
+# Transcode every new submission once it is committed
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from core.blobs import release_blob
+from core.models import ContentBlob
+
+@receiver(post_save, sender=VideoSubmission)
+def queue_video_processing(sender, instance, created, **kwargs):
+    """Start HLS processing for a newly created submission"""
+    if created and instance.video_file:
+        from .tasks import process_video
+
+        transaction.on_commit(partial(process_video.delay, instance.pk))
+
+
+@receiver(post_delete, sender=VideoSubmission)
+def release_video_blob(sender, instance, **kwargs):
+    """Drop the submission's reference on its content"""
+    if instance.blob_id:
+        transaction.on_commit(partial(release_blob, instance.blob_id))
+
+
+@receiver(pre_delete, sender=ContentBlob)
+def delete_blob_outputs(sender, instance, **kwargs):
+    """Delete the HLS renditions, poster and sprite made for the content"""
+    from .transcoding import derived_files
+
+    names = derived_files(instance)
+    if names:
+        transaction.on_commit(partial(_delete_files, names))
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
@@ -0,0 +1,216 @@
+"""
+Poster frames, scrub-preview sprite sheets and probe metadata.
+
+Extraction runs inside process_video, which already holds a local copy of
+the source and its ffprobe output, so the file is fetched and probed only
+once. Results are kept per content in ``ContentBlob.derived['previews']``
+and written to every submission of that content in one transaction;
+a later identical upload just copies them (``apply_previews``).
+
+The sprite sheet is a single JPEG grid of small frames. Its layout is kept
+in ``VideoMetadata.sprite``, and the WebVTT index that players use for
+scrub previews is rendered from it (see ``sprite_vtt``).
+"""
+import logging
+import math
+import mimetypes
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import ContentBlob
+from .models import VideoMetadata, VideoSubmission
+from .transcoding import TranscodeError, run_ffmpeg, store_output, video_stream
+
+logger = logging.getLogger(__name__)
+
+POSTER_WIDTH = 480
+SPRITE_FRAME_WIDTH = 160
+SPRITE_COLUMNS = 10
+SPRITE_MAX_FRAMES = 100
+SPRITE_MIN_INTERVAL = 2  # seconds between frames
+
+
+def poster_name(digest):
+    return f'thumbnails/{digest}.jpg'
+
+
+def sprite_name(digest):
+    return f'previews/{digest}_sprite.jpg'
+
+
+def summarize_probe(probe_data):
+    """Duration, display resolution, codecs and bitrate from ffprobe output"""
+    fmt = probe_data.get('format', {})
+    stream = video_stream(probe_data) or {}
+    audio = next(
+        (s for s in probe_data.get('streams', []) if s.get('codec_type') == 'audio'), {}
+    )
+
+    width = int(stream.get('width') or 0)
+    height = int(stream.get('height') or 0)
+    # Phones store portrait video as landscape plus a rotation; ffmpeg
+    # applies it when decoding, so report the displayed size
+    rotation = int(stream.get('tags', {}).get('rotate') or 0)
+    for side_data in stream.get('side_data_list', []):
+        rotation = int(side_data.get('rotation', rotation) or 0)
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+
+    try:
+        duration = float(fmt.get('duration') or stream.get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    try:
+        bit_rate = int(fmt.get('bit_rate') or stream.get('bit_rate'))
+    except (TypeError, ValueError):
+        bit_rate = None
+
+    return {
+        'duration': duration,
+        'width': width,
+        'height': height,
+        'video_codec': stream.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', ''),
+        'bit_rate': bit_rate,
+    }
+
+
+def sprite_layout(duration, width, height):
+    """Frame interval and grid for a sprite sheet of at most SPRITE_MAX_FRAMES"""
+    interval = max(SPRITE_MIN_INTERVAL, duration / SPRITE_MAX_FRAMES)
+    count = max(1, min(SPRITE_MAX_FRAMES, math.ceil(duration / interval)))
+    frame_height = round(SPRITE_FRAME_WIDTH * height / width / 2) * 2 if width else 90
+    columns = min(SPRITE_COLUMNS, count)
+    return {
+        'interval': interval,
+        'count': count,
+        'columns': columns,
+        'rows': math.ceil(count / columns),
+        'width': SPRITE_FRAME_WIDTH,
+        'height': frame_height,
+        'duration': duration,
+    }
+
+
+def extract_poster(source_path, output_path, duration):
+    # Seek before -i so ffmpeg jumps to the nearest keyframe instead of decoding
+    offset = min(duration * 0.1, 5) if duration else 0
+    run_ffmpeg([
+        settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+        '-ss', f'{offset:.3f}', '-i', source_path,
+        '-frames:v', '1', '-vf', f'scale={POSTER_WIDTH}:-2', '-q:v', '4',
+        output_path,
+    ])
+
+
+def extract_sprite(source_path, output_path, layout):
+    # Decoding keyframes only keeps this fast; exact frame times are not needed
+    run_ffmpeg([
+        settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+        '-skip_frame', 'nokey', '-i', source_path, '-an',
+        '-vf', (
+            f"fps=1/{layout['interval']:.3f},"
+            f"scale={layout['width']}:{layout['height']},"
+            f"tile={layout['columns']}x{layout['rows']}"
+        ),
+        '-frames:v', '1', '-q:v', '5',
+        output_path,
+    ])
+
+
+def extract_previews(blob, source_path, probe_data):
+    """Generate the poster and sprite sheet and save them with the metadata"""
+    summary = summarize_probe(probe_data)
+    duration = summary['duration']
+    poster = sprite = None
+
+    with tempfile.TemporaryDirectory(prefix='previews-') as work_dir:
+        try:
+            path = os.path.join(work_dir, 'poster.jpg')
+            extract_poster(source_path, path, duration)
+            poster = store_output(poster_name(blob.digest), path)
+        except TranscodeError as e:
+            logger.warning(f"Poster extraction failed for content {blob.digest}: {e}")
+
+        if duration:
+            layout = sprite_layout(duration, summary['width'], summary['height'])
+            try:
+                path = os.path.join(work_dir, 'sprite.jpg')
+                extract_sprite(source_path, path, layout)
+                sprite = {'name': store_output(sprite_name(blob.digest), path), **layout}
+            except TranscodeError as e:
+                logger.warning(f"Sprite extraction failed for content {blob.digest}: {e}")
+
+    previews = {'summary': summary, 'poster': poster, 'sprite': sprite}
+    save_previews(blob.pk, previews)
+    return previews
+
+
+def save_previews(blob_id, previews):
+    """Record the previews on the content and every submission of it, atomically"""
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().get(pk=blob_id)
+        blob.derived['previews'] = previews
+        blob.save(update_fields=['derived', 'updated_at'])
+        for video in VideoSubmission.objects.filter(blob=blob):
+            apply_previews(video, previews)
+
+
+def apply_previews(video, previews):
+    """Write extracted values to one submission and its metadata"""
+    summary = previews['summary']
+    submission_fields = {}
+    if summary['duration'] is not None:
+        submission_fields['duration'] = timedelta(seconds=summary['duration'])
+    if previews.get('poster'):
+        submission_fields['thumbnail'] = previews['poster']
+
+    metadata = {
+        'video_codec': summary['video_codec'],
+        'audio_codec': summary['audio_codec'],
+        'bit_rate': summary['bit_rate'],
+    }
+    if summary['width'] and summary['height']:
+        metadata['resolution'] = f"{summary['width']}x{summary['height']}"
+    if previews.get('sprite'):
+        metadata['sprite'] = previews['sprite']
+
+    with transaction.atomic():
+        if submission_fields:
+            VideoSubmission.objects.filter(pk=video.pk).update(**submission_fields)
+        VideoMetadata.objects.update_or_create(
+            video_id=video.pk,
+            defaults=metadata,
+            create_defaults={
+                **metadata,
+                'original_filename': os.path.basename(video.video_file.name),
+                'mime_type': mimetypes.guess_type(video.video_file.name)[0] or '',
+            },
+        )
+
+
+def _timestamp(seconds):
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}'
+
+
+def sprite_vtt(sprite, sprite_url):
+    """WebVTT thumbnail track mapping time ranges to sprite sheet regions"""
+    lines = ['WEBVTT', '']
+    width, height, columns = sprite['width'], sprite['height'], sprite['columns']
+    for index in range(sprite['count']):
+        start = index * sprite['interval']
+        end = min(start + sprite['interval'], sprite['duration'])
+        x = (index % columns) * width
+        y = (index // columns) * height
+        lines.append(f'{_timestamp(start)} --> {_timestamp(end)}')
+        lines.append(f'{sprite_url}#xywh={x},{y},{width},{height}')
+        lines.append('')
+    return '\n'.join(lines)
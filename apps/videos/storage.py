@@ -0,0 +1,105 @@
+"""
+Upload ticket backends.
+
+A ticket lets the client send a file straight to object storage instead of
+through the Django workers. The backend creates a size-bound upload
+target for an object name, and later reports what actually arrived so the
+upload can be verified before a submission row points at it.
+
+``GCSUploadTicketBackend`` issues GCS resumable upload sessions.
+``LocalUploadTicketBackend`` mimics them on the local filesystem, using a
+signed PUT endpoint with the same ``Content-Range`` / 308 semantics, so
+the whole flow works offline and in tests.
+"""
+import base64
+import hashlib
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+LOCAL_TICKET_SALT = 'videos.upload-ticket'
+
+
+class UploadTicketBackend:
+    """Interface for direct-to-storage upload tickets"""
+
+    def create_upload_url(self, ticket, origin=None):
+        """Return the URL the client uploads ``ticket.object_name`` to"""
+        raise NotImplementedError
+
+    def stat(self, name):
+        """
+        Return ``(size, md5_base64)`` of an uploaded object, or None if it
+        does not exist (yet).
+        """
+        raise NotImplementedError
+
+    def delete(self, name):
+        default_storage.delete(name)
+
+
+class GCSUploadTicketBackend(UploadTicketBackend):
+    """Resumable upload sessions on the media bucket"""
+
+    def _object_name(self, name):
+        # Same object naming as MediaStorage (location prefix)
+        location = default_storage.location.strip('/')
+        return f'{location}/{name}' if location else name
+
+    def _blob(self, name):
+        return default_storage.bucket.blob(self._object_name(name))
+
+    def create_upload_url(self, ticket, origin=None):
+        # GCS enforces the declared size and, with if_generation_match=0,
+        # refuses to overwrite an existing object.
+        return self._blob(ticket.object_name).create_resumable_upload_session(
+            content_type=ticket.content_type,
+            size=ticket.size,
+            origin=origin,
+            if_generation_match=0,
+        )
+
+    def stat(self, name):
+        blob = default_storage.bucket.get_blob(self._object_name(name))
+        if blob is None:
+            return None
+        return blob.size, blob.md5_hash
+
+
+class LocalUploadTicketBackend(UploadTicketBackend):
+    """Filesystem stand-in for GCS resumable sessions (development/tests)"""
+
+    def create_upload_url(self, ticket, origin=None):
+        token = signing.dumps(str(ticket.pk), salt=LOCAL_TICKET_SALT)
+        return reverse('videos:upload_ticket_put', args=[token])
+
+    @staticmethod
+    def unsign(token, max_age):
+        return signing.loads(token, salt=LOCAL_TICKET_SALT, max_age=max_age)
+
+    def path(self, name):
+        return default_storage.path(name)
+
+    def stat(self, name):
+        path = self.path(name)
+        if not os.path.exists(path):
+            return None
+        md5 = hashlib.md5()
+        with open(path, 'rb') as handle:
+            for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+                md5.update(chunk)
+        return os.path.getsize(path), base64.b64encode(md5.digest()).decode()
+
+
+_backend = None
+
+
+def get_ticket_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.VIDEO_UPLOAD_TICKET_BACKEND)()
+    return _backend
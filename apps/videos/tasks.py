@@ -0,0 +1,156 @@
+from contextlib import ExitStack
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.blobs import hash_file, record_derived
+from core.models import ContentBlob
+from .content import attach_blob
+from .models import VideoRendition, VideoSubmission
+from .previews import apply_previews, extract_previews, summarize_probe
+from .tickets import expire_tickets
+from .transcoding import (
+    PLAYLIST_NAME,
+    RUNG_PRIORITY,
+    TranscodeError,
+    local_source,
+    plan_renditions,
+    probe,
+    rendition_dir,
+    sync_processing_status,
+    transcode,
+)
+from .uploads import assemble_session, expire_sessions
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def expire_upload_sessions():
+    """Periodic cleanup of abandoned resumable uploads and upload tickets"""
+    expired = expire_sessions()
+    if expired:
+        logger.info(f"Expired {expired} abandoned upload sessions")
+    rejected = expire_tickets()
+    if rejected:
+        logger.info(f"Expired {rejected} unused upload tickets")
+
+
+@shared_task(ignore_result=True)
+def assemble_upload(session_id, expected_sha256=None):
+    """Assemble a finalized resumable upload into its submission"""
+    assemble_session(session_id, expected_sha256)
+
+
+@shared_task(ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def process_video(video_id):
+    """
+    Attach a submission to its content and process that content once:
+    probe, queue the HLS renditions and extract previews. Identical
+    content that was processed before is reused as is.
+    """
+    video = VideoSubmission.objects.filter(pk=video_id).first()
+    if video is None or video.processing_status == VideoSubmission.PROCESSING_READY:
+        return
+
+    try:
+        with ExitStack() as stack:
+            path = None
+            own_name = video.video_file.name
+            if video.blob_id is None:
+                path = stack.enter_context(local_source(own_name))
+                attach_blob(video, *hash_file(path))
+            blob = ContentBlob.objects.get(pk=video.blob_id)
+
+            if 'previews' in blob.derived:
+                # Already processed for another upload. Requeueing pending
+                # renditions is harmless: tasks claim them.
+                apply_previews(video, blob.derived['previews'])
+                _queue_renditions(blob.renditions.filter(status=VideoRendition.STATUS_PENDING))
+                sync_processing_status(blob.pk)
+                return
+
+            # Previews are saved last, so content without them is processed
+            # again from the probe (every step is idempotent): a task
+            # redelivered after its worker died mid-way is not skipped.
+            if path is None or blob.name != own_name:
+                path = stack.enter_context(local_source(blob.name))
+            _process_blob(blob, path)
+    except TranscodeError as e:
+        logger.error(f"Video {video_id} cannot be processed: {e}")
+        VideoSubmission.objects.filter(pk=video_id).update(
+            processing_status=VideoSubmission.PROCESSING_FAILED
+        )
+
+
+def _process_blob(blob, path):
+    probe_data = probe(path)
+    renditions = plan_renditions(blob, probe_data)
+    record_derived(blob.pk, 'probe', summarize_probe(probe_data))
+    sync_processing_status(blob.pk)
+    _queue_renditions(renditions)
+    # Poster, sprite sheet and metadata are extracted from the same local
+    # copy while other workers transcode
+    extract_previews(blob, path, probe_data)
+
+
+def _queue_renditions(renditions):
+    for rendition in renditions:
+        transcode_rendition.apply_async(
+            (rendition.pk,), priority=RUNG_PRIORITY.get(rendition.name, 9)
+        )
+
+
+@shared_task(bind=True, ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def transcode_rendition(self, rendition_id):
+    """
+    Transcode one rendition.
+
+    The task claims its row with a conditional update, so a duplicate or
+    redelivered message is a no-op unless the previous attempt has been
+    running longer than VIDEO_TRANSCODE_TIMEOUT (its worker died).
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.VIDEO_TRANSCODE_TIMEOUT)
+    claimed = VideoRendition.objects.filter(
+        Q(status=VideoRendition.STATUS_PENDING)
+        | Q(status=VideoRendition.STATUS_PROCESSING, started_at__lt=stale),
+        pk=rendition_id,
+    ).update(
+        status=VideoRendition.STATUS_PROCESSING,
+        attempts=F('attempts') + 1,
+        started_at=now,
+        error='',
+    )
+    if not claimed:
+        return
+
+    rendition = VideoRendition.objects.select_related('blob').get(pk=rendition_id)
+    try:
+        with local_source(rendition.blob.name) as path:
+            segment_count = transcode(rendition, path)
+    except Exception as e:
+        logger.warning(f"Transcoding rendition {rendition_id} failed: {e}")
+        if self.request.retries < settings.VIDEO_TRANSCODE_MAX_RETRIES:
+            VideoRendition.objects.filter(pk=rendition_id).update(
+                status=VideoRendition.STATUS_PENDING, error=str(e)
+            )
+            raise self.retry(exc=e, countdown=60 * 2 ** self.request.retries)
+        VideoRendition.objects.filter(pk=rendition_id).update(
+            status=VideoRendition.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+        )
+        sync_processing_status(rendition.blob_id)
+        return
+
+    VideoRendition.objects.filter(pk=rendition_id).update(
+        status=VideoRendition.STATUS_READY,
+        playlist=f'{rendition_dir(rendition.blob.digest, rendition.name)}/{PLAYLIST_NAME}',
+        segment_count=segment_count,
+        finished_at=timezone.now(),
+    )
+    logger.info(f"Rendition {rendition} ready ({segment_count} segments)")
+    sync_processing_status(rendition.blob_id)
@@ -1,3 +1,387 @@
-from django.test import TestCase
+import base64
+import hashlib
+import tempfile
+from contextlib import nullcontext
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from .models import UploadSession, UploadTicket, VideoRendition, VideoSubmission
+from core.models import ContentBlob
+from .access import media_owner_ids
+from .previews import apply_previews, sprite_layout, summarize_probe
+from .tasks import process_video
+from .transcoding import sync_processing_status
+
+
+def _metadata(**values):
+    return ','.join(
+        f'{key} {base64.b64encode(value.encode()).decode()}' for key, value in values.items()
+    )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ResumableUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.client.force_login(self.user)
+        # An MP4 'ftyp' box header, then filler: 100 KB
+        self.content = b'\x00\x00\x00\x18ftypisom' + bytes(range(256)) * 400
+
+    def _create(self):
+        response = self.client.post(
+            '/videos/uploads/',
+            HTTP_UPLOAD_LENGTH=str(len(self.content)),
+            HTTP_UPLOAD_METADATA=_metadata(filename='clip.mp4', title='My clip'),
+        )
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def _patch(self, url, offset, data, **headers):
+        return self.client.patch(
+            url, data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), **headers
+        )
+
+    def test_chunked_upload_resumes_and_finalizes(self):
+        url = self._create()
+        half = len(self.content) // 2
+
+        self.assertEqual(self._patch(url, 0, self.content[:half]).status_code, 204)
+        # A retried chunk at a stale offset is refused
+        self.assertEqual(self._patch(url, 0, self.content[:half]).status_code, 409)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], str(half))
+
+        response = self._patch(url, half, self.content[half:])
+        self.assertEqual(response['Upload-Offset'], str(len(self.content)))
+
+        # Assembly is queued on commit and runs in a worker
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'{url}finalize/', {'sha256': hashlib.sha256(self.content).hexdigest()},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], f'{url}finalize/')
+        response = self.client.get(f'{url}finalize/')
+        self.assertEqual(response.status_code, 200)
+        submission = VideoSubmission.objects.get(pk=response.json()['id'])
+        self.assertEqual(submission.title, 'My clip')
+        with default_storage.open(submission.video_file.name) as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(submission.metadata.mime_type, 'video/mp4')
+
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, UploadSession.STATUS_COMPLETED)
+        self.assertEqual(default_storage.listdir(f'uploads/{session.pk}'), ([], []))
+
+    def _upload(self):
+        url = self._create()
+        self._patch(url, 0, self.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{url}finalize/')
+        # A repeated finalize reports the finished submission
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, 201)
+        return VideoSubmission.objects.get(pk=response.json()['id'])
+
+    def _stored_videos(self):
+        directory = f'videos/user_{self.user.pk}'
+        return set(default_storage.listdir(directory)[1]) if default_storage.exists(directory) else set()
+
+    def test_identical_uploads_share_one_stored_object(self):
+        existing = self._stored_videos()
+        first = self._upload()
+        second = self._upload()
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.video_file.name, second.video_file.name)
+        blob = ContentBlob.objects.get()
+        self.assertEqual(blob.digest, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(len(self._stored_videos() - existing), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(blob.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ContentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.name))
+
+    def test_finalize_rejects_incomplete_upload(self):
+        url = self._create()
+        self._patch(url, 0, self.content[:1000])
+        response = self.client.post(f'{url}finalize/')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(VideoSubmission.objects.exists())
+
+    def test_failed_finalize_is_reported_and_can_be_retried(self):
+        url = self._create()
+        self._patch(url, 0, self.content)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                f'{url}finalize/', {'sha256': hashlib.sha256(b'other').hexdigest()},
+                content_type='application/json'
+            )
+            # Polling while it is queued does not queue it again
+            self.assertEqual(self.client.post(f'{url}finalize/').status_code, 202)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+
+        response = self.client.get(f'{url}finalize/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], 'Checksum mismatch')
+        self.assertFalse(VideoSubmission.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{url}finalize/')
+        self.assertEqual(self.client.get(f'{url}finalize/').status_code, 200)
+
+    def test_chunk_checksum_mismatch_is_rejected(self):
+        url = self._create()
+        digest = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self._patch(url, 0, self.content[:1000], HTTP_UPLOAD_CHECKSUM=f'sha256 {digest}')
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '0')
+
+    def test_chunk_that_is_not_a_video_is_rejected(self):
+        url = self._create()
+        response = self._patch(url, 0, b'<?php system($_GET["c"]); ?>' + self.content[:1000])
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '0')
+
+    def test_rejects_disallowed_extension(self):
+        response = self.client.post(
+            '/videos/uploads/',
+            HTTP_UPLOAD_LENGTH='100',
+            HTTP_UPLOAD_METADATA=_metadata(filename='payload.exe'),
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UploadTicketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.client.force_login(self.user)
+        self.content = bytes(range(256)) * 400
+
+    def _issue(self, md5=None):
+        response = self.client.post('/videos/upload-tickets/', {
+            'filename': 'clip.mp4',
+            'size': len(self.content),
+            'md5': md5 or hashlib.md5(self.content).hexdigest(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def _put(self, url, start, data):
+        end = start + len(data) - 1
+        return self.client.generic(
+            'PUT', url, data, content_type='video/mp4',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.content)}'
+        )
+
+    def test_direct_upload_is_verified_on_finalize(self):
+        ticket = self._issue()
+        half = len(self.content) // 2
+        response = self._put(ticket['upload_url'], 0, self.content[:half])
+        self.assertEqual(response.status_code, 308)
+        self.assertEqual(response['Range'], f'bytes=0-{half - 1}')
+
+        self.assertEqual(self.client.post(ticket['finalize_url']).status_code, 409)
+
+        self.assertEqual(self._put(ticket['upload_url'], half, self.content[half:]).status_code, 200)
+        response = self.client.post(ticket['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        submission = VideoSubmission.objects.get(pk=response.json()['id'])
+        self.assertEqual(submission.video_file.name, UploadTicket.objects.get().object_name)
+        self.assertEqual(submission.file_size, len(self.content))
+
+    def test_checksum_mismatch_rejects_upload(self):
+        ticket = self._issue(md5=hashlib.md5(b'other').hexdigest())
+        self._put(ticket['upload_url'], 0, self.content)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(ticket['finalize_url'])
+        self.assertEqual(response.status_code, 460)
+        self.assertFalse(VideoSubmission.objects.exists())
+        self.assertFalse(default_storage.exists(UploadTicket.objects.get().object_name))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class HLSPlaybackTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.blob = ContentBlob.objects.create(
+            digest='ab' * 32, name='videos/clip.mp4', size=1, ref_count=1
+        )
+        self.video = VideoSubmission.objects.create(
+            student=self.student, title='Clip', video_file='videos/clip.mp4', file_size=1,
+            processing_status=VideoSubmission.PROCESSING_RUNNING, blob=self.blob,
+        )
+        self.rendition = VideoRendition.objects.create(
+            blob=self.blob, name='240p', width=426, height=240,
+            video_bitrate=400_000, audio_bitrate=64_000,
+        )
+        VideoRendition.objects.create(
+            blob=self.blob, name='480p', width=854, height=480,
+            video_bitrate=1_000_000, audio_bitrate=96_000, status=VideoRendition.STATUS_FAILED,
+        )
+
+    def _make_ready(self):
+        playlist = f'hls/{self.blob.digest}/240p/index.m3u8'
+        default_storage.save(playlist, ContentFile(
+            b'#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXTINF:4.0,\nseg_00000.ts\n'
+            b'#EXTINF:2.5,\nseg_00001.ts\n#EXT-X-ENDLIST\n'
+        ))
+        VideoRendition.objects.filter(pk=self.rendition.pk).update(
+            status=VideoRendition.STATUS_READY, playlist=playlist, segment_count=2
+        )
+
+    def test_video_is_ready_once_no_rendition_is_in_flight(self):
+        VideoRendition.objects.filter(pk=self.rendition.pk).update(
+            status=VideoRendition.STATUS_PROCESSING
+        )
+        self.assertEqual(sync_processing_status(self.blob.pk), VideoSubmission.PROCESSING_RUNNING)
+        self._make_ready()
+        self.assertEqual(sync_processing_status(self.blob.pk), VideoSubmission.PROCESSING_READY)
+        self.video.refresh_from_db()
+        self.assertTrue(self.video.is_playable)
+
+    def test_owner_gets_playlists_with_segment_urls(self):
+        self._make_ready()
+        self.client.force_login(self.student)
+
+        response = self.client.get(f'/videos/{self.video.pk}/hls/master.m3u8')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        master = response.content.decode()
+        self.assertIn('BANDWIDTH=464000,RESOLUTION=426x240', master)
+        self.assertIn(f'/videos/{self.video.pk}/hls/240p/index.m3u8', master)
+        self.assertNotIn('480p', master)
+
+        response = self.client.get(f'/videos/{self.video.pk}/hls/240p/index.m3u8')
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertIn(default_storage.url(f'hls/{self.blob.digest}/240p/seg_00000.ts'), lines)
+        self.assertIn('#EXT-X-ENDLIST', lines)
+
+    def test_other_students_cannot_watch(self):
+        self._make_ready()
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password=None, is_verified=True
+        )
+        self.client.force_login(other)
+        response = self.client.get(f'/videos/{self.video.pk}/hls/master.m3u8')
+        self.assertEqual(response.status_code, 403)
+
+
+class PreviewExtractionTests(TestCase):
+    probe_data = {
+        'format': {'duration': '300.5', 'bit_rate': '2500000'},
+        'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'width': 1920, 'height': 1080,
+             'side_data_list': [{'rotation': -90}]},
+            {'codec_type': 'audio', 'codec_name': 'aac'},
+        ],
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.video = VideoSubmission.objects.create(
+            student=self.student, title='Clip', video_file='videos/clip.mp4', file_size=1
+        )
+
+    def test_probe_summary_reports_displayed_resolution(self):
+        summary = summarize_probe(self.probe_data)
+        self.assertEqual((summary['width'], summary['height']), (1080, 1920))
+        self.assertEqual(summary['duration'], 300.5)
+        self.assertEqual(summary['video_codec'], 'h264')
+        self.assertEqual(summary['bit_rate'], 2500000)
+
+    def test_results_are_saved_and_served_as_webvtt(self):
+        summary = summarize_probe(self.probe_data)
+        layout = sprite_layout(summary['duration'], summary['width'], summary['height'])
+        self.assertEqual((layout['count'], layout['columns'], layout['rows']), (100, 10, 10))
+        self.assertEqual(layout['height'], 284)
+
+        sprite = {'name': 'previews/video_1_sprite.jpg', **layout}
+        apply_previews(self.video, {
+            'summary': summary, 'poster': 'thumbnails/video_1.jpg', 'sprite': sprite
+        })
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.duration, timedelta(seconds=300.5))
+        self.assertEqual(self.video.thumbnail.name, 'thumbnails/video_1.jpg')
+        self.assertEqual(self.video.metadata.resolution, '1080x1920')
+        self.assertEqual(self.video.metadata.original_filename, 'clip.mp4')
+
+        self.client.force_login(self.student)
+        response = self.client.get(f'/videos/{self.video.pk}/previews.vtt')
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], 'WEBVTT')
+        self.assertEqual(lines[2], '00:00:00.000 --> 00:00:03.005')
+        self.assertTrue(lines[3].endswith('video_1_sprite.jpg#xywh=0,0,160,284'))
+        self.assertTrue(lines[-1].endswith('#xywh=1440,2556,160,284'))
+
+
+class ContentProcessingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password=None, is_verified=True
+        )
+        self.blob = ContentBlob.objects.create(
+            digest='cd' * 32, name='videos/clip.mp4', size=1, ref_count=1,
+            derived={'probe': summarize_probe(PreviewExtractionTests.probe_data)},
+        )
+        self.video = VideoSubmission.objects.create(
+            student=self.student, title='Clip', video_file='videos/clip.mp4', file_size=1,
+            blob=self.blob,
+        )
+
+    def test_content_probed_without_previews_is_processed_again(self):
+        # The worker died after the probe was recorded; this is the redelivery
+        with mock.patch('videos.tasks.local_source', return_value=nullcontext('/tmp/clip.mp4')), \
+                mock.patch('videos.tasks.probe', return_value=PreviewExtractionTests.probe_data), \
+                mock.patch('videos.tasks.transcode_rendition'), \
+                mock.patch('videos.tasks.extract_previews') as extract:
+            process_video(self.video.pk)
+        extract.assert_called_once()
+        self.assertEqual(extract.call_args.args[0], self.blob)
+
+    def test_processed_content_is_reused(self):
+        previews = {
+            'summary': self.blob.derived['probe'], 'poster': f'thumbnails/{self.blob.digest}.jpg',
+            'sprite': None,
+        }
+        ContentBlob.objects.filter(pk=self.blob.pk).update(
+            derived={**self.blob.derived, 'previews': previews}
+        )
+        with mock.patch('videos.tasks.local_source') as local_source:
+            process_video(self.video.pk)
+        local_source.assert_not_called()
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail.name, previews['poster'])
+
+    def test_outputs_named_after_the_submission_keep_their_owner(self):
+        self.assertEqual(media_owner_ids(f'thumbnails/video_{self.video.pk}.jpg'), [self.student.pk])
+        self.assertEqual(media_owner_ids(f'hls/{self.video.pk}/240p/index.m3u8'), [self.student.pk])
+        self.assertEqual(media_owner_ids('thumbnails/video_999999.jpg'), [])
@@ -0,0 +1,161 @@
+"""
+Direct-to-storage video uploads.
+
+1. ``POST /videos/upload-tickets/`` declares filename, size and MD5 and
+   receives a short-lived, size-bound upload URL (a GCS resumable session,
+   or the local stand-in in development).
+2. The client uploads the bytes straight to that URL.
+3. ``POST /videos/upload-tickets/<id>/finalize/`` checks the stored
+   object's size and MD5 against the declaration from storage metadata,
+   without reading the file, and creates the submission.
+
+No upload bytes pass through the Django workers.
+"""
+import base64
+import binascii
+import logging
+import mimetypes
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadTicket, VideoMetadata, VideoSubmission, video_object_name
+from .storage import get_ticket_backend
+from .uploads import UploadError, validate_video_upload
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_md5(value):
+    """Accept an MD5 as base64 (as GCS reports it) or hex; return base64"""
+    value = (value or '').strip()
+    try:
+        if len(value) == 32:
+            digest = binascii.unhexlify(value)
+        else:
+            digest = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        digest = b''
+    if len(digest) != 16:
+        raise UploadError('A valid md5 checksum of the file is required')
+    return base64.b64encode(digest).decode()
+
+
+def issue_ticket(user, data, origin=None):
+    """Create an UploadTicket; returns ``(ticket, upload_url)``"""
+    filename = os.path.basename(str(data.get('filename', ''))).strip()
+    if not filename:
+        raise UploadError('filename is required')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        raise UploadError('size is required')
+    validate_video_upload(filename, size)
+    md5 = _normalize_md5(data.get('md5'))
+
+    ticket = UploadTicket.objects.create(
+        user=user,
+        object_name=video_object_name(user.pk, filename),
+        filename=filename[:255],
+        title=(data.get('title') or os.path.splitext(filename)[0])[:200],
+        description=data.get('description', ''),
+        content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        size=size,
+        md5=md5,
+    )
+    return ticket, get_ticket_backend().create_upload_url(ticket, origin=origin)
+
+
+def _open_ticket(ticket):
+    """The ticket's submission if already finalized; raises if it cannot be"""
+    if ticket is None:
+        raise UploadError('Upload ticket not found', status=404)
+    if ticket.status == UploadTicket.STATUS_REJECTED:
+        raise UploadError('Upload ticket was rejected', status=409)
+    return ticket.submission if ticket.status == UploadTicket.STATUS_COMPLETED else None
+
+
+def finalize_ticket(user, ticket_id):
+    """
+    Verify the uploaded object and create its VideoSubmission.
+
+    Finalizing twice returns the same submission. A mismatched object is
+    deleted and the ticket rejected; an incomplete one is left in place so
+    the client can resume and finalize again.
+    """
+    backend = get_ticket_backend()
+    tickets = UploadTicket.objects.filter(pk=ticket_id, user=user)
+    ticket = tickets.first()
+    submission = _open_ticket(ticket)
+    if submission is not None:
+        return submission
+
+    # A network call: made before taking the row lock. Objects are
+    # write-once, so a concurrent finalize sees the same result.
+    stat = backend.stat(ticket.object_name)
+    if stat is None or stat[0] < ticket.size:
+        if ticket.is_expired:
+            raise UploadError('Upload ticket expired', status=410)
+        raise UploadError('Upload incomplete', status=409)
+
+    with transaction.atomic():
+        ticket = tickets.select_for_update().first()
+        submission = _open_ticket(ticket)
+        if submission is not None:
+            return submission
+
+        size, md5 = stat
+        if size != ticket.size or md5 != ticket.md5:
+            ticket.status = UploadTicket.STATUS_REJECTED
+            ticket.save(update_fields=['status'])
+            transaction.on_commit(lambda: backend.delete(ticket.object_name))
+        else:
+            submission = _create_submission(ticket, size)
+
+    if submission is None:
+        logger.warning(f"Upload ticket {ticket.pk} rejected: size or checksum mismatch")
+        raise UploadError('Uploaded file does not match its size or checksum', status=460)
+    logger.info(f"Upload ticket {ticket.pk} finalized as submission {submission.pk}")
+    return submission
+
+
+def _create_submission(ticket, size):
+    submission = VideoSubmission(
+        student=ticket.user,
+        title=ticket.title,
+        description=ticket.description,
+        file_size=size,
+    )
+    # The object is already in place; point the field at it
+    submission.video_file.name = ticket.object_name
+    submission.save()
+    VideoMetadata.objects.create(
+        video=submission,
+        original_filename=ticket.filename,
+        mime_type=ticket.content_type,
+    )
+    ticket.status = UploadTicket.STATUS_COMPLETED
+    ticket.submission = submission
+    ticket.save(update_fields=['status', 'submission'])
+    return submission
+
+
+def expire_tickets(batch_size=100):
+    """Reject issued tickets past their expiry and delete partial uploads"""
+    backend = get_ticket_backend()
+    expired = 0
+    stale = UploadTicket.objects.filter(
+        status=UploadTicket.STATUS_ISSUED, expires_at__lt=timezone.now()
+    ).order_by('expires_at')
+    while True:
+        tickets = list(stale[:batch_size])
+        if not tickets:
+            break
+        for ticket in tickets:
+            backend.delete(ticket.object_name)
+        UploadTicket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).update(
+            status=UploadTicket.STATUS_REJECTED
+        )
+        expired += len(tickets)
+    return expired
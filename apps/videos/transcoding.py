@@ -0,0 +1,272 @@
+"""
+HLS transcoding.
+
+Every unique video content (ContentBlob) is transcoded once into a small
+bitrate ladder of H.264/AAC HLS renditions (one VideoRendition row each);
+submissions of identical content share them. Rungs above the source
+resolution are skipped. Output names are deterministic
+(``hls/<digest>/<rendition>/...``), so a retried or redelivered task simply
+overwrites its own partial output. The playlist is written last, so a
+rendition is only ever marked ready once all of its segments are stored.
+
+Players fetch the master playlist and the rendition playlists through
+Django (see videos.views). Segment URLs there are signed in one batch,
+because private GCS objects cannot be fetched through relative paths.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import ContentBlob
+from core.storage import sign_urls
+from .models import VideoRendition, VideoSubmission
+
+logger = logging.getLogger(__name__)
+
+Rung = namedtuple('Rung', 'name height video_bitrate audio_bitrate')
+
+HLS_LADDER = (
+    Rung('240p', 240, 400_000, 64_000),
+    Rung('480p', 480, 1_000_000, 96_000),
+    Rung('720p', 720, 2_500_000, 128_000),
+)
+
+# Celery priorities on the Redis broker: 0 is served first. The lowest rung
+# goes first so playback can start as early as possible.
+RUNG_PRIORITY = {'240p': 0, '480p': 3, '720p': 6}
+
+SEGMENT_SECONDS = 4
+PLAYLIST_NAME = 'index.m3u8'
+PLAYLIST_CACHE_TIMEOUT = 60 * 60 * 24
+HLS_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def rendition_dir(digest, name):
+    return f'hls/{digest}/{name}'
+
+
+@contextmanager
+def local_source(name):
+    """Yield a local filesystem path for the stored object ``name``"""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+
+    # Remote storage: stream the object into a temporary file
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1]) as target:
+        with default_storage.open(name, 'rb') as source:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        target.flush()
+        yield target.name
+
+
+def probe(path):
+    """Run ffprobe once and return its JSON (format and streams)"""
+    command = [
+        settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', path,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True, timeout=120)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise TranscodeError(f'ffprobe failed: {e}')
+    return json.loads(result.stdout or b'{}')
+
+
+def video_stream(probe_data):
+    for stream in probe_data.get('streams', []):
+        if stream.get('codec_type') == 'video':
+            return stream
+    return None
+
+
+def plan_renditions(blob, probe_data):
+    """Create the rendition rows that fit the source; return unfinished ones"""
+    stream = video_stream(probe_data)
+    if stream is None:
+        raise TranscodeError('No video stream found')
+    source_height = int(stream.get('height') or 0)
+    source_width = int(stream.get('width') or 0)
+
+    rungs = [rung for rung in HLS_LADDER if rung.height <= source_height] or [HLS_LADDER[0]]
+    VideoRendition.objects.bulk_create(
+        [
+            VideoRendition(
+                blob=blob,
+                name=rung.name,
+                height=rung.height,
+                # Keep the aspect ratio; H.264 needs even dimensions
+                width=(source_width * rung.height // source_height) // 2 * 2 if source_height else 0,
+                video_bitrate=rung.video_bitrate,
+                audio_bitrate=rung.audio_bitrate,
+            )
+            for rung in rungs
+        ],
+        ignore_conflicts=True,
+    )
+    return list(
+        blob.renditions.exclude(status=VideoRendition.STATUS_READY).order_by('height')
+    )
+
+
+def ffmpeg_command(rendition, source_path, output_dir):
+    bitrate = rendition.video_bitrate
+    return [
+        settings.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', source_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f'scale=-2:{rendition.height}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+        '-b:v', str(bitrate), '-maxrate', str(int(bitrate * 1.07)), '-bufsize', str(bitrate * 2),
+        # Fixed GOP aligned with segments, so every segment starts on a keyframe
+        '-g', str(SEGMENT_SECONDS * 24), '-keyint_min', str(SEGMENT_SECONDS * 24),
+        '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+        '-c:a', 'aac', '-b:a', str(rendition.audio_bitrate), '-ac', '2',
+        '-threads', str(settings.VIDEO_TRANSCODE_THREADS),
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, 'seg_%05d.ts'),
+        os.path.join(output_dir, PLAYLIST_NAME),
+    ]
+
+
+def store_output(name, path):
+    """Store ``path`` under exactly ``name``, overwriting a previous attempt"""
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    with open(path, 'rb') as handle:
+        stored = default_storage.save(name, File(handle))
+    if stored != name:
+        raise TranscodeError(f'Storage renamed {name} to {stored}')
+    return stored
+
+
+def run_ffmpeg(command):
+    try:
+        subprocess.run(
+            command,
+            capture_output=True,
+            check=True,
+            timeout=settings.VIDEO_TRANSCODE_TIMEOUT,
+        )
+    except subprocess.CalledProcessError as e:
+        raise TranscodeError(e.stderr.decode(errors='replace')[-2000:] or str(e))
+    except (OSError, subprocess.SubprocessError) as e:
+        raise TranscodeError(str(e))
+
+
+def transcode(rendition, source_path):
+    """Transcode one rendition and store its output; returns segment count"""
+    with tempfile.TemporaryDirectory(prefix='hls-') as output_dir:
+        run_ffmpeg(ffmpeg_command(rendition, source_path, output_dir))
+
+        prefix = rendition_dir(rendition.blob.digest, rendition.name)
+        segments = sorted(name for name in os.listdir(output_dir) if name.endswith('.ts'))
+        for segment in segments:
+            store_output(f'{prefix}/{segment}', os.path.join(output_dir, segment))
+        # Playlist last: its presence means the rendition is complete
+        store_output(f'{prefix}/{PLAYLIST_NAME}', os.path.join(output_dir, PLAYLIST_NAME))
+    return len(segments)
+
+
+def sync_processing_status(blob_id):
+    """
+    Set the processing status of every submission of the content from its
+    renditions: running while any is in flight, then ready or failed.
+    """
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().get(pk=blob_id)
+        statuses = set(blob.renditions.values_list('status', flat=True))
+        if statuses & {VideoRendition.STATUS_PENDING, VideoRendition.STATUS_PROCESSING}:
+            status = VideoSubmission.PROCESSING_RUNNING
+        elif VideoRendition.STATUS_READY in statuses:
+            status = VideoSubmission.PROCESSING_READY
+        else:
+            status = VideoSubmission.PROCESSING_FAILED
+        VideoSubmission.objects.filter(blob=blob).exclude(processing_status=status).update(
+            processing_status=status, updated_at=timezone.now()
+        )
+    if status != VideoSubmission.PROCESSING_RUNNING:
+        logger.info(f"Content {blob.digest} processing finished: {status}")
+    return status
+
+
+def rendition_files(rendition):
+    prefix = rendition_dir(rendition.blob.digest, rendition.name)
+    names = [f'{prefix}/seg_{index:05d}.ts' for index in range(rendition.segment_count)]
+    return names + [f'{prefix}/{PLAYLIST_NAME}']
+
+
+def derived_files(blob):
+    """Storage names of everything generated from a blob's content"""
+    names = []
+    for rendition in blob.renditions.all():
+        names.extend(rendition_files(rendition))
+    previews = blob.derived.get('previews', {})
+    if previews.get('poster'):
+        names.append(previews['poster'])
+    if previews.get('sprite'):
+        names.append(previews['sprite']['name'])
+    return names
+
+
+def master_playlist(video, renditions):
+    """HLS master playlist pointing at the rendition playlist views"""
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for rendition in renditions:
+        attributes = [f'BANDWIDTH={rendition.bandwidth}']
+        if rendition.width:
+            attributes.append(f'RESOLUTION={rendition.width}x{rendition.height}')
+        attributes.append('CODECS="avc1.4d401f,mp4a.40.2"')
+        lines.append('#EXT-X-STREAM-INF:' + ','.join(attributes))
+        lines.append(reverse('videos:hls_rendition', args=[video.pk, rendition.name]))
+    return '\n'.join(lines) + '\n'
+
+
+def _read_playlist(name):
+    key = f'videos:hls:{name}'
+    text = cache.get(key)
+    if text is None:
+        with default_storage.open(name, 'rb') as handle:
+            text = handle.read().decode()
+        # Playlists never change once their rendition is ready
+        cache.set(key, text, PLAYLIST_CACHE_TIMEOUT)
+    return text
+
+
+def media_playlist(rendition):
+    """The stored rendition playlist with segment paths replaced by URLs"""
+    text = _read_playlist(rendition.playlist)
+    prefix = os.path.dirname(rendition.playlist)
+    lines = text.splitlines()
+    segments = [
+        f'{prefix}/{line.strip()}' for line in lines
+        if line.strip() and not line.startswith('#')
+    ]
+    urls = sign_urls(segments)
+    output = []
+    for line in lines:
+        if line.strip() and not line.startswith('#'):
+            line = urls[f'{prefix}/{line.strip()}']
+        output.append(line)
+    return '\n'.join(output) + '\n'
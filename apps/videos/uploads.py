@@ -0,0 +1,453 @@
+"""
+Resumable video uploads.
+
+The protocol follows tus 1.0 (core + termination, plus per-chunk
+checksums):
+
+* ``POST /videos/uploads/`` with ``Upload-Length`` and ``Upload-Metadata``
+  creates an UploadSession;
+* ``HEAD`` on the session returns the committed ``Upload-Offset``;
+* ``PATCH`` appends one chunk at ``Upload-Offset``;
+* ``POST .../finalize/`` queues assembly of the file into a submission
+  and answers 202; ``GET .../finalize/`` reports the outcome.
+
+A chunk is streamed from the request into a temporary file and stored as
+its own part object, so no worker holds more than one read buffer of it in
+memory and a dropped connection only loses the chunk in flight. The offset
+is only advanced after the part is safely stored.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from core.uploadhandlers import HEADER_SIZE, content_matches_extension
+from .content import attach_blob
+from .models import UploadSession, VideoMetadata, VideoSubmission
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,termination,checksum'
+CHECKSUM_ALGORITHMS = ('sha256', 'sha1', 'md5')
+
+READ_BUFFER_SIZE = 64 * 1024
+FINALIZE_TIMEOUT = timedelta(minutes=15)
+
+
+class UploadError(Exception):
+    """Protocol error carrying the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_metadata(header):
+    """Decode a tus ``Upload-Metadata`` header into a dict of strings"""
+    metadata = {}
+    for pair in filter(None, (item.strip() for item in (header or '').split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f'Invalid Upload-Metadata value for {key!r}')
+    return metadata
+
+
+def _parse_int_header(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise UploadError(f'Missing or invalid {name} header')
+    if number < 0:
+        raise UploadError(f'Invalid {name} header')
+    return number
+
+
+def validate_video_upload(filename, size):
+    """Check extension and declared size before any bytes are accepted"""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension not in settings.ALLOWED_VIDEO_EXTENSIONS:
+        raise UploadError(
+            f'Unsupported file type. Allowed: {", ".join(settings.ALLOWED_VIDEO_EXTENSIONS)}'
+        )
+    if size <= 0:
+        raise UploadError('Empty uploads are not allowed')
+    if size > settings.MAX_FILE_SIZE:
+        raise UploadError('File too large', status=413)
+
+
+def check_video_header(filename, header):
+    """Check the first bytes of an upload against its extension"""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if not content_matches_extension(header, extension):
+        raise UploadError(f'File content is not a valid .{extension} video', status=415)
+
+
+def create_session(user, upload_length, metadata_header):
+    metadata = parse_metadata(metadata_header)
+    total_size = _parse_int_header(upload_length, 'Upload-Length')
+    filename = os.path.basename(metadata.get('filename', '')).strip()
+    if not filename:
+        raise UploadError('Upload-Metadata must include a filename')
+    validate_video_upload(filename, total_size)
+
+    return UploadSession.objects.create(
+        user=user,
+        filename=filename[:255],
+        title=(metadata.get('title') or os.path.splitext(filename)[0])[:200],
+        description=metadata.get('description', ''),
+        total_size=total_size,
+    )
+
+
+def get_session(user, upload_id):
+    session = UploadSession.objects.filter(pk=upload_id, user=user).first()
+    if session is None or session.status == UploadSession.STATUS_ABORTED:
+        raise UploadError('Upload not found', status=404)
+    if session.status == UploadSession.STATUS_ACTIVE and session.is_expired:
+        raise UploadError('Upload expired', status=410)
+    return session
+
+
+def _parse_checksum(header):
+    if not header:
+        return None
+    algorithm, _, encoded = header.partition(' ')
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError('Unsupported checksum algorithm')
+    try:
+        return algorithm, base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise UploadError('Invalid Upload-Checksum header')
+
+
+def _part_name(session, offset):
+    return f'uploads/{session.pk}/{offset:012d}-{uuid.uuid4().hex[:8]}.part'
+
+
+def write_chunk(user, upload_id, stream, upload_offset, content_length, checksum_header=None):
+    """
+    Append one chunk read from ``stream`` at ``upload_offset``.
+
+    Returns the new committed offset. A chunk sent at a stale offset (e.g.
+    a retry of a chunk that was already stored) is rejected with 409 so the
+    client re-syncs with HEAD.
+    """
+    offset = _parse_int_header(upload_offset, 'Upload-Offset')
+    length = _parse_int_header(content_length, 'Content-Length')
+    checksum = _parse_checksum(checksum_header)
+
+    session = get_session(user, upload_id)
+    if session.status != UploadSession.STATUS_ACTIVE:
+        raise UploadError('Upload is already complete', status=409)
+    if offset != session.offset:
+        raise UploadError('Upload-Offset does not match the current offset', status=409)
+    if length > settings.VIDEO_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Chunk too large', status=413)
+    if offset + length > session.total_size:
+        raise UploadError('Chunk exceeds Upload-Length', status=413)
+
+    hasher = hashlib.new(checksum[0]) if checksum else None
+    with tempfile.SpooledTemporaryFile(max_size=READ_BUFFER_SIZE * 16) as buffer:
+        received = 0
+        while received < length:
+            data = stream.read(min(READ_BUFFER_SIZE, length - received))
+            if not data:
+                break
+            if offset == 0 and received == 0:
+                # Refuse a file that is not a video before storing any of it
+                check_video_header(session.filename, data[:HEADER_SIZE])
+            buffer.write(data)
+            if hasher:
+                hasher.update(data)
+            received += len(data)
+        if received == 0:
+            return session.offset
+        if hasher and hasher.digest() != checksum[1]:
+            # 460 Checksum Mismatch (tus checksum extension)
+            raise UploadError('Checksum mismatch', status=460)
+
+        # Store the part before touching the session row, so the row lock
+        # is only held for the offset bookkeeping.
+        buffer.seek(0)
+        part_name = default_storage.save(_part_name(session, offset), File(buffer))
+
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if locked.status != UploadSession.STATUS_ACTIVE or locked.offset != offset:
+            stored = False
+        else:
+            locked.parts = [*locked.parts, [offset, received, part_name]]
+            locked.offset = offset + received
+            locked.save(update_fields=['parts', 'offset', 'updated_at'])
+            stored = True
+
+    if not stored:
+        # Lost a race with a concurrent PATCH at the same offset
+        default_storage.delete(part_name)
+        raise UploadError('Upload-Offset does not match the current offset', status=409)
+    return locked.offset
+
+
+class PartsReader(io.RawIOBase):
+    """Read-only stream over the stored parts of an upload, in order"""
+
+    def __init__(self, names):
+        self._names = list(names)
+        self.rewind()
+
+    def rewind(self):
+        self._index = 0
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Storage backends rewind before uploading; nothing else is supported
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('PartsReader can only rewind')
+        self._close_current()
+        self.rewind()
+        return 0
+
+    def readinto(self, buffer):
+        while self._index < len(self._names):
+            if self._current is None:
+                self._current = default_storage.open(self._names[self._index], 'rb')
+            data = self._current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self._close_current()
+            self._index += 1
+        return 0
+
+    def _close_current(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        self._close_current()
+        super().close()
+
+
+class _HashingReader(io.RawIOBase):
+    """SHA-256 of everything read through it; restarts when rewound"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.sha256 = hashlib.sha256()
+        return self._raw.seek(offset, whence)
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        self.sha256.update(memoryview(buffer)[:count])
+        return count
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def finalize_session(user, upload_id, expected_sha256=None):
+    """
+    Start turning a complete upload into a VideoSubmission.
+
+    Assembly copies every part, so it runs in ``tasks.assemble_upload``.
+    Here the session is only moved to ``finalizing`` under a row lock, so
+    one worker assembles it, and the task is queued. Returns the session;
+    repeated calls while it is finalizing or once it is completed just
+    report it. A finalize that died part way is queued again after
+    FINALIZE_TIMEOUT.
+    """
+    from .tasks import assemble_upload
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().filter(
+            pk=upload_id, user=user
+        ).first()
+        if session is None or session.status == UploadSession.STATUS_ABORTED:
+            raise UploadError('Upload not found', status=404)
+        if session.status == UploadSession.STATUS_COMPLETED:
+            return session
+        if (
+            session.status == UploadSession.STATUS_FINALIZING
+            and session.updated_at > timezone.now() - FINALIZE_TIMEOUT
+        ):
+            return session
+        if not session.is_complete:
+            raise UploadError(
+                f'Upload incomplete ({session.offset} of {session.total_size} bytes)',
+                status=409
+            )
+        session.status = UploadSession.STATUS_FINALIZING
+        session.finalize_error = ''
+        session.save(update_fields=['status', 'finalize_error', 'updated_at'])
+        transaction.on_commit(partial(assemble_upload.delay, str(session.pk), expected_sha256))
+    return session
+
+
+def finalize_state(user, upload_id):
+    """The session as a finalize status request sees it"""
+    session = UploadSession.objects.select_related('submission').filter(
+        pk=upload_id, user=user
+    ).first()
+    if session is None or session.status == UploadSession.STATUS_ABORTED:
+        raise UploadError('Upload not found', status=404)
+    return session
+
+
+def assemble_session(session_id, expected_sha256=None):
+    """
+    Assemble a ``finalizing`` session (run by ``tasks.assemble_upload``).
+
+    On failure the session goes back to ``active`` with the reason in
+    ``finalize_error``, keeping its parts so it can be finalized again.
+    """
+    session = UploadSession.objects.filter(
+        pk=session_id, status=UploadSession.STATUS_FINALIZING
+    ).first()
+    if session is None:
+        return None
+
+    parts = session.parts
+    try:
+        submission = _assemble(session, expected_sha256)
+    except Exception as e:
+        error = str(e) if isinstance(e, UploadError) else 'The upload could not be assembled'
+        UploadSession.objects.filter(pk=session.pk).update(
+            status=UploadSession.STATUS_ACTIVE, finalize_error=error[:255],
+            updated_at=timezone.now()
+        )
+        if not isinstance(e, UploadError):
+            raise
+        logger.warning(f"Upload {session.pk} could not be finalized: {error}")
+        return None
+
+    for _, _, name in parts:
+        default_storage.delete(name)
+    logger.info(f"Upload {session.pk} finalized as submission {submission.pk}")
+    return submission
+
+
+def _assemble(session, expected_sha256):
+    part_names = [name for _, _, name in sorted(session.parts)]
+    # Hashed while it is written, so the parts are read once
+    reader = _HashingReader(PartsReader(part_names))
+    submission = VideoSubmission(
+        student=session.user,
+        title=session.title,
+        description=session.description,
+        file_size=session.total_size,
+    )
+    content = File(io.BufferedReader(reader, READ_BUFFER_SIZE), name=session.filename)
+    content.size = session.total_size
+    submission.video_file.save(session.filename, content, save=False)
+    digest = reader.sha256.hexdigest()
+
+    if expected_sha256 and expected_sha256.lower() != digest:
+        default_storage.delete(submission.video_file.name)
+        raise UploadError('Checksum mismatch', status=460)
+
+    with transaction.atomic():
+        _complete(session, submission, digest)
+        # Content that is already stored keeps its object; ours is dropped
+        attach_blob(submission, digest, session.total_size)
+    return submission
+
+
+def _complete(session, submission, digest):
+    submission.save()
+    VideoMetadata.objects.create(
+        video=submission,
+        original_filename=session.filename,
+        mime_type=mimetypes.guess_type(session.filename)[0] or 'application/octet-stream',
+        sha256=digest,
+    )
+    session.status = UploadSession.STATUS_COMPLETED
+    session.submission = submission
+    session.parts = []
+    session.save(update_fields=['status', 'submission', 'parts', 'updated_at'])
+
+
+def abort_session(user, upload_id):
+    """Terminate an upload and delete its stored parts"""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().filter(
+            pk=upload_id, user=user
+        ).first()
+        if session is None or session.status == UploadSession.STATUS_ABORTED:
+            raise UploadError('Upload not found', status=404)
+        if session.status != UploadSession.STATUS_ACTIVE:
+            raise UploadError('Upload can no longer be cancelled', status=409)
+        parts = session.parts
+        session.status = UploadSession.STATUS_ABORTED
+        session.parts = []
+        session.save(update_fields=['status', 'parts', 'updated_at'])
+
+    for _, _, name in parts:
+        default_storage.delete(name)
+
+
+def expire_sessions(batch_size=100):
+    """Abort active uploads past their expiry and delete their parts"""
+    expired = 0
+    stale = UploadSession.objects.filter(
+        status=UploadSession.STATUS_ACTIVE, expires_at__lt=timezone.now()
+    ).order_by('expires_at')
+    while True:
+        sessions = list(stale[:batch_size])
+        if not sessions:
+            break
+        for session in sessions:
+            for _, _, name in session.parts:
+                default_storage.delete(name)
+        UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).update(
+            status=UploadSession.STATUS_ABORTED, parts=[], updated_at=timezone.now()
+        )
+        expired += len(sessions)
+    return expired
+
+
+def referenced_parts(names):
+    """The part objects among ``names`` that a live session still lists (for core.sweeper)"""
+    session_ids = set()
+    for name in names:
+        try:
+            session_ids.add(uuid.UUID(name.split('/')[1]))
+        except (IndexError, ValueError):
+            continue
+    live = UploadSession.objects.filter(
+        pk__in=session_ids,
+        status__in=[UploadSession.STATUS_ACTIVE, UploadSession.STATUS_FINALIZING],
+    ).values_list('parts', flat=True)
+    return {name for parts in live for _, _, name in parts}
@@ -4,5 +4,18 @@ from . import views
 app_name = 'videos'
 
 urlpatterns = [
-    # Will be implemented in Week 2
+    # Resumable uploads
+    path('uploads/', views.UploadCreateView.as_view(), name='upload_create'),
+    path('uploads/<uuid:upload_id>/', views.UploadDetailView.as_view(), name='upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.UploadFinalizeView.as_view(), name='upload_finalize'),
+    
+    # Direct-to-storage uploads
+    path('upload-tickets/', views.UploadTicketCreateView.as_view(), name='upload_ticket_create'),
+    path('upload-tickets/<uuid:ticket_id>/finalize/', views.UploadTicketFinalizeView.as_view(), name='upload_ticket_finalize'),
+    path('upload-tickets/local/<str:token>/', views.LocalUploadTicketPutView.as_view(), name='upload_ticket_put'),
+    
+    # HLS playback
+    path('<int:pk>/hls/master.m3u8', views.HLSMasterPlaylistView.as_view(), name='hls_master'),
+    path('<int:pk>/hls/<str:rendition>/index.m3u8', views.HLSRenditionPlaylistView.as_view(), name='hls_rendition'),
+    path('<int:pk>/previews.vtt', views.SpritePreviewView.as_view(), name='sprite_vtt'),
 ]
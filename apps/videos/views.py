@@ -1,3 +1,319 @@
-from django.shortcuts import render
+import json
+import logging
+import os
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import UploadSession, UploadTicket, VideoSubmission
+from .storage import LocalUploadTicketBackend, get_ticket_backend
+from .tickets import finalize_ticket, issue_ticket
+from .previews import sprite_vtt
+from .transcoding import HLS_CONTENT_TYPE, master_playlist, media_playlist
+
+from .uploads import (
+    TUS_EXTENSIONS,
+    TUS_VERSION,
+    UploadError,
+    abort_session,
+    create_session,
+    finalize_session,
+    finalize_state,
+    get_session,
+    write_chunk,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _json_body(request):
+    if request.content_type != 'application/json' or not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise UploadError('Invalid JSON')
+    if not isinstance(data, dict):
+        raise UploadError('Invalid JSON')
+    return data
+
+
+class StudentUploadMixin(LoginRequiredMixin, UserPassesTestMixin):
+    """Upload endpoints are for verified students; answer errors as tus responses"""
+    raise_exception = True
+
+    def test_func(self):
+        user = self.request.user
+        return user.is_student and user.can_access_platform
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except UploadError as e:
+            response = HttpResponse(str(e), status=e.status, content_type='text/plain')
+        response['Tus-Resumable'] = TUS_VERSION
+        return response
+
+
+class UploadCreateView(StudentUploadMixin, View):
+    """Create a resumable upload (tus creation extension)"""
+
+    def options(self, request, *args, **kwargs):
+        response = HttpResponse(status=204)
+        response['Tus-Version'] = TUS_VERSION
+        response['Tus-Extension'] = TUS_EXTENSIONS
+        response['Tus-Checksum-Algorithm'] = 'sha256,sha1,md5'
+        return response
+
+    def post(self, request):
+        session = create_session(
+            request.user,
+            request.headers.get('Upload-Length'),
+            request.headers.get('Upload-Metadata'),
+        )
+        response = HttpResponse(status=201)
+        response['Location'] = request.build_absolute_uri(
+            reverse('videos:upload_detail', args=[session.pk])
+        )
+        response['Upload-Offset'] = '0'
+        return response
+
+
+class UploadDetailView(StudentUploadMixin, View):
+    """Offset lookup, chunk append and termination for one upload"""
+    http_method_names = ['head', 'patch', 'delete', 'options']
+
+    def head(self, request, upload_id):
+        session = get_session(request.user, upload_id)
+        response = HttpResponse(status=200)
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.total_size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def patch(self, request, upload_id):
+        if request.content_type != 'application/offset+octet-stream':
+            return HttpResponse('Unsupported content type', status=415)
+        # Read from the request stream, never request.body, so the chunk is
+        # not buffered in memory
+        offset = write_chunk(
+            request.user,
+            upload_id,
+            request,
+            request.headers.get('Upload-Offset'),
+            request.headers.get('Content-Length'),
+            request.headers.get('Upload-Checksum'),
+        )
+        response = HttpResponse(status=204)
+        response['Upload-Offset'] = str(offset)
+        return response
+
+    def delete(self, request, upload_id):
+        abort_session(request.user, upload_id)
+        return HttpResponse(status=204)
+
+
+class UploadFinalizeView(StudentUploadMixin, View):
+    """
+    Turn a complete upload into a VideoSubmission. Assembly runs in a
+    worker: POST answers 202 while it does, and GET reports the outcome.
+    """
+
+    def get(self, request, upload_id):
+        try:
+            session = finalize_state(request.user, upload_id)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return self._state_response(request, session, created_status=200)
+
+    def post(self, request, upload_id):
+        try:
+            data = _json_body(request)
+            session = finalize_session(request.user, upload_id, data.get('sha256'))
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return self._state_response(request, session, created_status=201)
+
+    def _state_response(self, request, session, created_status):
+        if session.status == UploadSession.STATUS_COMPLETED:
+            submission = session.submission
+            return JsonResponse({
+                'id': submission.pk,
+                'title': submission.title,
+                'file_size': submission.file_size,
+            }, status=created_status)
+        if session.status == UploadSession.STATUS_FINALIZING:
+            response = JsonResponse({'status': session.status}, status=202)
+            response['Location'] = request.build_absolute_uri(request.path)
+            return response
+        return JsonResponse(
+            {'error': session.finalize_error or 'Upload is not being finalized'}, status=409
+        )
+
+
+class UploadTicketCreateView(StudentUploadMixin, View):
+    """Issue a direct-to-storage upload URL"""
+
+    def post(self, request):
+        try:
+            ticket, upload_url = issue_ticket(
+                request.user, _json_body(request), origin=request.headers.get('Origin')
+            )
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+
+        return JsonResponse({
+            'id': str(ticket.pk),
+            'upload_url': request.build_absolute_uri(upload_url),
+            'expires_at': ticket.expires_at.isoformat(),
+            'finalize_url': request.build_absolute_uri(
+                reverse('videos:upload_ticket_finalize', args=[ticket.pk])
+            ),
+        }, status=201)
+
+
+class UploadTicketFinalizeView(StudentUploadMixin, View):
+    """Verify a direct upload and create its VideoSubmission"""
+
+    def post(self, request, ticket_id):
+        try:
+            submission = finalize_ticket(request.user, ticket_id)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+
+        return JsonResponse({
+            'id': submission.pk,
+            'title': submission.title,
+            'file_size': submission.file_size,
+        }, status=201)
+
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)$')
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class LocalUploadTicketPutView(View):
+    """
+    Upload target for LocalUploadTicketBackend.
+
+    Behaves like a GCS resumable session URL: the signed URL is the only
+    credential, chunks are sent with ``Content-Range``, an incomplete upload
+    answers 308 with the persisted ``Range``, and ``bytes */size`` queries
+    the current state.
+    """
+    http_method_names = ['put']
+
+    def put(self, request, token):
+        backend = get_ticket_backend()
+        if not isinstance(backend, LocalUploadTicketBackend):
+            return HttpResponse(status=404)
+        try:
+            ticket_id = backend.unsign(token, max_age=settings.VIDEO_UPLOAD_TICKET_LIFETIME * 60)
+        except signing.BadSignature:
+            return HttpResponse('Invalid or expired upload URL', status=403)
+        ticket = UploadTicket.objects.filter(pk=ticket_id, status=UploadTicket.STATUS_ISSUED).first()
+        if ticket is None:
+            return HttpResponse(status=404)
+
+        path = backend.path(ticket.object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        persisted = os.path.getsize(path) if os.path.exists(path) else 0
+        length = int(request.headers.get('Content-Length') or 0)
+
+        content_range = request.headers.get('Content-Range')
+        if content_range:
+            match = _CONTENT_RANGE_RE.match(content_range)
+            if not match:
+                return HttpResponse('Invalid Content-Range', status=400)
+            start = int(match.group(1)) if match.group(1) is not None else None
+        else:
+            start = 0 if length else None
+
+        if start is not None:
+            if start != persisted:
+                return self._incomplete(persisted)
+            if start + length > ticket.size:
+                return HttpResponse('Upload exceeds the declared size', status=400)
+            with open(path, 'ab') as target:
+                remaining = length
+                while remaining:
+                    data = request.read(min(64 * 1024, remaining))
+                    if not data:
+                        break
+                    target.write(data)
+                    remaining -= len(data)
+                persisted = target.tell()
+
+        if persisted < ticket.size:
+            return self._incomplete(persisted)
+        size, md5 = backend.stat(ticket.object_name)
+        return JsonResponse({'name': ticket.object_name, 'size': size, 'md5Hash': md5})
+
+    def _incomplete(self, persisted):
+        response = HttpResponse(status=308)
+        if persisted:
+            response['Range'] = f'bytes=0-{persisted - 1}'
+        return response
+
+
+class VideoPlaybackMixin(LoginRequiredMixin):
+    """Resolve the submission and check the viewer may watch it"""
+    raise_exception = True
+
+    def get_video(self):
+        video = get_object_or_404(VideoSubmission, pk=self.kwargs['pk'], is_active=True)
+        if not video.can_view(self.request.user):
+            raise PermissionDenied
+        return video
+
+    def playlist_response(self, text, content_type=HLS_CONTENT_TYPE):
+        response = HttpResponse(text, content_type=content_type)
+        # Segment URLs are signed, so the playlist must not outlive them
+        response['Cache-Control'] = f'private, max-age={settings.SIGNED_URL_REFRESH_MARGIN}'
+        return response
+
+
+class HLSMasterPlaylistView(VideoPlaybackMixin, View):
+    """Master playlist listing the ready renditions of a submission"""
+
+    def get(self, request, pk):
+        video = self.get_video()
+        renditions = list(video.ready_renditions())
+        if not renditions:
+            raise Http404('Video is not ready for playback')
+        return self.playlist_response(master_playlist(video, renditions))
+
+
+class HLSRenditionPlaylistView(VideoPlaybackMixin, View):
+    """A rendition's media playlist with signed segment URLs"""
+
+    def get(self, request, pk, rendition):
+        video = self.get_video()
+        rendition = get_object_or_404(video.ready_renditions(), name=rendition)
+        return self.playlist_response(media_playlist(rendition))
+
+
+class SpritePreviewView(VideoPlaybackMixin, View):
+    """WebVTT thumbnail track for scrub previews"""
+
+    def get(self, request, pk):
+        video = self.get_video()
+        try:
+            sprite = video.metadata.sprite
+        except ObjectDoesNotExist:
+            sprite = None
+        if not sprite:
+            raise Http404('No preview sprite for this video')
+        return self.playlist_response(
+            sprite_vtt(sprite, default_storage.url(sprite['name'])), content_type='text/vtt'
+        )
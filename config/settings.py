@@ -10,6 +10,7 @@ except ImportError:
     pass
 
 import os
+from datetime import timedelta
 from pathlib import Path
 from decouple import config
 import sys
@@ -135,6 +136,7 @@ USE_GCS = config('USE_GCS', default=False, cast=bool)
 
 if USE_GCS:
     from storages.backends.gcloud import GoogleCloudStorage
+    from core.storage import SignedURLGoogleCloudStorage
 
     GS_BUCKET_NAME = config('GS_BUCKET_NAME')
     GS_SERVICE_ACCOUNT_NAME = config('GS_SERVICE_ACCOUNT_NAME', default=None)
@@ -146,11 +148,12 @@ if USE_GCS:
             kwargs['default_acl'] = 'publicRead'
             super().__init__(*args, **kwargs)
 
-    class MediaStorage(GoogleCloudStorage):
+    # Signed media URLs are cached (core.storage); see SIGNED_URL_* below
+    class MediaStorage(SignedURLGoogleCloudStorage):
         def __init__(self, *args, **kwargs):
             kwargs['location'] = 'media'
             kwargs['querystring_auth'] = True
-            kwargs['url_expiration'] = 3600  # 1 hour
+            kwargs['expiration'] = timedelta(hours=1)
             kwargs['service_account_name'] = GS_SERVICE_ACCOUNT_NAME
             super().__init__(*args, **kwargs)
 
@@ -174,8 +177,116 @@ else:
     # Media files
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
+
+# Serving media without GCS (core.views.MediaView). Set the backend to
+# 'nginx' (X-Accel-Redirect to MEDIA_SENDFILE_URL, an internal location
+# aliased to MEDIA_ROOT) or 'xsendfile' (Apache/lighttpd) so the front
+# server streams the bytes; empty serves them from Django.
+MEDIA_SENDFILE_BACKEND = config('MEDIA_SENDFILE_BACKEND', default='')
+MEDIA_SENDFILE_URL = config('MEDIA_SENDFILE_URL', default='/protected-media/')
+# Private media prefixes and the check that authorizes them (None: never served)
+MEDIA_ACCESS_RULES = {
+    'uploads/': None,
+    'videos/': 'videos.access.can_view_media',
+    'hls/': 'videos.access.can_view_media',
+    'previews/': 'videos.access.can_view_media',
+    'thumbnails/': 'videos.access.can_view_media',
+    'exports/': 'evaluations.exports.can_download_export',
+    'reports/': 'evaluations.reports.can_download_report',
+}
+# Orphaned media sweeper (core.sweeper): prefix -> function returning the
+# names of a listing page that are still referenced
+MEDIA_SWEEP_RULES = {
+    'profiles/': 'accounts.images.referenced_profile_media',
+    'videos/': 'videos.content.referenced_media',
+    'hls/': 'videos.content.referenced_media',
+    'previews/': 'videos.content.referenced_media',
+    'thumbnails/': 'videos.content.referenced_media',
+    'uploads/': 'videos.uploads.referenced_parts',
+    'exports/': 'evaluations.exports.referenced_exports',
+    'reports/': 'evaluations.reports.referenced_reports',
+}
+MEDIA_SWEEP_BACKEND = (
+    'core.sweeper.GCSMediaLister' if USE_GCS else 'core.sweeper.FileSystemMediaLister'
+)
+MEDIA_SWEEP_PAGE_SIZE = 1000
+MEDIA_SWEEP_RATE = config('MEDIA_SWEEP_RATE', default=100, cast=int)  # deletes/s, 0: unlimited
+MEDIA_SWEEP_GRACE_HOURS = 24
 ""
 
+# Redis (cache and Celery broker)
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# Cache
+# Redis is shared by every Cloud Run instance; local memory is per process
+# and only suitable for development and tests.
+USE_REDIS_CACHE = config('USE_REDIS_CACHE', default=not DEBUG, cast=bool)
+if USE_REDIS_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions and identity
+# Sessions are read from the cache and written through to the database, so
+# a cache flush never logs anyone out. request.user (with its profile) is
+# cached by accounts.backends.CachedModelBackend. ModelBackend stays listed
+# so sessions created before it (which name ModelBackend) still resolve.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+IDENTITY_CACHE_TIMEOUT = config('IDENTITY_CACHE_TIMEOUT', default=60 * 15, cast=int)
+
+# Signed media URL cache (core.storage)
+# URLs are re-signed this many seconds before they expire
+SIGNED_URL_REFRESH_MARGIN = config('SIGNED_URL_REFRESH_MARGIN', default=600, cast=int)
+SIGNED_URL_LOCAL_CACHE_SIZE = 4096
+# Concurrent signBlob calls when a page signs many URLs at once
+SIGNED_URL_SIGNING_WORKERS = 16
+
+# Rate limiting (core.ratelimit)
+RATELIMIT_ENABLED = config('RATELIMIT_ENABLED', default=True, cast=bool)
+RATELIMIT_BACKEND = 'redis' if USE_REDIS_CACHE else 'memory'
+# Proxies that append to X-Forwarded-For (Cloud Run's front end: 1, plus
+# one per load balancer); 0 uses REMOTE_ADDR only
+RATELIMIT_TRUSTED_PROXY_HOPS = config('RATELIMIT_TRUSTED_PROXY_HOPS', default=1, cast=int)
+
+# Leaderboards (evaluations.leaderboard): Redis sorted sets in front of the
+# LeaderboardEntry table, or the table alone
+LEADERBOARD_BACKEND = 'redis' if USE_REDIS_CACHE else 'database'
+
+# Draft autosave (evaluations.drafts): deltas are buffered here and
+# written to the database every DRAFT_FLUSH_INTERVAL seconds
+DRAFT_BACKEND = 'redis' if USE_REDIS_CACHE else 'memory'
+DRAFT_FLUSH_INTERVAL = config('DRAFT_FLUSH_INTERVAL', default=30, cast=int)
+# The memory buffer lives in each web process, out of reach of the periodic
+# flush (a Celery worker), so its deltas are written straight through
+DRAFT_WRITE_THROUGH = DRAFT_BACKEND == 'memory'
+
+# Judge assignment (evaluations.assignment)
+JUDGES_PER_SUBMISSION = config('JUDGES_PER_SUBMISSION', default=3, cast=int)
+# How many more open assignments an expertise match may have than the
+# least loaded judge before load balancing wins
+JUDGE_EXPERTISE_SLACK = 2
+
+# PDF reports (evaluations.reports): processes rendering a report set
+REPORT_RENDER_WORKERS = config('REPORT_RENDER_WORKERS', default=4, cast=int)
+# Rendered reports are reused for one to two periods of this many days
+REPORT_CACHE_MAX_AGE_DAYS = 30
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -232,20 +343,110 @@ else:
     EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
     DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
 
+# Email outbox settings
+# Transactional emails are queued in the database and delivered by a worker.
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+# How long a worker holds claimed rows before another worker may retry them
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+# Repeats of the same message (same dedupe key) within this window are dropped
+EMAIL_OUTBOX_DEDUPE_WINDOW = 60 * 60
+# In development there is usually no worker running, so deliver right after commit
+EMAIL_OUTBOX_DELIVER_ON_COMMIT = config('EMAIL_OUTBOX_DELIVER_ON_COMMIT', default=DEBUG, cast=bool)
+
 # Email verification settings
 EMAIL_VERIFICATION_TOKEN_LIFETIME = 24  # hours
 PASSWORD_RESET_TOKEN_LIFETIME = 2  # hours
+EMAIL_VERIFICATION_CACHE_TIMEOUT = 60 * 60  # seconds a link's outcome is cached
+# Links sent before the token store existed have no EmailVerification row.
+# They are honoured (for users with no rows at all) before this date only,
+# e.g. deploy day + EMAIL_VERIFICATION_TOKEN_LIFETIME; empty rejects them.
+EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL = config('EMAIL_VERIFICATION_LEGACY_LINKS_UNTIL', default='')
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 50  # 50MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 500  # 500MB
+# Videos arrive through the resumable upload API (videos.uploads) in chunks,
+# so multipart uploads only need to cover small files such as profile images.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 2  # 2MB, larger files spool to disk
+DATA_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024 * 10  # 10MB
 MAX_FILE_SIZE = config('MAX_FILE_SIZE', default='524288000', cast=int)  # 500MB
+MAX_IMAGE_SIZE = 1024 * 1024 * 5  # 5MB
+ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'webp', 'gif']
+# Reject files by type, magic bytes and size while they stream in (core.uploadhandlers)
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.ValidatingMemoryFileUploadHandler',
+    'core.uploadhandlers.ValidatingTemporaryFileUploadHandler',
+]
 
 # Video settings
 ALLOWED_VIDEO_EXTENSIONS = config(
     'ALLOWED_VIDEO_EXTENSIONS', 
     default='mp4,mov,avi,webm,mkv'
 ).split(',')
+VIDEO_UPLOAD_MAX_CHUNK_SIZE = config(
+    'VIDEO_UPLOAD_MAX_CHUNK_SIZE', default=1024 * 1024 * 16, cast=int
+)  # 16MB
+VIDEO_UPLOAD_SESSION_LIFETIME = 24  # hours
+# Direct-to-storage uploads (videos.tickets)
+VIDEO_UPLOAD_TICKET_LIFETIME = 60  # minutes
+VIDEO_UPLOAD_TICKET_BACKEND = (
+    'videos.storage.GCSUploadTicketBackend' if USE_GCS
+    else 'videos.storage.LocalUploadTicketBackend'
+)
+# HLS transcoding (videos.transcoding). ffmpeg/ffprobe must be installed on
+# the video workers.
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+FFPROBE_BINARY = config('FFPROBE_BINARY', default='ffprobe')
+# Threads per ffmpeg process; size the video worker pool as cores / threads
+VIDEO_TRANSCODE_THREADS = config('VIDEO_TRANSCODE_THREADS', default=2, cast=int)
+VIDEO_TRANSCODE_TIMEOUT = 60 * 60  # seconds; a longer running rendition is reclaimed
+VIDEO_TRANSCODE_MAX_RETRIES = 2
+
+# Celery settings
+CELERY_BROKER_URL = REDIS_URL
+CELERY_TASK_IGNORE_RESULT = True
+# Without a broker in development, run tasks inline
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=DEBUG, cast=bool)
+# Transcoding is CPU bound and long running; it has its own queue so it
+# never delays email or image work. Run a dedicated prefork worker for it:
+#   celery -A config worker -Q video --concurrency=<cores / VIDEO_TRANSCODE_THREADS>
+CELERY_TASK_ROUTES = {
+    'videos.tasks.process_video': {'queue': 'video'},
+    'videos.tasks.transcode_rendition': {'queue': 'video'},
+}
+# Honour task priorities on Redis (0 first) and only reserve one task per
+# worker process, so a long transcode never holds queued work hostage
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'queue_order_strategy': 'priority',
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULE = {
+    'drain-email-outbox': {
+        'task': 'core.tasks.drain_email_outbox',
+        'schedule': 10.0,
+    },
+    'purge-email-verifications': {
+        'task': 'accounts.tasks.purge_email_verifications',
+        'schedule': 60.0 * 60,
+    },
+    'expire-upload-sessions': {
+        'task': 'videos.tasks.expire_upload_sessions',
+        'schedule': 60.0 * 60,
+    },
+    'sweep-orphaned-media': {
+        'task': 'core.tasks.sweep_orphaned_media',
+        'schedule': 60.0 * 60 * 24,
+    },
+    'flush-evaluation-drafts': {
+        'task': 'evaluations.tasks.flush_evaluation_drafts',
+        'schedule': float(DRAFT_FLUSH_INTERVAL),
+    },
+    'assign-judges': {
+        'task': 'evaluations.tasks.assign_judges',
+        'schedule': 60.0 * 15,
+    },
+}
 
 # Development-specific settings
 if DEBUG:
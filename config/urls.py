@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from core.views import MediaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -20,9 +21,15 @@ urlpatterns = [
     path('', include('core.urls')),
 ]
 
-# Serve media files in development
+# Without GCS, media is served by Django with access checks, ranges and
+# sendfile offload (core.media)
+if not settings.USE_GCS:
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", MediaView.as_view(), name='media'),
+    ]
+
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     
     # Debug toolbar